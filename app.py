@@ -2,14 +2,51 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 import json
-from core import CalculadoraMilitar
-from leitor_pdf import extrair_dados_pdf
-from leitor_html import extrair_dados_html
-from leitor_csv import extrair_dados_csv
-from gerador_pdf import gerar_pdf
+from dateutil.relativedelta import relativedelta
+from core import (CalculadoraMilitar, varrer_ajuizamento, obter_motor, obter_tabela_fatores, preparar_carreira,
+                  COLUNAS_CONFERENCIA)
+from leitor_fichas import criar_pool_leitura, extrair_dados_arquivos
+from gerador_pdf import gerar_pdf, gerar_previa, imagem_previa
+from formatacao import moeda, tabela_visual, csv_ptbr
+from exportacao import FORMATOS, exportar
+from postos import inferir_historico_promocoes
 
 st.set_page_config(page_title="Calculadora Militares RN", layout="wide")
 
+# --- ESTADO DA SESSÃO ---
+# A sessão guarda só o que é do usuário: parâmetros do cálculo, histórico, edições e resultados
+# compactos. Referências (índices, tabela da lei, escalonamento) ficam no motor de cálculo do
+# processo (imutável), compartilhado por todas as sessões; a calculadora é recriada a partir dos parâmetros.
+@st.cache_resource
+def motor_compartilhado():
+    return obter_motor()
+
+@st.cache_resource
+def pool_leitura():
+    # Um pool para todas as sessões: nada de criar (e forkar) processos a cada upload
+    return criar_pool_leitura()
+
+@st.cache_resource
+def escalonamento_laudo():
+    try:
+        return pd.read_csv('dados/escalonamento.csv', sep=';')
+    except Exception:
+        return pd.DataFrame([["Erro ao ler arquivo", "0"]], columns=["Posto", "Percentual"])
+
+def compactar(df):
+    """ Colunas de texto repetitivo (posto, tipo, nível, cargo...) viram category. """
+    df = df.copy()
+    for col in df.columns:
+        if (pd.api.types.is_string_dtype(df[col]) or df[col].dtype == object) and df[col].nunique() <= len(df) // 2:
+            df[col] = df[col].astype('category')
+    return df
+
+def calculadora_da_sessao():
+    p = st.session_state['parametros_calculo']
+    return CalculadoraMilitar(p['data_ingresso'], p['data_ajuizamento'], p['historico'],
+                              datas_ferias_pdf=p['datas_ferias'], motor=motor_compartilhado(),
+                              data_calculo=p['data_calculo'])
+
 # --- CONFIGURAÇÃO VISUAL ---
 hide_st_style = """
             <style>
@@ -30,53 +67,15 @@ st.markdown("""
 Esta ferramenta simula os valores a receber decorrentes da correção do escalonamento vertical e progressão de níveis.
 """)
 
-# --- FUNÇÃO DE INTELIGÊNCIA ---
-def inferir_historico_promocoes(df_extraido):
-    historico = []
-    mapa_patentes = {
-        "CORONEL": "Coronel", "CEL": "Coronel", "TC": "Tenente-Coronel", 
-        "MAJOR": "Major", "CAPITÃO": "Capitão", "CAP": "Capitão",
-        "PRIMEIRO TENENTE": "1º Tenente", "1º TEN": "1º Tenente",
-        "SEGUNDO TENENTE": "2º Tenente", "2º TEN": "2º Tenente",
-        "ASPIRANTE": "Aspirante", "ASP": "Aspirante", "ALUNO": "Aluno CFO 1",
-        "SUBTENENTE": "Subtenente", "SUB": "Subtenente", 
-        "PRIMEIRO SARGENTO": "1º Sargento", "1º SGT": "1º Sargento",
-        "SEGUNDO SARGENTO": "2º Sargento", "2º SGT": "2º Sargento",
-        "TERCEIRO SARGENTO": "3º Sargento", "3º SGT": "3º Sargento",
-        "CABO": "Cabo", "CB": "Cabo", "SOLDADO": "Soldado", "SD": "Soldado"
-    }
-    
-    cargo_atual = None
-    df_unico = df_extraido.drop_duplicates(subset=['Competencia'], keep='first').sort_values('Competencia')
-
-    for index, row in df_unico.iterrows():
-        texto_cargo = str(row.get('Cargo_Detectado', '')).upper()
-        data_ref = row['Competencia']
-        patente_identificada = None
-        
-        for sigla, nome in mapa_patentes.items():
-            if sigla in texto_cargo:
-                patente_identificada = nome
-                break
-        
-        if patente_identificada and patente_identificada != cargo_atual:
-            if cargo_atual is None: data_promo = data_ref
-            else:
-                mes, ano = data_ref.month, data_ref.year
-                if 5 <= mes < 9: data_promo = date(ano, 4, 21)
-                elif 9 <= mes <= 12: data_promo = date(ano, 8, 21)
-                else: data_promo = date(ano - 1, 12, 25)
-            
-            historico.append({"Data": data_promo, "Posto": patente_identificada})
-            cargo_atual = patente_identificada
-            
-    return pd.DataFrame(historico)
-
 # --- 1. SIDEBAR ---
 with st.sidebar:
     st.header("⚙️ Parâmetros")
     data_ingresso = st.date_input("Data de Ingresso", value=date(2010, 2, 1), min_value=date(1970, 1, 1), format="DD/MM/YYYY")
     data_ajuizamento = st.date_input("Data da Ação", value=date.today(), min_value=date(2000, 1, 1), format="DD/MM/YYYY")
+    # Fixada uma vez na sessão: gerar, recalcular e emitir o laudo usam a mesma data, mesmo que o dia vire
+    if 'data_calculo' not in st.session_state: st.session_state['data_calculo'] = date.today()
+    data_calculo = st.date_input("Data do Cálculo", key='data_calculo', min_value=date(2000, 1, 1), format="DD/MM/YYYY",
+                                 help="Fim da timeline e da Selic. Mantida a mesma data, o cálculo se repete igual.")
     
     st.markdown("---")
     st.header("📂 Importação de Dados")
@@ -91,28 +90,43 @@ with st.sidebar:
     )
     
     st.markdown("---")
-    arquivo_upload = st.file_uploader("Subir Ficha (HTML, PDF ou CSV)", type=["html", "htm", "pdf", "csv"])
+    arquivos_upload = st.file_uploader("Subir Ficha (HTML, PDF ou CSV)", type=["html", "htm", "pdf", "csv"],
+                                       accept_multiple_files=True,
+                                       help="Pode enviar vários arquivos (ex.: um por ano). Os registros são juntados por competência.")
 
 # --- PROCESSAMENTO DO ARQUIVO ---
 if 'ultimo_arquivo_id' not in st.session_state: st.session_state['ultimo_arquivo_id'] = ""
 df_importado = pd.DataFrame()
 
-if arquivo_upload:
-    arquivo_atual_id = f"{arquivo_upload.name}_{arquivo_upload.size}"
+if arquivos_upload:
+    # Ordem por nome: a mesma seleção de arquivos sempre gera o mesmo resultado
+    arquivos_upload = sorted(arquivos_upload, key=lambda a: a.name)
+    arquivo_atual_id = "|".join(f"{a.name}_{a.size}" for a in arquivos_upload)
     
     if arquivo_atual_id != st.session_state['ultimo_arquivo_id']:
         try:
-            # --- SELETOR DE LEITURA ---
-            if arquivo_upload.name.lower().endswith('.csv'):
-                df_importado = extrair_dados_csv(arquivo_upload) 
-            elif arquivo_upload.name.lower().endswith('.pdf'):
-                df_importado = extrair_dados_pdf(arquivo_upload)
-            else:
-                html_content = arquivo_upload.getvalue().decode("utf-8", errors='ignore')
-                df_importado = extrair_dados_html(html_content)
+            # --- LEITURA (PARALELA QUANDO HÁ VÁRIOS ARQUIVOS) ---
+            with st.spinner(f"Lendo {len(arquivos_upload)} arquivo(s)..."):
+                df_importado, relatorio_leitura = extrair_dados_arquivos(
+                    [(a.name, a.getvalue()) for a in arquivos_upload], pool=pool_leitura()
+                )
+            
+            for _, arq in relatorio_leitura['arquivos'].iterrows():
+                if arq['Erro']:
+                    st.sidebar.error(f"Erro ao ler {arq['Arquivo']}: {arq['Erro']}")
+                elif arq['Registros'] == 0:
+                    st.sidebar.warning(f"Nenhum registro encontrado em {arq['Arquivo']}.")
+            if not relatorio_leitura['duplicados'].empty:
+                st.sidebar.info(f"{len(relatorio_leitura['duplicados'])} competência(s) repetidas entre arquivos (mesmo valor, mantida uma).")
+            if not relatorio_leitura['conflitos'].empty:
+                st.sidebar.warning(f"{len(relatorio_leitura['conflitos'])} competência(s) com valores diferentes entre arquivos: vale o último arquivo (ordem alfabética).")
+            if len(relatorio_leitura['lacunas']) > 0:
+                meses_faltando = ", ".join(relatorio_leitura['lacunas'].strftime('%m/%Y'))
+                st.sidebar.warning(f"Meses sem subsídio na ficha: {meses_faltando}")
                 
             if not df_importado.empty:
                 st.sidebar.success(f"Arquivo lido! {len(df_importado)} registros.")
+                df_importado = compactar(df_importado)
                 st.session_state.df_importado = df_importado # Salva na sessão
                 
                 if 'Cargo_Detectado' in df_importado.columns:
@@ -139,17 +153,15 @@ if not df_importado.empty:
     with st.expander("📊 Ver Dados Extraídos do Arquivo (Conversão)", expanded=True):
         st.write("Estes foram os dados financeiros encontrados no seu arquivo:")
         
-        # Formata para exibição
-        df_display = df_importado.copy()
-        if 'Competencia' in df_display.columns:
-            df_display['Competencia'] = df_display['Competencia'].dt.strftime('%m/%Y')
-        if 'Valor_Achado' in df_display.columns:
-            df_display['Valor_Achado'] = df_display['Valor_Achado'].apply(lambda x: f"R$ {x:,.2f}")
+        # Formata para exibição (colunas inteiras, pt-BR)
+        df_display = tabela_visual(df_importado,
+                                   moedas=[c for c in ['Valor_Achado'] if c in df_importado.columns],
+                                   meses=[c for c in ['Competencia'] if c in df_importado.columns])
             
         st.dataframe(df_display, use_container_width=True, height=250)
         
         # --- BOTÃO DE DOWNLOAD DO CSV CONVERTIDO ---
-        csv_extraido = df_importado.to_csv(sep=';', decimal=',', index=False).encode('utf-8')
+        csv_extraido = csv_ptbr(df_importado)
         col_d1, col_d2 = st.columns([1, 2])
         with col_d1:
             st.download_button(
@@ -164,7 +176,7 @@ if not df_importado.empty:
 
 # --- 3. HISTÓRICO (CENTRAL) ---
 st.subheader("2. Histórico de Carreira")
-if arquivo_upload is None: st.info("💡 Dica: Baixe o modelo CSV na lateral, preencha e suba para preencher tudo automático.")
+if not arquivos_upload: st.info("💡 Dica: Baixe o modelo CSV na lateral, preencha e suba para preencher tudo automático.")
 
 if 'df_template' not in st.session_state:
     df_init = pd.DataFrame([{"Data": "01/02/2010", "Posto": "Soldado"}])
@@ -206,21 +218,24 @@ if st.button("🚀 Gerar Cálculo e Confrontar Valores", type="primary"):
     datas_ferias_encontradas = []
     
     if not df_importado.empty:
-        # Garante que é datetime
-        df_importado['Competencia'] = pd.to_datetime(df_importado['Competencia'], dayfirst=True)
+        # Garante que é datetime (sem alterar o DataFrame guardado na sessão)
+        competencias = pd.to_datetime(df_importado['Competencia'], dayfirst=True)
         
         # Filtra tudo que for dia 15 (nossa convenção para Férias)
-        datas_ferias_encontradas = df_importado[df_importado['Competencia'].dt.day == 15]['Competencia'].tolist()
+        datas_ferias_encontradas = competencias[competencias.dt.day == 15].tolist()
         
         st.caption(f"📅 Férias identificadas no PDF: {len(datas_ferias_encontradas)} períodos.")
 
     # [PASSO 2] Instancia a Calculadora PASSANDO essa lista
-    calc = CalculadoraMilitar(
-        data_ingresso, 
-        data_ajuizamento, 
-        historico_lista,
-        datas_ferias_pdf=datas_ferias_encontradas
-    )
+    # Na sessão ficam só os parâmetros; a calculadora é recriada quando precisa
+    st.session_state['parametros_calculo'] = {
+        'data_ingresso': data_ingresso,
+        'data_ajuizamento': data_ajuizamento,
+        'historico': historico_lista,
+        'datas_ferias': datas_ferias_encontradas,
+        'data_calculo': data_calculo,
+    }
+    calc = calculadora_da_sessao()
     
     # [PASSO 3] Gera a tabela "Ideal"
     df_ideal = calc.gerar_tabela_base()
@@ -228,8 +243,19 @@ if st.button("🚀 Gerar Cálculo e Confrontar Valores", type="primary"):
     # [PASSO 4] Consolida (Aqui corrigi o nome da variável para df_calculo)
     if not df_importado.empty:
         # Cruza Ideal vs Real
-        df_calculo = calc.consolidar_com_pdf(df_ideal, df_importado)
+        try:
+            df_calculo, relatorio_cruzamento = calc.consolidar_pagamentos(df_ideal, df_importado)
+        except ValueError as e:
+            st.error(f"Não foi possível cruzar a ficha com o cálculo: {e}")
+            st.stop()
         st.toast("Confronto realizado com sucesso!", icon="💰")
+        # Aviso guardado na sessão: a página é recarregada logo abaixo (st.rerun)
+        pagos_sem_par = relatorio_cruzamento['pagos_sem_par']
+        if not pagos_sem_par.empty:
+            meses_sem_par = ", ".join(pagos_sem_par['Competencia'].dt.strftime('%m/%Y'))
+            st.session_state['aviso_cruzamento'] = f"{len(pagos_sem_par)} pagamento(s) da ficha fora do período calculado (não entram no confronto): {meses_sem_par}"
+        else:
+            st.session_state.pop('aviso_cruzamento', None)
     else:
         # Se não tiver PDF, o cálculo é apenas a tabela ideal
         df_calculo = df_ideal
@@ -242,25 +268,23 @@ if st.button("🚀 Gerar Cálculo e Confrontar Valores", type="primary"):
     df_calculo_detalhado = calc.extrair_detalhes_laudo(df_calculo)
     # ----------------------------------------------------
 
-    # [PASSO 5] Salva na sessão (Usando o DF detalhado)
-    st.session_state['df_base'] = df_calculo_detalhado # <-- SALVAR O NOVO DF
-    # Exibe
-    st.dataframe(df_calculo_detalhado) # <-- EXIBIR O NOVO DF
-    # Salva no estado para o próximo passo
-    st.session_state['df_base'] = df_calculo_detalhado # <-- SALVAR O NOVO DF
-    st.session_state['calculadora'] = calc
+    # [PASSO 5] Salva na sessão só as colunas da conferência (as intermediárias do cálculo não voltam a ser usadas)
+    st.session_state['df_base'] = compactar(df_calculo_detalhado[COLUNAS_CONFERENCIA])
+    # Resultado de uma rodada anterior não vale mais para esta base
+    st.session_state.pop('resultado_final', None)
     st.session_state['passo'] = 2
     st.rerun()
 if 'passo' in st.session_state and st.session_state['passo'] >= 2:    
     # Exibe Tabela
     st.subheader("3. Conferência Financeira")
     st.write("Edite os valores pagos se necessário e confira o resultado final.")
+    if 'aviso_cruzamento' in st.session_state:
+        st.info(st.session_state['aviso_cruzamento'])
     
     df_para_editar = st.session_state['df_base']
 
     editor_financeiro = st.data_editor(
-        df_para_editar[['Competencia', 'Posto_Vigente', 'Valor_Devido', 'Valor_Pago', 
-                    'Rubrica_Tipo', 'Posto_Grad', 'Nivel']], # <--- MUDANÇA AQUI
+        df_para_editar[COLUNAS_CONFERENCIA],
         key="editor_financeiro_final",
         column_config={
             "Competencia": st.column_config.DateColumn("Mês/Ano", format="MM/YYYY", disabled=True),
@@ -279,10 +303,10 @@ if 'passo' in st.session_state and st.session_state['passo'] >= 2:
 
       # Botão de Cálculo
     if st.button("🚀 Calcular Resultado Final"):
-        calc_obj = st.session_state['calculadora']
-        resultado_final = calc_obj.aplicar_financeiro(editor_financeiro)
+        calc_obj = calculadora_da_sessao()
+        resultado_final = calc_obj.aplicar_financeiro_vetorizado(editor_financeiro)
         # Salva o resultado final no estado para persistir após clique de download
-        st.session_state['resultado_final'] = resultado_final
+        st.session_state['resultado_final'] = compactar(resultado_final)
         st.session_state['passo'] = 3
         st.rerun()
 
@@ -298,18 +322,29 @@ if 'passo' in st.session_state and st.session_state['passo'] >= 3:
     juros = total_final - total_dif
     
     c1, c2, c3 = st.columns(3)
-    c1.metric("Principal (Diferença Nominal)", f"R$ {total_dif:,.2f}")
-    c2.metric("Juros + Correção Monetária", f"R$ {juros:,.2f}")
-    c3.metric("💰 TOTAL ESTIMADO DA AÇÃO", f"R$ {total_final:,.2f}")
+    c1.metric("Principal (Diferença Nominal)", moeda(total_dif, prefixo="R$ "))
+    c2.metric("Juros + Correção Monetária", moeda(juros, prefixo="R$ "))
+    c3.metric("💰 TOTAL ESTIMADO DA AÇÃO", moeda(total_final, prefixo="R$ "))
     
     with st.expander("Ver Detalhamento Mês a Mês"):
-        df_visual = resultado_final.copy()
-        df_visual['Competencia'] = df_visual['Competencia'].dt.strftime('%m/%Y')
         colunas_visuais = ['Valor_Devido', 'Valor_Pago', 'Diferenca_Mensal', 'Total_Final']
-        for col in colunas_visuais:
-            df_visual[col] = df_visual[col].apply(lambda x: f"R$ {x:,.2f}")
+        df_visual = tabela_visual(resultado_final[['Competencia'] + colunas_visuais], moedas=colunas_visuais,
+                                  meses=['Competencia'])
         st.dataframe(df_visual[['Competencia', 'Valor_Devido', 'Valor_Pago', 'Diferenca_Mensal', 'Total_Final']], use_container_width=True)
 
+    with st.expander("📉 Sensibilidade à Data de Ajuizamento"):
+        st.caption("Quanto o total muda se a ação for ajuizada nos próximos meses (a prescrição avança e os meses mais antigos saem do cálculo).")
+        meses_adiante = st.slider("Meses à frente", min_value=1, max_value=24, value=6, key="slider_ajuizamento")
+        datas_simuladas = [pd.Timestamp(data_ajuizamento) + relativedelta(months=m) for m in range(meses_adiante + 1)]
+        
+        # Reaproveita o resultado já calculado: datas posteriores são só um recorte da timeline
+        df_sensibilidade = varrer_ajuizamento(resultado_final, datas_simuladas, data_ingresso)
+        st.line_chart(df_sensibilidade.set_index('Data_Ajuizamento')[['Principal', 'Total_Atualizado']])
+        
+        df_sens_visual = tabela_visual(df_sensibilidade, moedas=['Principal', 'Juros_Correcao', 'Total_Atualizado'],
+                                       meses=['Inicio_Prescricao'], datas=['Data_Ajuizamento'])
+        st.dataframe(df_sens_visual, use_container_width=True, hide_index=True)
+
     st.markdown("---")
     st.header("4️⃣ Emitir Relatório e Laudo")
     st.write("Para baixar os documentos finais (Planilha e Laudo PDF), identifique-se abaixo:")
@@ -326,37 +361,40 @@ if 'passo' in st.session_state and st.session_state['passo'] >= 3:
         }
         
         # --- CARREGA DADOS PARA O ANEXO DO PDF ---
-        # 1. Recupera o histórico da memória da calculadora
-        if 'calculadora' in st.session_state:
-            calc_obj = st.session_state['calculadora']
-            df_tabela_lei_pdf = calc_obj.df_tabela_lei.copy()
-            df_historico_pdf = calc_obj.df_carreira.copy() # <--- NOVO: Pega o histórico usado no cálculo
+        # Tabela da lei e escalonamento vêm do processo; o histórico, dos parâmetros usados no cálculo
+        df_tabela_lei_pdf = motor_compartilhado().df_tabela_lei.copy()
+        if 'parametros_calculo' in st.session_state:
+            df_historico_pdf = preparar_carreira(st.session_state['parametros_calculo']['historico'])
+            # Fatores na mesma data de cálculo do resultado
+            df_fatores_pdf = calculadora_da_sessao().tabela_fatores()
         else:
-            df_tabela_lei_pdf = pd.read_csv('dados/tabelas_lei.csv', sep=';')
             df_historico_pdf = pd.DataFrame() # Fallback
-
-        try:
-            df_escalonamento_pdf = pd.read_csv('dados/escalonamento.csv', sep=';')
-        except:
-            df_escalonamento_pdf = pd.DataFrame([["Erro ao ler arquivo", "0"]], columns=["Posto", "Percentual"])
+            df_fatores_pdf = obter_tabela_fatores(motor_compartilhado())
+        df_escalonamento_pdf = escalonamento_laudo()
 
         # Gera arquivos
-        csv = resultado_final.to_csv(sep=';', decimal=',', index=False).encode('utf-8')
+        csv = csv_ptbr(resultado_final)
         
-        # Passa o df_historico_pdf como 5º argumento
-        pdf_buffer = gerar_pdf(
-            resultado_final, 
-            dados_militar, 
-            df_tabela_lei_pdf, 
-            df_escalonamento_pdf,
-            df_historico_pdf # <--- NOVO ARGUMENTO
-        )
+        # Laudo completo só é montado quando o download é pedido (o botão chama a função no clique)
+        def laudo_completo():
+            return gerar_pdf(
+                resultado_final, 
+                dados_militar, 
+                df_tabela_lei_pdf, 
+                df_escalonamento_pdf,
+                df_historico_pdf, # <--- NOVO ARGUMENTO
+                df_fatores=df_fatores_pdf
+            ).getvalue()
+        
+        # Prévia: só a primeira página (identificação, carreira e resumo), em milissegundos
+        if st.toggle("👁️ Ver prévia do laudo (1ª página)", key="toggle_previa"):
+            st.image(imagem_previa(gerar_previa(resultado_final, dados_militar, df_historico_pdf)), width=600)
         
         nome_arquivo_base = f"calculo_{nome_militar.replace(' ', '_')}"
         
         st.success("✅ Documentos gerados! Clique abaixo para baixar.")
         
-        btn1, btn2 = st.columns(2)
+        btn1, btn2, btn3 = st.columns(3)
         with btn1:
             st.download_button(
                 label="📥 Baixar Planilha Detalhada (CSV)", 
@@ -367,10 +405,18 @@ if 'passo' in st.session_state and st.session_state['passo'] >= 3:
         with btn2:
             st.download_button(
                 label="📄 Baixar Laudo Técnico (PDF)", 
-                data=pdf_buffer, 
+                data=laudo_completo, 
                 file_name=f"LAUDO_{nome_arquivo_base}.pdf", 
                 mime="application/pdf"
             )
+        with btn3:
+            # Para análise (pandas, DuckDB...): tipos preservados, sem reconverter datas e vírgulas
+            st.download_button(
+                label="📊 Baixar Resultado (Parquet)",
+                data=lambda: exportar(resultado_final),
+                file_name=f"{nome_arquivo_base}.parquet",
+                mime=FORMATOS['parquet']
+            )
     else:
         st.warning("☝️ Digite seu nome acima para liberar os botões de download.")
 
@@ -1,117 +1,465 @@
 import pandas as pd
 import numpy as np
-from datetime import date, datetime, timedelta
+from io import BytesIO
 from dateutil.relativedelta import relativedelta
 import calendar
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+
+from perfil_memoria import etapa, perfilar
+from registros_ficha import TIPO_SUBSIDIO, TIPO_NATALINA, TIPO_FERIAS
+
+# Colunas que seguem da etapa de conferência para o cálculo financeiro
+COLUNAS_CONFERENCIA = ['Competencia', 'Posto_Vigente', 'Valor_Devido', 'Valor_Pago',
+                       'Rubrica_Tipo', 'Posto_Grad', 'Nivel']
+
+@lru_cache(maxsize=None)
+def carregar_referencias(pasta='dados'):
+    """
+    Lê e limpa os CSVs de referência (índices, tabela do Coronel e escalonamento).
+    O resultado fica em cache no processo: cada worker/sessão lê os arquivos uma vez só.
+    Quem recebe os DataFrames não deve alterá-los (são compartilhados).
+    """
+    # --- A. CARREGAMENTO DOS ÍNDICES (PRESERVADO) ---
+    # O hash do arquivo identifica o snapshot dos índices (chave da tabela de fatores)
+    with open(f'{pasta}/indices.csv', 'rb') as f:
+        conteudo_indices = f.read()
+    snapshot_indices = hashlib.sha256(conteudo_indices).hexdigest()[:16]
+    df_indices = pd.read_csv(BytesIO(conteudo_indices), sep=';')
+    df_indices.columns = df_indices.columns.str.strip()
+    df_indices['Data'] = pd.to_datetime(df_indices['Data'], dayfirst=True, errors='coerce')
+    
+    # Limpeza Numérica Pesada (Remove %, R$, vírgulas)
+    cols_financeiras = ['CorrecaoMonetaria', 'Selic', 'JurosPoupanca', 'SelicAcumulada'] 
+    for col in cols_financeiras:
+        if col in df_indices.columns:
+            df_indices[col] = df_indices[col].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
+            df_indices[col] = pd.to_numeric(df_indices[col], errors='coerce').fillna(0.0)
+    
+    df_indices = df_indices.sort_values('Data')
+
+    # Captura Numerador IPCA (Nov/21) - Lógica que bateu com Excel
+    try:
+        data_nov21 = pd.to_datetime('2021-11-01')
+        indice_ref_nov21 = df_indices.loc[df_indices['Data'] == data_nov21, 'CorrecaoMonetaria'].values[0]
+    except:
+        indice_ref_nov21 = 1.0
+
+    # --- B. CARREGAMENTO TABELA CORONEL (PRESERVADO) ---
+    df_tabela_lei = pd.read_csv(f'{pasta}/tabelas_lei.csv', sep=';')
+    df_tabela_lei['Valor'] = df_tabela_lei['Valor'].astype(str).str.replace('R$', '', regex=False).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    df_tabela_lei['Valor'] = pd.to_numeric(df_tabela_lei['Valor'])
+    df_tabela_lei['Data_Inicio'] = pd.to_datetime(df_tabela_lei['Data_Inicio'], dayfirst=True)
+    df_tabela_lei['Data_Fim'] = pd.to_datetime(df_tabela_lei['Data_Fim'], dayfirst=True)
+
+    # --- C. CARREGAMENTO ESCALONAMENTO (PRESERVADO) ---
+    df_esc = pd.read_csv(f'{pasta}/escalonamento.csv', sep=';')
+    df_esc['Percentual'] = df_esc['Percentual'].astype(str).str.replace(',', '.', regex=False)
+    # Divide por 100 para usar como fator (Ex: 20 vira 0.20)
+    df_esc['Percentual'] = pd.to_numeric(df_esc['Percentual']) / 100
+    escalonamento = pd.Series(df_esc.Percentual.values, index=df_esc.Posto).to_dict()
+
+    return {
+        'df_indices': df_indices,
+        'snapshot_indices': snapshot_indices,
+        'indice_ref_nov21': indice_ref_nov21,
+        'df_tabela_lei': df_tabela_lei,
+        'escalonamento': escalonamento,
+    }
+
+
+# --- MOTOR COMPARTILHADO (REFERÊNCIAS + CONSULTAS PRONTAS) ---
+class MotorCalculo:
+    """
+    Parte do cálculo que não depende do militar: índices, tabela do Coronel, escalonamento e as
+    consultas já compiladas a partir deles (faixas da tabela em arrays). Imutável depois de criado,
+    então uma única instância aquecida serve todas as sessões/threads do processo (ver obter_motor).
+    Os DataFrames são compartilhados: quem os recebe não deve alterá-los no lugar.
+    """
+    def __init__(self, pasta='dados'):
+        referencias = carregar_referencias(pasta)
+        atributos = {
+            'pasta': pasta,
+            'df_indices': referencias['df_indices'],
+            'snapshot_indices': referencias['snapshot_indices'],
+            'indice_ref_nov21': referencias['indice_ref_nov21'],
+            'df_tabela_lei': referencias['df_tabela_lei'],
+            'escalonamento': MappingProxyType(dict(referencias['escalonamento'])),
+            'data_corte_selic': DATA_CORTE_SELIC, # Marco da EC 113 (padrão; cada cálculo pode escolher outro)
+            # Séries acumuladas dos índices (ver acumular_indices): base de todos os regimes
+            'acumulados': acumular_indices(referencias['df_indices']),
+        }
+        # Faixas da tabela do Coronel, na ordem do arquivo (a primeira que cobre a data vence)
+        tabela = referencias['df_tabela_lei']
+        faixas = (tabela['Data_Inicio'].values.astype('datetime64[ns]'),
+                  tabela['Data_Fim'].values.astype('datetime64[ns]'),
+                  tabela['Valor'].to_numpy(dtype=float))
+        for array in faixas:
+            array.setflags(write=False)
+        atributos['faixas_coronel'] = faixas
+        for nome, valor in atributos.items():
+            object.__setattr__(self, nome, valor)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("MotorCalculo é imutável (compartilhado entre sessões).")
+
+    def base_coronel(self, datas):
+        """ Valor da tabela do Coronel para vários meses (datetime64[ns]); 0.0 fora das faixas. """
+        valores = np.zeros(len(datas))
+        pendente = np.ones(len(datas), dtype=bool)
+        for inicio, fim, valor in zip(*self.faixas_coronel):
+            na_faixa = pendente & (datas >= inicio) & (datas <= fim)
+            valores[na_faixa] = valor
+            pendente &= ~na_faixa
+        return valores
+
+@lru_cache(maxsize=None)
+def obter_motor(pasta='dados'):
+    """ Motor único do processo (criado na primeira chamada, reaproveitado depois). """
+    return MotorCalculo(pasta)
+
+# --- TABELA DE FATORES (SNAPSHOT DOS ÍNDICES x DATA DE CÁLCULO) ---
+# Numa mesma data de cálculo, IPCA, juros e Selic de cada competência são os mesmos para todo militar:
+# a tabela é montada uma vez por (snapshot, data), gravada em {pasta}/fatores/ e só consultada depois.
+COLUNAS_FATORES = ['Competencia', 'IPCA_Fator', 'Juros_Fator', 'Selic_Fator']
+DATA_CORTE_SELIC = pd.Timestamp('2021-12-01')  # EC 113: primeiro mês da Selic (fim do IPCA + juros de poupança)
+
+# --- REGIMES DE ACUMULAÇÃO ---
+# Como juros de poupança (fase 1, até o corte) e Selic (fase 2, do corte à data de cálculo) se acumulam.
+# Cada regime diz qual série acumulada usar em cada fase; o fator de um período [a, b) sai de dois pontos:
+#   soma       acumulado[b] - acumulado[a]      (soma simples das taxas: o que bateu com o Excel)
+#   produto    acumulado[b] / acumulado[a] - 1  (capitalização mês a mês)
+#   publicada  coluna SelicAcumulada do indices.csv, como divulgada (diferença entre os dois meses)
+REGIMES = {
+    'soma': ('soma', 'soma'),
+    'composto': ('produto', 'produto'),
+    'selic_acumulada': ('soma', 'publicada'),
+}
+REGIME_PADRAO = 'soma'
+
+def acumular_indices(df_indices):
+    """
+    Séries acumuladas dos índices numa grade mensal contínua, do primeiro ao último índice.
+    Posição k de cada série = acumulado ANTES do k-ésimo mês (posição 0 = nada acumulado), então
+    qualquer regime, corte ou data de cálculo é só uma consulta a dois pontos. Arrays só leitura.
+    """
+    indices = df_indices[df_indices['Data'].notna()].drop_duplicates('Data')
+    meses = indices['Data'].values.astype('datetime64[M]')
+    grade = np.arange(meses.min(), meses.max() + 1)
+    por_mes = indices.set_index(meses).reindex(grade)  # mês sem linha: taxa 0, IPCA NaN
+
+    def acumulada(taxas, modo):
+        if modo == 'produto':
+            return np.concatenate([[1.0], np.cumprod(1 + taxas)])
+        return np.concatenate([[0.0], np.cumsum(taxas)])
+
+    juros = por_mes['JurosPoupanca'].fillna(0.0).to_numpy(dtype=float) / 100
+    selic = por_mes['Selic'].fillna(0.0).to_numpy(dtype=float) / 100
+    acumulados = {
+        'ipca': por_mes['CorrecaoMonetaria'].to_numpy(dtype=float),
+        'juros': {modo: acumulada(juros, modo) for modo in ('soma', 'produto')},
+        'selic': {modo: acumulada(selic, modo) for modo in ('soma', 'produto')},
+    }
+    if 'SelicAcumulada' in por_mes.columns:
+        publicada = por_mes['SelicAcumulada'].ffill().fillna(0.0).to_numpy(dtype=float) / 100
+        acumulados['selic']['publicada'] = np.concatenate([[0.0], publicada])
+
+    # CorrecaoMonetaria = IPCA acumulado até o fim da série, que fica em 1.0 depois do último IPCA usado:
+    # o corte não pode passar do primeiro mês desse trecho final constante
+    ipca = acumulados['ipca']
+    variou = np.flatnonzero(ipca[:-1] != ipca[-1])
+    acumulados['limite_corte'] = int(variou[-1]) + 1 if len(variou) else 0
+    for array in [ipca, *acumulados['juros'].values(), *acumulados['selic'].values()]:
+        array.setflags(write=False)
+    acumulados['inicio'] = grade[0]
+    return acumulados
+
+def _variacao(acumulado, modo, inicio, fim):
+    """ Fator de cada período [inicio, fim) (arrays de posições) a partir de uma série acumulada. """
+    if modo == 'produto':
+        return acumulado[fim] / acumulado[inicio] - 1
+    return acumulado[fim] - acumulado[inicio]
+
+def _mes_do_corte(data_corte_selic):
+    """ Corte da EC 113 como 1º dia do mês (o índice do mês do corte já é Selic). """
+    return pd.Timestamp(pd.to_datetime(data_corte_selic, dayfirst=True)).normalize().replace(day=1)
+
+def montar_tabela_fatores(df_indices, data_calculo, data_corte_selic=DATA_CORTE_SELIC, regime=REGIME_PADRAO,
+                          acumulados=None):
+    """
+    Fatores de cada mês, do primeiro índice até a data de cálculo, no regime pedido (ver REGIMES).
+    Regime 'soma' com o corte padrão: as mesmas regras de calcular_atualizacao.
+    IPCA_Fator: CorrecaoMonetaria do mês dividida pela do mês do corte (NaN no mês sem índice).
+    acumulados: séries de acumular_indices (o motor guarda as suas); sem elas, são montadas aqui.
+    """
+    if regime not in REGIMES:
+        raise ValueError(f"Regime desconhecido: {regime} (use {sorted(REGIMES)})")
+    acumulados = acumulados if acumulados is not None else acumular_indices(df_indices)
+    modo_juros, modo_selic = REGIMES[regime]
+    if modo_selic not in acumulados['selic']:
+        raise ValueError(f"Regime '{regime}' precisa da coluna SelicAcumulada em indices.csv")
+
+    inicio, ipca = acumulados['inicio'], acumulados['ipca']
+    corte = int((np.datetime64(_mes_do_corte(data_corte_selic), 'M') - inicio).astype('int64'))
+    if not 0 <= corte <= acumulados['limite_corte']:
+        limite = pd.Timestamp(inicio + acumulados['limite_corte'])
+        raise ValueError(f"Corte da Selic fora da série de IPCA: use um mês entre "
+                         f"{pd.Timestamp(inicio):%m/%Y} e {limite:%m/%Y}")
+
+    meses = np.arange(inicio, np.datetime64(pd.Timestamp(data_calculo), 'M') + 1)
+    posicao = np.arange(len(meses))
+    fim_selic = min(len(meses), len(ipca))  # índices publicados até a data de cálculo
+
+    fator_ipca = np.ones(len(meses))
+    antes = posicao < corte
+    fator_ipca[antes] = ipca[posicao[antes]] / ipca[corte]
+    # Juros: do mês seguinte ao da dívida até o mês anterior ao corte
+    juros = _variacao(acumulados['juros'][modo_juros], modo_juros, np.minimum(posicao + 1, corte), corte)
+    # Selic: do mês da dívida (ou do corte, se a dívida for anterior) até a data de cálculo
+    inicio_selic = np.minimum(np.maximum(posicao, corte), fim_selic)
+    selic = _variacao(acumulados['selic'][modo_selic], modo_selic, inicio_selic, fim_selic)
+    return pd.DataFrame({'Competencia': meses.astype('datetime64[ns]'), 'IPCA_Fator': fator_ipca,
+                         'Juros_Fator': juros, 'Selic_Fator': selic}, columns=COLUNAS_FATORES)
+
+_TRAVA_FATORES = threading.Lock()  # uma montagem por vez: threads com a mesma chave não gravam juntas
+
+@lru_cache(maxsize=256)
+def _tabela_fatores(pasta, snapshot, mes_calculo, regime, data_corte_selic):
+    # Só o mês da data de cálculo muda a tabela: uma entrada (e um arquivo) por mês, não por dia
+    nome = f'fatores_{snapshot}_{mes_calculo:%Y-%m}_{regime}_{data_corte_selic:%Y-%m}.csv'
+    caminho = os.path.join(pasta, 'fatores', nome)
+    with _TRAVA_FATORES:
+        if os.path.exists(caminho):
+            tabela = pd.read_csv(caminho, sep=';', parse_dates=['Competencia'], float_precision='round_trip')
+            # Mesmo dtype da tabela recém-montada: quem lê do arquivo não vê diferença
+            tabela['Competencia'] = tabela['Competencia'].astype('datetime64[ns]')
+        else:
+            motor = obter_motor(pasta)
+            tabela = montar_tabela_fatores(motor.df_indices, mes_calculo, data_corte_selic, regime, motor.acumulados)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            # Grava num temporário exclusivo e renomeia: outro processo nunca lê uma tabela pela metade
+            descritor, temporario = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(caminho))
+            try:
+                with os.fdopen(descritor, 'w', newline='') as f:
+                    tabela.to_csv(f, sep=';', index=False)
+                os.replace(temporario, caminho)
+            except BaseException:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+                raise
+    tabela.attrs = {'snapshot_indices': snapshot, 'arquivo': caminho, 'regime': regime,
+                    'data_corte_selic': data_corte_selic}
+    return tabela
+
+def obter_tabela_fatores(motor=None, data_calculo=None, regime=REGIME_PADRAO, data_corte_selic=None):
+    """
+    Tabela de fatores (Competencia, IPCA_Fator, Juros_Fator, Selic_Fator) do snapshot de índices do
+    motor na data de cálculo (padrão: último índice publicado), no regime e corte da EC 113 pedidos
+    (padrão: soma simples, dez/2021). Memorizada no processo e persistida em disco por mês de cálculo,
+    regime e corte; os dados são compartilhados entre cálculos, não alterar no lugar.
+    """
+    motor = motor if motor is not None else obter_motor()
+    if data_calculo is None:
+        data_calculo = motor.df_indices['Data'].max()
+    data_calculo = pd.Timestamp(pd.to_datetime(data_calculo, dayfirst=True)).normalize()
+    corte = _mes_do_corte(motor.data_corte_selic if data_corte_selic is None else data_corte_selic)
+    if regime not in REGIMES:
+        raise ValueError(f"Regime desconhecido: {regime} (use {sorted(REGIMES)})")
+    tabela = _tabela_fatores(motor.pasta, motor.snapshot_indices, data_calculo.replace(day=1), regime, corte)
+    # Cópia rasa (mesmos dados) só para levar a data exata, que o laudo mostra
+    tabela = tabela.copy(deep=False)
+    tabela.attrs = {**tabela.attrs, 'data_calculo': data_calculo}
+    return tabela
+
+def fatores_por_competencia(tabela, competencias):
+    """
+    Matriz (n, 3) de IPCA, Juros e Selic para cada competência, por deslocamento de mês na tabela.
+    Depois da data de cálculo: (1, 0, 0). Antes do primeiro índice: NaN.
+    """
+    meses = _como_datas(competencias).values.astype('datetime64[M]').astype('int64')
+    inicio = tabela['Competencia'].values[:1].astype('datetime64[M]').astype('int64')
+    posicao = meses - (inicio[0] if len(inicio) else 0)
+    valores = tabela[COLUNAS_FATORES[1:]].to_numpy(dtype=float)
+    fatores = np.full((len(meses), 3), np.nan)
+    dentro = (posicao >= 0) & (posicao < len(valores))
+    fatores[dentro] = valores[posicao[dentro]]
+    fatores[posicao >= len(valores)] = (1.0, 0.0, 0.0)
+    return fatores
+
+def _atualizar(tabela, inicio_mes, diferencas):
+    """ Fatores (zerados onde não há diferença) e total atualizado de uma matriz de diferenças >= 0. """
+    positivo = diferencas > 0
+    fatores = fatores_por_competencia(tabela, inicio_mes)
+    sem_indice = positivo.any(axis=0) & np.isnan(fatores).any(axis=1)
+    if sem_indice.any():
+        meses = pd.DatetimeIndex(inicio_mes)[sem_indice].strftime('%m/%Y')
+        raise ValueError(f"Competência sem índice de correção: {', '.join(meses)}")
+    fatores = np.nan_to_num(fatores)
+
+    ipca, juros, selic = fatores[:, 0], fatores[:, 1], fatores[:, 2]
+    total = diferencas * ipca * (1 + juros) * (1 + selic)
+    return (np.where(positivo, ipca, 0.0), np.where(positivo, juros, 0.0),
+            np.where(positivo, selic, 0.0), np.where(positivo, total, 0.0))
+
+def aplicar_regime(resultado, regime=REGIME_PADRAO, data_corte_selic=None, data_calculo=None, motor=None):
+    """
+    Refaz só a atualização de um resultado pronto (de executar_calculo) noutro regime/corte: fatores e
+    Total_Final saem da tabela de fatores pedida; timeline, valores nominais e conferência não são refeitos.
+    data_calculo deve ser a do cálculo original. Resultado em centavos continua em centavos.
+    Devolve um DataFrame novo.
+    """
+    motor = motor if motor is not None else obter_motor()
+    tabela = obter_tabela_fatores(motor, data_calculo, regime, data_corte_selic)
+    df = resultado.copy()
+    centavos = pd.api.types.is_integer_dtype(df['Diferenca_Mensal'])
+    inicio_mes = pd.to_datetime(df['Competencia']).values.astype('datetime64[M]').astype('datetime64[ns]')
+    diferenca = df['Diferenca_Mensal'].to_numpy(dtype=float)
+    ipca, juros, selic, total = _atualizar(tabela, inicio_mes, diferenca[None, :])
+    df['IPCA_Fator'] = ipca[0]
+    df['Juros_Fator'] = juros[0]
+    df['Selic_Fator'] = selic[0]
+    df['Total_Final'] = _arredondar_centavos(total[0]) if centavos else total[0]
+    return df
+
+# --- CHAVE DE CRUZAMENTO (MÊS, RUBRICA) ---
+# Inteiro único por competência e tipo: (ano * 12 + mês - 1) * 4 + código da rubrica.
+# Ordenar pela chave = ordenar por mês e, dentro do mês, Subsídio < 13º < Férias.
+CODIGOS_RUBRICA = {TIPO_SUBSIDIO: 0, TIPO_NATALINA: 1, TIPO_FERIAS: 2}
+
+def _como_datas(competencias):
+    """ DatetimeIndex das competências, sem reconverter o que já é datetime64. """
+    if isinstance(competencias, pd.DatetimeIndex):
+        return competencias
+    if pd.api.types.is_datetime64_any_dtype(competencias):
+        return pd.DatetimeIndex(competencias)
+    return pd.DatetimeIndex(pd.to_datetime(competencias, dayfirst=True))
+
+def chave_competencia(competencias, tipos=None):
+    """
+    Chave int64 (mês, rubrica) por linha. A rubrica vem de 'tipos' (coluna Tipo dos leitores) ou,
+    sem ela, do dia da data (13 = 13º, 15 = Férias, demais = Subsídio), como na timeline do cálculo.
+    """
+    datas = _como_datas(competencias).values
+    inicio_mes = datas.astype('datetime64[M]')
+    mes = inicio_mes.astype('int64') + 1970 * 12  # meses desde 1970 -> ano * 12 + mês - 1
+    if tipos is None:
+        dia = (datas - inicio_mes.astype(datas.dtype)) // np.timedelta64(1, 'D') + 1
+        codigo = np.where(dia == 13, 1, np.where(dia == 15, 2, 0))
+    else:
+        codigo = pd.Series(tipos).map(CODIGOS_RUBRICA).to_numpy()
+        if pd.isna(codigo).any():
+            desconhecidos = sorted(set(pd.Series(tipos)[pd.isna(codigo)].astype(str)))
+            raise ValueError(f"Tipo de pagamento desconhecido: {', '.join(desconhecidos)}")
+        codigo = codigo.astype('int64')
+    return mes * 4 + codigo
+
+def preparar_carreira(historico_promocoes):
+    """ Histórico de promoções como DataFrame com 'Data' em datetime, ordenado por data. """
+    df_carreira = pd.DataFrame(historico_promocoes)
+    df_carreira['Data'] = pd.to_datetime(df_carreira['Data'], dayfirst=True)
+    return df_carreira.sort_values('Data')
+
+# --- TIMELINE (COMPETÊNCIAS DO CÁLCULO) ---
+def fim_exigivel(data_calculo=None):
+    """
+    Última competência exigível na data de cálculo: o 1º dia do MÊS ANTERIOR (o mês corrente ainda
+    não foi pago). Ex.: cálculo em 04/12/2025 -> 01/11/2025. Sem data de cálculo, vale hoje.
+    """
+    referencia = pd.Timestamp.today() if data_calculo is None else pd.Timestamp(pd.to_datetime(data_calculo, dayfirst=True))
+    return referencia.normalize().replace(day=1) - relativedelta(months=1)
+
+@lru_cache(maxsize=4096)
+def _competencias(inicio, fim, ferias):
+    """ Datas da timeline, ordenadas (array datetime64 só leitura, compartilhado entre chamadas). """
+    meses = pd.date_range(start=inicio, end=fim, freq='MS')
+    # 13º: dia 13/12 de cada ano da timeline cujo dezembro já venceu (13/12 <= fim)
+    natalinas = meses[(meses.month == 12) & (meses < fim)] + pd.Timedelta(days=12)
+    todas = np.sort(np.concatenate([meses.to_numpy(), natalinas.to_numpy(), np.array(ferias, dtype=meses.dtype)]))
+    todas.setflags(write=False)
+    return todas
+
+def montar_timeline(inicio, fim, datas_ferias=()):
+    """
+    Competências de 'inicio' a 'fim': meses (dia 1), 13º (dia 13) e férias (dia 15 do mês de cada data de
+    férias dentro do período). As datas são memorizadas por (início, fim, férias): militares com a mesma
+    prescrição, a mesma data de cálculo e as mesmas férias reaproveitam a lista. DataFrame novo a cada chamada.
+    """
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    # Garante que não dê erro se a data final for menor que a inicial (recém ingressado)
+    if fim < inicio:
+        fim = inicio
+    ferias = pd.DatetimeIndex(pd.to_datetime(datas_ferias, dayfirst=True, errors='coerce')).to_numpy()
+    ferias = ferias[(ferias >= inicio.to_datetime64()) & (ferias <= fim.to_datetime64())]
+    # Chave da memória: dia 15 do mês de cada férias (datas diferentes no mesmo mês dão a mesma timeline)
+    dia_15 = np.sort(ferias.astype('datetime64[M]').astype('datetime64[D]') + np.timedelta64(14, 'D'))
+    return pd.DataFrame({'Competencia': _competencias(inicio, fim, tuple(dia_15.tolist()))})
 
 class CalculadoraMilitar:
-    def __init__(self, data_ingresso, data_ajuizamento, historico_promocoes, datas_ferias_pdf=[]):
+    """
+    Dados de UM militar (datas, histórico, férias) sobre o motor compartilhado.
+    Os métodos não alteram os DataFrames recebidos: devolvem sempre um DataFrame novo.
+    """
+    def __init__(self, data_ingresso, data_ajuizamento, historico_promocoes, datas_ferias_pdf=[], motor=None,
+                 data_calculo=None, regime=REGIME_PADRAO, data_corte_selic=None):
         # 1. Configurações
         self.data_ingresso = pd.to_datetime(data_ingresso, dayfirst=True)
         self.data_ajuizamento = pd.to_datetime(data_ajuizamento, dayfirst=True)
-        self.data_corte_selic = pd.to_datetime('2021-12-01') # Marco da EC 113
+        # Data de cálculo: a timeline vai até o mês anterior a ela e a Selic é somada até ela
+        # (None = timeline até o mês passado e Selic até o último índice publicado; muda com o dia)
+        self.data_calculo = None if data_calculo is None else pd.to_datetime(data_calculo, dayfirst=True)
+        # Regime de acumulação e corte da EC 113 da tabela de fatores (ver REGIMES). O linha a linha
+        # (calcular_atualizacao) é a referência do regime padrão e não usa os dois.
+        if regime not in REGIMES:
+            raise ValueError(f"Regime desconhecido: {regime} (use {sorted(REGIMES)})")
+        self.regime = regime
+        self.data_corte_selic = _mes_do_corte(DATA_CORTE_SELIC if data_corte_selic is None else data_corte_selic)
         self.datas_ferias_pdf = pd.to_datetime(datas_ferias_pdf, dayfirst=True, errors='coerce')
         
         # Histórico (Ordenado)
-        self.df_carreira = pd.DataFrame(historico_promocoes)
-        self.df_carreira['Data'] = pd.to_datetime(self.df_carreira['Data'], dayfirst=True)
-        self.df_carreira = self.df_carreira.sort_values('Data')
+        self.df_carreira = preparar_carreira(historico_promocoes)
 
         try:
-            # --- A. CARREGAMENTO DOS ÍNDICES (PRESERVADO) ---
-            self.df_indices = pd.read_csv('dados/indices.csv', sep=';')
-            self.df_indices.columns = self.df_indices.columns.str.strip()
-            self.df_indices['Data'] = pd.to_datetime(self.df_indices['Data'], dayfirst=True, errors='coerce')
-            
-            # Limpeza Numérica Pesada (Remove %, R$, vírgulas)
-            cols_financeiras = ['CorrecaoMonetaria', 'Selic', 'JurosPoupanca', 'SelicAcumulada'] 
-            for col in cols_financeiras:
-                if col in self.df_indices.columns:
-                    self.df_indices[col] = self.df_indices[col].astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False)
-                    self.df_indices[col] = pd.to_numeric(self.df_indices[col], errors='coerce').fillna(0.0)
-            
-            self.df_indices = self.df_indices.sort_values('Data')
-
-            # Captura Numerador IPCA (Nov/21) - Lógica que bateu com Excel
-            try:
-                data_nov21 = pd.to_datetime('2021-11-01')
-                self.indice_ref_nov21 = self.df_indices.loc[self.df_indices['Data'] == data_nov21, 'CorrecaoMonetaria'].values[0]
-            except:
-                self.indice_ref_nov21 = 1.0
-
-            # --- B. CARREGAMENTO TABELA CORONEL (PRESERVADO) ---
-            self.df_tabela_lei = pd.read_csv('dados/tabelas_lei.csv', sep=';')
-            self.df_tabela_lei['Valor'] = self.df_tabela_lei['Valor'].astype(str).str.replace('R$', '', regex=False).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
-            self.df_tabela_lei['Valor'] = pd.to_numeric(self.df_tabela_lei['Valor'])
-            self.df_tabela_lei['Data_Inicio'] = pd.to_datetime(self.df_tabela_lei['Data_Inicio'], dayfirst=True)
-            self.df_tabela_lei['Data_Fim'] = pd.to_datetime(self.df_tabela_lei['Data_Fim'], dayfirst=True)
-
-            # --- C. CARREGAMENTO ESCALONAMENTO (PRESERVADO) ---
-            df_esc = pd.read_csv('dados/escalonamento.csv', sep=';')
-            df_esc['Percentual'] = df_esc['Percentual'].astype(str).str.replace(',', '.', regex=False)
-            # Divide por 100 para usar como fator (Ex: 20 vira 0.20)
-            df_esc['Percentual'] = pd.to_numeric(df_esc['Percentual']) / 100
-            self.escalonamento = pd.Series(df_esc.Percentual.values, index=df_esc.Posto).to_dict()
+            # Dados de referência vêm do motor do processo (lidos uma única vez) e são
+            # compartilhados entre todas as calculadoras: só leitura, nunca alterar no lugar
+            self.motor = motor if motor is not None else obter_motor()
+            self.df_indices = self.motor.df_indices
+            self.indice_ref_nov21 = self.motor.indice_ref_nov21
+            self.df_tabela_lei = self.motor.df_tabela_lei
+            self.escalonamento = self.motor.escalonamento
             
         except Exception as e:
             print(f"ERRO CRÍTICO NO SETUP: {e}")
+            self.motor = None
             self.df_indices = pd.DataFrame()
             self.df_tabela_lei = pd.DataFrame()
             self.escalonamento = {}
 
     # --- MÉTODOS AUXILIARES ---
-    def gerar_timeline(self):
+    def gerar_timeline(self, data_ajuizamento=None, data_calculo=None):
         # Data de Início (Prescrição 5 anos)
-        marco_prescricional = self.data_ajuizamento - relativedelta(years=5)
-        inicio = marco_prescricional.replace(day=1)
-        if inicio < self.data_ingresso: inicio = self.data_ingresso.replace(day=1)
-        
-        # --- CORREÇÃO DA DATA FINAL (EXIGIBILIDADE) ---
-        # Não podemos calcular o mês corrente pois o pagamento ainda não ocorreu.
-        # Definimos o fim como o primeiro dia do MÊS ANTERIOR ao atual.
-        # Ex: Se hoje é 04/12/2025, calculamos até 01/11/2025.
-        data_hoje = datetime.today()
-        fim = data_hoje.replace(day=1) - relativedelta(months=1)
-        
-        # Garante que não dê erro se a data final for menor que a inicial (recém ingressado)
-        if fim < inicio:
-            fim = inicio
+        # data_ajuizamento / data_calculo opcionais: permitem simular outras datas sem criar outra calculadora
+        if data_ajuizamento is None: data_ajuizamento = self.data_ajuizamento
+        if data_calculo is None: data_calculo = self.data_calculo
+        inicio = inicio_prescricao(pd.to_datetime(data_ajuizamento, dayfirst=True), self.data_ingresso)
 
-        # 1. Gera meses normais (Dia 01)
-        datas_normais = pd.date_range(start=inicio, end=fim, freq='MS')
-        
-        # 2. Gera datas de 13º Salário (Dia 13 de Dezembro de cada ano)
-        # Pega todos os anos únicos da lista
-        anos = datas_normais.year.unique()
-        datas_13 = []
-
-        for ano in anos:
-            data_13 = pd.Timestamp(year=ano, month=12, day=13)
-            # Só adiciona se o mês de dezembro já tiver passado ou estiver no range
-            if data_13 <= fim:
-                datas_13.append(data_13)
-                
-        # FÉRIAS (Dia 15) - Baseado no que veio do PDF
-        datas_ferias = []
-        for data_f in self.datas_ferias_pdf:
-            # Só adiciona se a data do PDF estiver dentro da prescrição/processo
-            if inicio <= data_f <= fim:
-                # Garante que seja dia 15 para bater com o padrão
-                data_virtual = data_f.replace(day=15)
-                datas_ferias.append(data_virtual)
-
-        # Junta tudo e ordena
-        todas_datas = list(datas_normais) + datas_13 + datas_ferias
-        todas_datas.sort()
-        
-        return pd.DataFrame({'Competencia': todas_datas})
+        # --- DATA FINAL (EXIGIBILIDADE) ---
+        # O mês corrente (da data de cálculo) ainda não foi pago: a timeline vai até o mês anterior.
+        # Com data_calculo explícita, o mesmo caso dá a mesma timeline em qualquer dia.
+        return montar_timeline(inicio, fim_exigivel(data_calculo), self.datas_ferias_pdf)
     # Adicione este método auxiliar à classe CalculadoraMilitar
 
+    @perfilar('calculo.detalhes_laudo')
     def extrair_detalhes_laudo(self, df):
         """
         Extrai Nível e Tipo (Rubrica) com base na Competencia e Posto_Vigente, 
-        preparando as colunas para o PDF.
+        preparando as colunas para o PDF. Devolve uma cópia (o DataFrame recebido não muda).
         """
+        df = df.copy()
         
         def determinar_rubrica(row):
             """ 355-Subsídio, 351-13º, 359-Férias """
@@ -214,6 +562,21 @@ class CalculadoraMilitar:
         CORREÇÃO: Agora usa Juros Compostos (Progressão sobre nível anterior).
         Fórmula: 1.03 elevado ao número de triênios.
         """
+        fator_fixo = self._fator_nivel_fixo(posto)
+        if fator_fixo is not None: return fator_fixo
+
+        # --- REGRA GERAL (TEMPO DE SERVIÇO) ---
+        ultimo_dia = data_referencia + relativedelta(day=31)
+        anos = relativedelta(ultimo_dia, self.data_ingresso).years
+        trienios = int(anos / 3)
+        
+        # AQUI ESTÁ A CORREÇÃO MATEMÁTICA:
+        # Antes: 1 + (trienios * 0.03) -> Juros Simples
+        # Agora: 1.03 ** trienios      -> Juros Compostos (Sobre o anterior)
+        return 1.03 ** trienios
+
+    def _fator_nivel_fixo(self, posto):
+        """ Fator dos postos que não dependem do tempo de serviço. None = usa a regra dos triênios. """
         posto = str(posto).upper().strip()
         if posto == "NÃO INGRESSOU": return 1.0
         
@@ -228,16 +591,7 @@ class CalculadoraMilitar:
             elif "2" in posto or "II" in posto: return 1.03 ** 2 # Nível III
             elif "1" in posto or posto.endswith(" I"): return 1.03 ** 1 # Nível II
             return 1.03 ** 1 # Padrão
-
-        # --- REGRA GERAL (TEMPO DE SERVIÇO) ---
-        ultimo_dia = data_referencia + relativedelta(day=31)
-        anos = relativedelta(ultimo_dia, self.data_ingresso).years
-        trienios = int(anos / 3)
-        
-        # AQUI ESTÁ A CORREÇÃO MATEMÁTICA:
-        # Antes: 1 + (trienios * 0.03) -> Juros Simples
-        # Agora: 1.03 ** trienios      -> Juros Compostos (Sobre o anterior)
-        return 1.03 ** trienios
+        return None
 
     # --- NOVO: LÓGICA PRO RATA DIE ---
     def calcular_valor_nominal_com_prorata(self, row):
@@ -341,30 +695,64 @@ class CalculadoraMilitar:
                 
                 return pd.Series([texto_posto, valor_final_pro_rata])
             
+    @perfilar('calculo.consolidar_com_pdf')
     def consolidar_com_pdf(self, df_calculado, df_pdf):
         """
         Cruza a tabela 'ideal' (calculada pelo histórico) com a tabela 'real' (extraída do PDF).
+        Nenhum dos dois DataFrames recebidos é alterado. Ver consolidar_pagamentos para o relatório.
         """
-        # Garante tipagem de data para o cruzeiro
-        df_pdf['Competencia'] = pd.to_datetime(df_pdf['Competencia'])
-        df_calculado['Competencia'] = pd.to_datetime(df_calculado['Competencia'])
+        return self.consolidar_pagamentos(df_calculado, df_pdf)[0]
+
+    def consolidar_pagamentos(self, df_calculado, df_pdf):
+        """
+        Cruzamento pela chave (mês, rubrica) de chave_competencia, por busca em chaves ordenadas:
+        a ficha é ordenada uma vez e cada linha do cálculo acha o seu pagamento por busca binária.
+        A ficha precisa ter no máximo um pagamento por chave (ValueError com as repetidas).
+
+        Retorna (df_final, relatorio), onde relatorio é um dict com:
+            'pagos_sem_par':  linhas da ficha sem competência correspondente no cálculo
+                              (fora da prescrição, depois do último mês, rubrica não prevista)
+            'devidos_sem_pagamento': nº de linhas do cálculo sem pagamento na ficha
+        """
+        chaves_calc = chave_competencia(df_calculado['Competencia'])
+        tipos_pdf = df_pdf['Tipo'] if 'Tipo' in df_pdf.columns else None
+        chaves_pdf = chave_competencia(df_pdf['Competencia'], tipos_pdf)
+
+        # Ficha ordenada pela chave + validação de unicidade nas vizinhas
+        ordem = np.argsort(chaves_pdf)
+        chaves_ordenadas = chaves_pdf[ordem]
+        repetidas = chaves_ordenadas[1:][np.diff(chaves_ordenadas) == 0]
+        if len(repetidas):
+            linhas = df_pdf.iloc[ordem[np.isin(chaves_ordenadas, repetidas)]]
+            descricao = ", ".join(sorted({f"{c:%m/%Y} ({t})" for c, t in zip(
+                _como_datas(linhas['Competencia']),
+                linhas['Tipo'] if tipos_pdf is not None else ['pelo dia'] * len(linhas))}))
+            raise ValueError(f"A ficha tem mais de um pagamento para: {descricao}. Consolide antes de cruzar.")
 
-        # Prepara o PDF: Mantém apenas colunas essenciais e renomeia
-        # Importante: O PDF já deve ter vindo daquela função 'extrair_dados_pdf' 
-        # que agrupa e soma por competência.
-        df_pdf_clean = df_pdf[['Competencia', 'Valor_Achado']].copy()
-        df_pdf_clean = df_pdf_clean.rename(columns={'Valor_Achado': 'Valor_Pago_PDF'})
+        # Junção por índice ordenado: posição de cada chave do cálculo na ficha
+        # (uma sentinela no fim da ficha absorve as buscas que caem depois da última chave)
+        chaves_busca = np.append(chaves_ordenadas, -1)
+        valores_pdf = np.append(df_pdf['Valor_Achado'].to_numpy(dtype=float)[ordem], np.nan)
+        posicao = np.searchsorted(chaves_ordenadas, chaves_calc)
+        achou = chaves_busca[posicao] == chaves_calc
+        pago = np.where(achou, valores_pdf[posicao], np.nan)
 
-        # MERGE (Left Join):
-        # A base é sempre o df_calculado (histórico). Se não tiver PDF no mês, fica NaN.
-        df_final = pd.merge(df_calculado, df_pdf_clean, on='Competencia', how='left')
+        df_final = df_calculado.reset_index(drop=True)
+        df_final = df_final.assign(Competencia=_como_datas(df_final['Competencia']))
 
         # Substitui o Valor_Pago (que era 0.0) pelo valor do PDF
         # Se for NaN (não achou no PDF), preenche com 0.0
-        df_final['Valor_Pago'] = df_final['Valor_Pago_PDF'].fillna(0.0)
-        
-        # Remove a coluna auxiliar
-        df_final = df_final.drop(columns=['Valor_Pago_PDF'])
+        df_final['Valor_Pago'] = pd.Series(pago).fillna(0.0)
+
+        # Pagamentos da ficha que não encontraram competência no cálculo
+        usados = np.zeros(len(chaves_ordenadas), dtype=bool)
+        usados[posicao[achou]] = True
+        sem_par = df_pdf.iloc[np.sort(ordem[~usados])]
+        relatorio = {
+            'pagos_sem_par': sem_par[[c for c in ['Competencia', 'Tipo', 'Valor_Achado'] if c in sem_par.columns]]
+                             .reset_index(drop=True),
+            'devidos_sem_pagamento': int((~achou).sum()),
+        }
 
         # Recalcula a diferença agora com dados reais
         # Diferença = O que deveria receber (Devido) - O que recebeu (Pago)
@@ -373,18 +761,25 @@ class CalculadoraMilitar:
         # Opcional: Arredondar para evitar dízimas de ponto flutuante
         df_final['Diferenca_Mensal'] = df_final['Diferenca_Mensal'].round(2)
 
-        return df_final
+        return df_final, relatorio
     # --- PROCESSAMENTO PRINCIPAL ---
     # --- NOVO GERAR_TABELA_BASE COMPLETO ---
-    def gerar_tabela_base(self):
-        df = self.gerar_timeline()
-        
-        # Aplica o cálculo Pro Rata linha a linha
-        resultado_nominal = df.apply(self.calcular_valor_nominal_com_prorata, axis=1)
+    @perfilar('calculo.tabela_base')
+    def gerar_tabela_base(self, data_ajuizamento=None, segmentos=False):
+        """ Tabela ideal. segmentos=True usa o motor de trechos de dias (calcular_nominal_segmentado). """
+        df = self.gerar_timeline(data_ajuizamento)
         
-        # Joga o resultado nas colunas
-        df['Posto_Vigente'] = resultado_nominal[0]
-        df['Valor_Devido'] = resultado_nominal[1]
+        if segmentos:
+            with etapa('calculo.nominal_segmentos'):
+                df['Posto_Vigente'], df['Valor_Devido'] = self.calcular_nominal_segmentado(df['Competencia'])
+        else:
+            # Aplica o cálculo Pro Rata linha a linha
+            with etapa('calculo.nominal_prorata'):
+                resultado_nominal = df.apply(self.calcular_valor_nominal_com_prorata, axis=1)
+            
+            # Joga o resultado nas colunas
+            df['Posto_Vigente'] = resultado_nominal[0]
+            df['Valor_Devido'] = resultado_nominal[1]
         
         df['Valor_Pago'] = 0.0 
         
@@ -434,6 +829,8 @@ class CalculadoraMilitar:
         # 3. Selic (Soma Simples - Início na data da dívida se for nova)
         data_inicio_selic = max(data_ref_ipca, pd.to_datetime('2021-12-01'))
         fase2 = self.df_indices[self.df_indices['Data'] >= data_inicio_selic]
+        if self.data_calculo is not None:
+            fase2 = fase2[fase2['Data'] <= self.data_calculo]
         
         fator_selic = (fase2['Selic'] / 100).sum() if not fase2.empty else 0.0
 
@@ -444,9 +841,459 @@ class CalculadoraMilitar:
         return pd.Series([fator_ipca, fator_juros, fator_selic, total_final], 
                          index=['IPCA_Fator', 'Juros_Fator', 'Selic_Fator', 'Total_Final'])
 
+    @perfilar('calculo.financeiro')
     def aplicar_financeiro(self, df_preenchido):
+        df_preenchido = df_preenchido.copy()  # o editor/chamador continua com o seu DataFrame intacto
         df_preenchido['Diferenca_Mensal'] = df_preenchido['Valor_Devido'] - df_preenchido['Valor_Pago']
         df_preenchido['Diferenca_Mensal'] = df_preenchido['Diferenca_Mensal'].apply(lambda x: max(0.0, x))
-        financeiro = df_preenchido.apply(self.calcular_atualizacao, axis=1)
-        return pd.concat([df_preenchido, financeiro], axis=1)
+        with etapa('calculo.atualizacao_linha_a_linha'):
+            financeiro = df_preenchido.apply(self.calcular_atualizacao, axis=1)
+        with etapa('calculo.financeiro_concat'):
+            return pd.concat([df_preenchido, financeiro], axis=1)
+
+    def simular_ajuizamentos(self, datas_ajuizamento, df_pdf=None):
+        """
+        Sensibilidade do total à data de ajuizamento.
+        Calcula UMA vez a timeline da data mais antiga (a mais longa) e recorta as demais
+        por somas acumuladas (ver varrer_ajuizamento).
+        """
+        datas = pd.to_datetime(pd.Series(datas_ajuizamento), dayfirst=True)
+        df = self.gerar_tabela_base(datas.min())
+        if df_pdf is not None and not df_pdf.empty:
+            df = self.consolidar_com_pdf(df, df_pdf)
+        df = self.extrair_detalhes_laudo(df)
+        resultado = self.aplicar_financeiro(df[COLUNAS_CONFERENCIA])
+        return varrer_ajuizamento(resultado, datas, self.data_ingresso)
+
+    # --- CAMINHO VETORIZADO (MESMA ARITMÉTICA DO LINHA A LINHA) ---
+    # Reproduz calcular_valor_nominal_com_prorata / get_fator_nivel / calcular_atualizacao
+    # sobre arrays, na mesma ordem de operações, para dar os mesmos números do Excel.
+
+    def _base_coronel_vetorizada(self, datas):
+        """ buscar_valor_coronel para vários meses: a primeira faixa do arquivo que cobre a data vence. """
+        return self.motor.base_coronel(datas)
+
+    def _fator_trienio_vetorizado(self, datas):
+        """ Regra geral de get_fator_nivel (1.03 ** triênios) para vários meses. """
+        fim_mes = pd.DatetimeIndex(datas) + pd.offsets.MonthEnd(0)
+        ingresso = self.data_ingresso
+        meses = np.asarray((fim_mes.year - ingresso.year) * 12 + (fim_mes.month - ingresso.month))
+        # relativedelta(fim_mes, ingresso): antes do ingresso o mês incompleto arredonda para zero
+        meses = np.where((fim_mes < ingresso) & (ingresso.day < fim_mes.day), meses + 1, meses)
+        anos = np.sign(meses) * (np.abs(meses) // 12)
+        trienios = np.trunc(anos / 3).astype(int)
+        unicos, posicoes = np.unique(trienios, return_inverse=True)
+        return np.array([1.03 ** int(t) for t in unicos])[posicoes]
+
+    def _perc_e_nivel(self, postos, fator_trienio):
+        """ Percentual do escalonamento e fator de nível por linha (consulta feita por posto distinto). """
+        codigos, unicos = pd.factorize(pd.Series(postos, dtype=object), use_na_sentinel=False)
+        perc = np.array([self.escalonamento.get(p, 0.0) for p in unicos], dtype=float)[codigos]
+        fixos = [self._fator_nivel_fixo(p) for p in unicos]
+        tem_fixo = np.array([f is not None for f in fixos], dtype=bool)[codigos]
+        valor_fixo = np.array([0.0 if f is None else f for f in fixos], dtype=float)[codigos]
+        return perc, np.where(tem_fixo, valor_fixo, fator_trienio)
+
+    def _preparar_timeline(self, competencias):
+        """ Consultas que só dependem da competência (compartilhadas entre carreiras). """
+        competencias = pd.DatetimeIndex(pd.to_datetime(competencias))
+        inicio_mes = competencias.values.astype('datetime64[M]').astype('datetime64[ns]')
+        return {
+            'dia': np.asarray(competencias.day),
+            'inicio_mes': inicio_mes,
+            'dias_no_mes': np.asarray(competencias.days_in_month),
+            'base_coronel': self._base_coronel_vetorizada(inicio_mes),
+            'fator_trienio': self._fator_trienio_vetorizado(inicio_mes),
+        }
+
+    def _nominal_sobre_timeline(self, prep, df_carreira):
+        """ (Posto_Vigente, Valor_Devido) de uma carreira sobre uma timeline já preparada. """
+        datas_carreira = df_carreira['Data'].values.astype('datetime64[ns]')
+        # Último elemento extra: índice -1 (nenhuma promoção até a data) vira "Não Ingressou"
+        postos_carreira = np.append(df_carreira['Posto'].to_numpy(dtype=object), "Não Ingressou")
+
+        dia = prep['dia']
+        inicio_mes = prep['inicio_mes']
+        dias_no_mes = prep['dias_no_mes']
+        base = prep['base_coronel']
+        fator_trienio = prep['fator_trienio']
+        fim_mes = inicio_mes + (dias_no_mes - 1).astype('timedelta64[D]')
+
+        # Posto vigente no dia 01 (buscar_posto_na_data)
+        idx_vigente = np.searchsorted(datas_carreira, inicio_mes, side='right') - 1
+        postos = postos_carreira[idx_vigente]
+        perc, nivel = self._perc_e_nivel(postos, fator_trienio)
+        valor_cheio = base * perc * nivel
+
+        eh_ferias = dia == 15
+        eh_13 = dia == 13
+        valores = np.where(eh_ferias, valor_cheio / 3, valor_cheio)
+        rotulos = postos.copy()
+        rotulos[eh_ferias] = [f"Férias (1/3) - {p}" for p in postos[eh_ferias]]
+        rotulos[eh_13] = [f"13º Salário - {p}" for p in postos[eh_13]]
+
+        # Primeira promoção dentro do mês (só nos meses comuns): pro rata die
+        idx_promo = idx_vigente + 1
+        tem_promo = ~eh_ferias & ~eh_13 & (idx_promo < len(datas_carreira))
+        tem_promo[tem_promo] = datas_carreira[idx_promo[tem_promo]] <= fim_mes[tem_promo]
+        if tem_promo.any():
+            k = np.flatnonzero(tem_promo)
+            dia_promo = np.asarray(pd.DatetimeIndex(datas_carreira[idx_promo[k]]).day)
+            ultimo_dia = dias_no_mes[k]
+            dias_antigos = dia_promo - 1
+            dias_novos = (ultimo_dia - dia_promo) + 1
+            postos_novos = postos_carreira[idx_promo[k]]
+            perc_nov, nivel_nov = self._perc_e_nivel(postos_novos, fator_trienio[k])
+
+            total_antigo = (base[k] * perc[k] * nivel[k]) / ultimo_dia * dias_antigos
+            total_novo = (base[k] * perc_nov * nivel_nov) / ultimo_dia * dias_novos
+            valores[k] = total_antigo + total_novo
+            rotulos[k] = [f"{a} ({da}d) -> {n} ({dn}d)"
+                          for a, da, n, dn in zip(postos[k], dias_antigos, postos_novos, dias_novos)]
+
+        return rotulos, valores
+
+    def calcular_nominal_vetorizado(self, competencias, df_carreira=None):
+        """
+        Equivalente vetorizado de calcular_valor_nominal_com_prorata para uma timeline inteira.
+        Retorna (Posto_Vigente, Valor_Devido) como arrays alinhados às competências.
+        """
+        if df_carreira is None: df_carreira = self.df_carreira
+        return self._nominal_sobre_timeline(self._preparar_timeline(competencias), df_carreira)
+
+    # --- MOTOR DE SEGMENTOS DE DIAS (PROMOÇÕES E TRIÊNIOS DENTRO DO MÊS) ---
+    # O pro rata clássico só enxerga a primeira promoção do mês e aplica o triênio do último dia
+    # ao mês inteiro. Aqui cada mês é cortado em cada promoção e em cada aniversário de triênio;
+    # cada trecho paga base * percentual * nível proporcional aos seus dias.
+    def _aniversarios_trienio(self, ate):
+        """ Datas em que o militar completa 3, 6, 9... anos de serviço, até a data informada. """
+        datas = []
+        k = 1
+        while True:
+            aniversario = self.data_ingresso + relativedelta(years=3 * k)
+            if aniversario > ate: break
+            datas.append(aniversario)
+            k += 1
+        return pd.DatetimeIndex(datas).values.astype('datetime64[ns]')
+
+    def calcular_nominal_segmentado(self, competencias, df_carreira=None):
+        """
+        (Posto_Vigente, Valor_Devido) por competência com cortes em TODOS os eventos do mês.
+            - Mês comum: um trecho por intervalo entre eventos (promoção ou aniversário de triênio),
+              cada um com o posto e o nível do seu primeiro dia.
+            - Férias (dia 15): 1/3 do valor segmentado do mês.
+            - 13º (dia 13): posto e nível vigentes no último dia de dezembro.
+        Meses sem evento seguem o caminho rápido (uma conta por mês, igual ao pro rata clássico);
+        só os meses com evento passam pela varredura de trechos, toda em arrays.
+        """
+        if df_carreira is None: df_carreira = self.df_carreira
+        prep = self._preparar_timeline(competencias)
+        dia, inicio_mes, dias_no_mes, base = prep['dia'], prep['inicio_mes'], prep['dias_no_mes'], prep['base_coronel']
+        fim_mes = inicio_mes + (dias_no_mes - 1).astype('timedelta64[D]')
+
+        datas_carreira = df_carreira['Data'].values.astype('datetime64[ns]')
+        postos_carreira = np.append(df_carreira['Posto'].to_numpy(dtype=object), "Não Ingressou")
+        fim_timeline = pd.Timestamp(fim_mes.max()) if len(fim_mes) else self.data_ingresso
+        aniversarios = self._aniversarios_trienio(fim_timeline)
+        eventos = np.unique(np.concatenate([datas_carreira, aniversarios]))
+
+        def estado_no_dia(dias):
+            """ Posto e fator de nível vigentes em cada dia (datetime64[ns]). """
+            postos = postos_carreira[np.searchsorted(datas_carreira, dias, side='right') - 1]
+            trienios = np.searchsorted(aniversarios, dias, side='right')
+            return postos, self._perc_e_nivel(postos, 1.03 ** trienios)
+
+        eh_13 = dia == 13
+        eh_ferias = dia == 15
+        valores = np.zeros(len(dia))
+        rotulos = np.empty(len(dia), dtype=object)
+
+        # 13º: remuneração do último dia de dezembro
+        if eh_13.any():
+            postos, (perc, nivel) = estado_no_dia(fim_mes[eh_13])
+            valores[eh_13] = base[eh_13] * perc * nivel
+            rotulos[eh_13] = [f"13º Salário - {p}" for p in postos]
+
+        # Meses comuns e férias: eventos estritamente depois do dia 1 (no dia 1 já valem desde o início)
+        mensal = ~eh_13
+        primeiro = np.searchsorted(eventos, inicio_mes, side='right')
+        qtd_eventos = np.searchsorted(eventos, fim_mes, side='right') - primeiro
+        rapido = mensal & (qtd_eventos == 0)
+        varrer = mensal & (qtd_eventos > 0)
+
+        if rapido.any():
+            postos, (perc, nivel) = estado_no_dia(inicio_mes[rapido])
+            valores[rapido] = base[rapido] * perc * nivel
+            rotulos[rapido] = postos
+
+        if varrer.any():
+            meses = np.flatnonzero(varrer)
+            n = qtd_eventos[meses]
+            # Trechos: o dia 1 do mês + cada evento do mês; o trecho vai até o dia anterior ao próximo corte
+            mes_do_trecho = np.repeat(meses, n + 1)
+            deslocamento = np.arange(len(mes_do_trecho)) - np.repeat(np.cumsum(n + 1) - (n + 1), n + 1)
+            eh_inicio = deslocamento == 0
+            inicio_trecho = np.where(eh_inicio, inicio_mes[mes_do_trecho],
+                                     eventos[np.clip(primeiro[mes_do_trecho] + deslocamento - 1, 0, len(eventos) - 1)])
+            ultimo_do_mes = np.append(eh_inicio[1:], True)
+            proximo = np.where(ultimo_do_mes, fim_mes[mes_do_trecho] + np.timedelta64(1, 'D'),
+                               np.append(inicio_trecho[1:], inicio_trecho[-1]))
+            dias_trecho = ((proximo - inicio_trecho) // np.timedelta64(1, 'D')).astype(int)
+
+            postos, (perc, nivel) = estado_no_dia(inicio_trecho)
+            ultimo_dia = dias_no_mes[mes_do_trecho]
+            parcela = (base[mes_do_trecho] * perc * nivel) / ultimo_dia * dias_trecho
+            somas = np.zeros(len(dia))
+            np.add.at(somas, mes_do_trecho, parcela)
+            valores[meses] = somas[meses]
+
+            # Rótulo: trechos seguidos do mesmo posto (mudança só de nível) aparecem juntos
+            for k in meses:
+                trechos = mes_do_trecho == k
+                partes = []
+                for posto, dias in zip(postos[trechos], dias_trecho[trechos]):
+                    if partes and partes[-1][0] == posto:
+                        partes[-1][1] += dias
+                    elif dias > 0:
+                        partes.append([posto, dias])
+                rotulos[k] = partes[0][0] if len(partes) == 1 else " -> ".join(f"{p} ({d}d)" for p, d in partes)
+
+        # Férias: 1/3 do mês, rotuladas pelo posto do último dia
+        if eh_ferias.any():
+            valores[eh_ferias] = valores[eh_ferias] / 3
+            postos_fim = estado_no_dia(fim_mes[eh_ferias])[0]
+            rotulos[eh_ferias] = [f"Férias (1/3) - {p}" for p in postos_fim]
+        return rotulos, valores
+
+    def tabela_fatores(self):
+        """ Tabela de fatores do motor na data de cálculo, regime e corte desta calculadora (ver obter_tabela_fatores). """
+        return obter_tabela_fatores(self.motor, self.data_calculo, self.regime, self.data_corte_selic)
+
+    def _atualizar_vetorizado(self, inicio_mes, diferencas):
+        """
+        calcular_atualizacao sobre uma matriz (cenários x competências) de diferenças já >= 0:
+        os fatores vêm da tabela de fatores e a atualização é uma multiplicação por coluna.
+        """
+        return _atualizar(self.tabela_fatores(), inicio_mes, diferencas)
+
+    @perfilar('calculo.financeiro_vetorizado')
+    def aplicar_financeiro_vetorizado(self, df_preenchido):
+        """ Mesmo resultado de aplicar_financeiro, sem apply por linha e sem alterar o DataFrame recebido. """
+        df = df_preenchido.copy()
+        diferenca = (df['Valor_Devido'] - df['Valor_Pago']).to_numpy(dtype=float)
+        df['Diferenca_Mensal'] = np.where(diferenca > 0, diferenca, 0.0)
+
+        inicio_mes = pd.to_datetime(df['Competencia']).values.astype('datetime64[M]').astype('datetime64[ns]')
+        ipca, juros, selic, total = self._atualizar_vetorizado(inicio_mes, df['Diferenca_Mensal'].to_numpy()[None, :])
+        df['IPCA_Fator'] = ipca[0]
+        df['Juros_Fator'] = juros[0]
+        df['Selic_Fator'] = selic[0]
+        df['Total_Final'] = total[0]
+        return df
+
+    @perfilar('calculo.financeiro_centavos')
+    def aplicar_financeiro_centavos(self, df_preenchido):
+        """
+        Modo centavos: mesmo layout de aplicar_financeiro, mas Valor_Devido, Valor_Pago,
+        Diferenca_Mensal e Total_Final saem em int64 (centavos). Os fatores continuam float.
+        Pontos de arredondamento (ver para_centavos):
+            1. Valor_Devido e Valor_Pago: reais -> centavos, uma única vez, na entrada.
+            2. Diferenca_Mensal = max(Devido - Pago, 0): conta inteira, sem arredondamento.
+            3. Total_Final = Diferenca * IPCA * (1 + Juros) * (1 + Selic): centavos, uma vez, no fim.
+        Valores ausentes (NaN) entram como 0 centavo e não geram diferença.
+        """
+        df = df_preenchido.copy()
+        valido = (df['Valor_Devido'].notna() & df['Valor_Pago'].notna()).to_numpy()
+        devido = para_centavos(df['Valor_Devido'].fillna(0.0))
+        pago = para_centavos(df['Valor_Pago'].fillna(0.0))
+        diferenca = np.where(valido, np.maximum(devido - pago, 0), 0).astype('int64')
+
+        inicio_mes = pd.to_datetime(df['Competencia']).values.astype('datetime64[M]').astype('datetime64[ns]')
+        ipca, juros, selic, total = self._atualizar_vetorizado(inicio_mes, diferenca[None, :].astype('float64'))
+
+        df['Valor_Devido'] = devido
+        df['Valor_Pago'] = pago
+        df['Diferenca_Mensal'] = diferenca
+        df['IPCA_Fator'] = ipca[0]
+        df['Juros_Fator'] = juros[0]
+        df['Selic_Fator'] = selic[0]
+        df['Total_Final'] = _arredondar_centavos(total[0])
+        return df
+
+    # --- CENÁRIOS (WHAT-IF) ---
+    def simular_cenarios(self, historicos, df_pdf=None, nomes=None):
+        """
+        Compara N históricos de carreira alternativos do mesmo militar em uma única passada.
+        Timeline, pagamentos da ficha, tabela do Coronel, triênios e fatores de atualização são
+        calculados uma vez; por cenário resta a busca do posto vigente e a aritmética em arrays.
+        O primeiro histórico é a base das comparações.
+
+        Retorna dict com:
+            'resumo': Cenario, Principal, Total_Final e Diferenca_vs_Base
+            'mensal': Total_Final por competência (uma coluna por cenário)
+            'deltas': 'mensal' menos a coluna do cenário base
+        """
+        nomes = [f"Cenário {i + 1}" for i in range(len(historicos))] if nomes is None else list(nomes)
+        if len(nomes) != len(historicos) or len(set(nomes)) != len(nomes):
+            raise ValueError("Informe um nome distinto para cada histórico.")
+
+        # Partes compartilhadas: timeline + pagamentos + consultas por competência
+        df_base = self.gerar_timeline()
+        df_base['Valor_Devido'] = 0.0
+        df_base['Valor_Pago'] = 0.0
+        if df_pdf is not None and not df_pdf.empty:
+            df_base = self.consolidar_com_pdf(df_base, df_pdf)
+        prep = self._preparar_timeline(df_base['Competencia'])
+        pagos = df_base['Valor_Pago'].to_numpy(dtype=float)
+
+        # Matriz cenários x competências
+        devidos = np.vstack([self._nominal_sobre_timeline(prep, preparar_carreira(h))[1] for h in historicos])
+        diferencas = devidos - pagos
+        diferencas = np.where(diferencas > 0, diferencas, 0.0)
+        totais = self._atualizar_vetorizado(prep['inicio_mes'], diferencas)[3]
+
+        df_resumo = pd.DataFrame({
+            'Cenario': nomes,
+            'Principal': diferencas.sum(axis=1),
+            'Total_Final': totais.sum(axis=1),
+        })
+        df_resumo['Diferenca_vs_Base'] = df_resumo['Total_Final'] - df_resumo['Total_Final'].iloc[0]
+
+        df_mensal = pd.DataFrame(totais.T, columns=nomes)
+        df_deltas = df_mensal.sub(df_mensal[nomes[0]], axis=0)
+        df_mensal.insert(0, 'Competencia', df_base['Competencia'].values)
+        df_deltas.insert(0, 'Competencia', df_base['Competencia'].values)
+        return {'resumo': df_resumo, 'mensal': df_mensal, 'deltas': df_deltas}
+
+def inicio_prescricao(data_ajuizamento, data_ingresso):
+    """ Primeiro mês não prescrito (5 anos antes do ajuizamento, nunca antes do ingresso). """
+    marco_prescricional = data_ajuizamento - relativedelta(years=5)
+    inicio = marco_prescricional.replace(day=1)
+    if inicio < data_ingresso: inicio = data_ingresso.replace(day=1)
+    return inicio
+
+def varrer_ajuizamento(resultado_final, datas_ajuizamento, data_ingresso):
+    """
+    Principal e total atualizado para cada data de ajuizamento, a partir de um resultado já calculado.
+
+    Mudar o ajuizamento só desloca o início da prescrição: as linhas que sobram são um sufixo
+    da timeline (valores e fatores de cada competência não dependem da data da ação).
+    Por isso basta uma soma acumulada de trás para frente e uma busca binária por data.
+    O resultado precisa cobrir a data mais antiga pedida; datas posteriores são exatas.
+    """
+    data_ingresso = pd.to_datetime(data_ingresso, dayfirst=True)
+    datas = pd.to_datetime(pd.Series(datas_ajuizamento), dayfirst=True).sort_values().reset_index(drop=True)
+
+    df = resultado_final.sort_values('Competencia', kind='stable')
+    competencias = pd.to_datetime(df['Competencia']).values
+    # Sufixo acumulado com um zero no fim (índice len() = nenhuma linha)
+    principal_suf = np.append(df['Diferenca_Mensal'].values[::-1].cumsum()[::-1], 0.0)
+    total_suf = np.append(df['Total_Final'].values[::-1].cumsum()[::-1], 0.0)
+
+    inicios = pd.DatetimeIndex([inicio_prescricao(d, data_ingresso) for d in datas])
+    posicoes = np.searchsorted(competencias, inicios.values, side='left')
+
+    df_varredura = pd.DataFrame({
+        'Data_Ajuizamento': datas,
+        'Inicio_Prescricao': inicios,
+        'Principal': principal_suf[posicoes],
+        'Total_Atualizado': total_suf[posicoes],
+    })
+    df_varredura['Juros_Correcao'] = df_varredura['Total_Atualizado'] - df_varredura['Principal']
+    return df_varredura
+
+# --- MODO CENTAVOS (INTEIROS) ---
+# Dinheiro em int64 (centavos): somas de lote são exatas e não dependem da ordem nem do
+# número de processos. O arredondamento é sempre "meio centavo para longe de zero" (como
+# o ARRED do Excel) e só acontece nos pontos documentados em aplicar_financeiro_centavos.
+COLUNAS_CENTAVOS = ['Valor_Devido', 'Valor_Pago', 'Diferenca_Mensal', 'Total_Final']
+
+def _arredondar_centavos(centavos, folga=0.0):
+    """ Centavos fracionários (float) -> int64, meio centavo para longe de zero (valores calculados: sem folga). """
+    centavos = np.asarray(centavos, dtype='float64')
+    return (np.sign(centavos) * np.floor(np.abs(centavos) + 0.5 + folga)).astype('int64')
+
+def para_centavos(valores):
+    """ Reais (float) -> centavos (int64). """
+    # A folga de 1e-6 centavo absorve o erro binário da conversão, como 2.675 * 100 = 267.4999...
+    # Só aqui: os valores digitados têm no máximo 2 casas, então o erro nunca é um meio centavo de verdade
+    return _arredondar_centavos(np.asarray(valores, dtype='float64') * 100.0, folga=1e-6)
+
+def centavos_para_reais(resultado_centavos):
+    """ Cópia do resultado do modo centavos com as colunas de dinheiro de volta em reais (float). """
+    df = resultado_centavos.copy()
+    for col in COLUNAS_CENTAVOS:
+        if col in df.columns:
+            df[col] = df[col].astype('int64') / 100
+    return df
+
+def totais_centavos(resultado_centavos):
+    """ Totais exatos (int, centavos) de um ou vários resultados do modo centavos. """
+    if isinstance(resultado_centavos, pd.DataFrame):
+        resultado_centavos = [resultado_centavos]
+    principal = sum(int(df['Diferenca_Mensal'].astype('int64').sum()) for df in resultado_centavos)
+    total = sum(int(df['Total_Final'].astype('int64').sum()) for df in resultado_centavos)
+    return {'principal': principal, 'acessorios': total - principal, 'total': total}
+
+# --- FLUXO COMPLETO (SEM INTERFACE) ---
+@perfilar('calculo.executar')
+def executar_calculo(data_ingresso, data_ajuizamento, historico_promocoes, df_pagamentos=None, datas_ferias=None,
+                     centavos=False, motor=None, segmentos=False, data_calculo=None, regime=REGIME_PADRAO,
+                     data_corte_selic=None):
+    """
+    Reproduz o fluxo do app sem o Streamlit:
+    tabela ideal -> confronto com a ficha -> detalhes do laudo -> atualização financeira.
+    Retorna (calculadora, resultado_final) com as mesmas colunas que o app exporta.
+    Com centavos=True o resultado vem do modo centavos (dinheiro em int64).
+    Com segmentos=True o valor devido corta o mês em cada promoção e aniversário de triênio.
+    A atualização consulta a tabela de fatores da data de cálculo (padrão: último índice publicado), no
+    regime de acumulação e corte da EC 113 pedidos (ver REGIMES; para trocar depois, aplicar_regime).
+    Não altera df_pagamentos nem o histórico: pode rodar em várias threads sobre o mesmo motor.
+    """
+    tem_pagamentos = df_pagamentos is not None and not df_pagamentos.empty
+
+    # Férias: se não vierem explícitas, usa o padrão do app (dia 15 na ficha)
+    if datas_ferias is None:
+        datas_ferias = []
+        if tem_pagamentos:
+            competencias = pd.to_datetime(df_pagamentos['Competencia'], dayfirst=True)
+            datas_ferias = competencias[competencias.dt.day == 15].tolist()
+
+    calc = CalculadoraMilitar(data_ingresso, data_ajuizamento, historico_promocoes, datas_ferias_pdf=datas_ferias,
+                              motor=motor, data_calculo=data_calculo, regime=regime,
+                              data_corte_selic=data_corte_selic)
+
+    df_calculo = calc.gerar_tabela_base(segmentos=segmentos)
+    if tem_pagamentos:
+        df_calculo = calc.consolidar_com_pdf(df_calculo, df_pagamentos)
+    df_calculo = calc.extrair_detalhes_laudo(df_calculo)
+
+    # Mesmo recorte de colunas do editor de conferência do app
+    df_conferencia = df_calculo[COLUNAS_CONFERENCIA]
+    if centavos:
+        return calc, calc.aplicar_financeiro_centavos(df_conferencia)
+    return calc, calc.aplicar_financeiro_vetorizado(df_conferencia)
+
+def calcular_lote(casos, max_workers=4, motor=None):
+    """
+    Vários cálculos independentes em um pool de threads, todos sobre o mesmo motor aquecido.
+    casos: lista de dicts com os argumentos de executar_calculo (data_ingresso, data_ajuizamento,
+    historico_promocoes e, opcionalmente, df_pagamentos, datas_ferias, centavos, data_calculo, regime,
+    data_corte_selic). Casos com a mesma data de cálculo, regime e corte consultam a mesma tabela de fatores.
+    Retorna a lista de (calculadora, resultado_final) na ordem dos casos. Um caso com erro
+    levanta a exceção dele ao final, como executar_calculo.
+    """
+    motor = motor if motor is not None else obter_motor()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futuros = [pool.submit(executar_calculo, motor=motor, **caso) for caso in casos]
+        return [f.result() for f in futuros]
 
+def resumir_totais(resultado_final):
+    """ Totais exibidos no app: principal, juros + correção e total da ação. """
+    total_dif = float(resultado_final['Diferenca_Mensal'].sum())
+    total_final = float(resultado_final['Total_Final'].sum())
+    return {
+        'principal': total_dif,
+        'acessorios': total_final - total_dif,
+        'total': total_final,
+    }
@@ -0,0 +1,150 @@
+"""
+Exportação colunar do resultado do cálculo (Parquet e Arrow IPC), ao lado do CSV pt-BR (formatacao.csv_ptbr).
+
+O CSV é para o Excel; estes formatos são para análise: tipos preservados na volta (Competencia como data,
+dinheiro em float64 ou em int64 de centavos, fatores em float64, textos como texto), sem reconversão de
+vírgula decimal e datas, comprimidos por coluna e lidos direto por pandas, pyarrow, DuckDB, Spark...
+    exportar(resultado)                  -> bytes Parquet (formato='arrow': arquivo Arrow IPC)
+    gravar_lote(resultados, pasta)       -> dataset Parquet particionado (pasta/Ano=2021/...), em streaming
+    ler_resultados(caminho, filtro)      -> DataFrame com os mesmos dtypes do cálculo
+Colunas além das do resultado (ex.: 'Caso' num lote) vão no fim, com o tipo que tiverem no DataFrame.
+"""
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from core import COLUNAS_CENTAVOS, COLUNAS_CONFERENCIA, COLUNAS_FATORES
+
+COLUNAS_RESULTADO = COLUNAS_CONFERENCIA + ['Diferenca_Mensal', 'IPCA_Fator', 'Juros_Fator', 'Selic_Fator', 'Total_Final']
+COMPRESSAO = 'zstd'
+LINHAS_POR_GRUPO = 128 * 1024  # lote: acumula linhas de vários casos por grupo (arquivos pequenos são lentos de ler)
+FORMATOS = {'parquet': 'application/vnd.apache.parquet', 'arrow': 'application/vnd.apache.arrow.file'}
+VERSAO_ESQUEMA = '1'
+
+
+# --- ESQUEMA ---
+def esquema_resultado(centavos=False):
+    """ Esquema Arrow fixo do resultado; centavos=True: dinheiro em int64 (modo centavos do motor). """
+    campos = []
+    for coluna in COLUNAS_RESULTADO:
+        if coluna == 'Competencia':
+            tipo = pa.timestamp('us')
+        elif coluna in COLUNAS_CENTAVOS:
+            tipo = pa.int64() if centavos else pa.float64()
+        elif coluna in COLUNAS_FATORES:
+            tipo = pa.float64()
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(coluna, tipo))
+    metadados = {'calculadora.esquema': VERSAO_ESQUEMA, 'calculadora.centavos': '1' if centavos else '0'}
+    return pa.schema(campos, metadata=metadados)
+
+def tabela_arrow(resultado):
+    """ Resultado (DataFrame do cálculo) -> pa.Table no esquema fixo, mais as colunas extras no fim. """
+    faltando = [coluna for coluna in COLUNAS_RESULTADO if coluna not in resultado.columns]
+    if faltando:
+        raise ValueError(f"Resultado sem as colunas {faltando}")
+    esquema = esquema_resultado(centavos=pd.api.types.is_integer_dtype(resultado['Total_Final']))
+    extras = [coluna for coluna in resultado.columns if coluna not in COLUNAS_RESULTADO]
+    if extras:
+        for campo in pa.Schema.from_pandas(resultado[extras], preserve_index=False):
+            esquema = esquema.append(campo)
+    return pa.Table.from_pandas(resultado[COLUNAS_RESULTADO + extras], schema=esquema, preserve_index=False)
+
+
+# --- UM RESULTADO ---
+def exportar(resultado, formato='parquet', destino=None):
+    """ Parquet ou Arrow IPC ('arrow') de um resultado; sem destino (caminho), devolve os bytes. """
+    tabela = tabela_arrow(resultado)
+    saida = destino if destino is not None else pa.BufferOutputStream()
+    if formato == 'parquet':
+        pq.write_table(tabela, saida, compression=COMPRESSAO)
+    elif formato == 'arrow':
+        feather.write_feather(tabela, saida, compression=COMPRESSAO)
+    else:
+        raise ValueError(f"Formato desconhecido: {formato} (use {sorted(FORMATOS)})")
+    return destino if destino is not None else saida.getvalue().to_pybytes()
+
+
+# --- LOTE PARTICIONADO ---
+def gravar_lote(resultados, pasta, particoes=('Ano',), chave='Caso'):
+    """
+    Grava vários resultados num dataset Parquet particionado (pastas no estilo Hive: Ano=2021/...).
+    resultados: dict {caso: DataFrame} ou sequência de DataFrames (caso = posição); também aceita um
+    gerador, que é consumido aos poucos (no máximo ~LINHAS_POR_GRUPO linhas em memória).
+    A coluna 'chave' identifica o caso; 'Ano' (da Competencia) é criada quando pedida como partição.
+    Gravar de novo na mesma pasta acrescenta arquivos: cada chamada usa nomes novos.
+    Todos os resultados precisam do mesmo esquema (não misture modo centavos com reais).
+    """
+    itens = resultados.items() if isinstance(resultados, dict) else enumerate(resultados)
+    particoes = list(particoes)
+
+    def tabela_do_bloco(bloco, casos):
+        # Um pd.concat + uma conversão por bloco: por caso, a conversão para Arrow custaria mais que a gravação
+        df = pd.concat(bloco, ignore_index=True)
+        df[chave] = np.repeat(np.array(casos), [len(resultado) for resultado in bloco])
+        if 'Ano' in particoes:
+            df['Ano'] = df['Competencia'].dt.year.astype('int32')
+        return tabela_arrow(df)
+
+    def tabelas():
+        bloco, casos, linhas, centavos = [], [], 0, None
+        for caso, resultado in itens:
+            # pd.concat juntaria int64 (centavos) e float64 sem avisar
+            inteiro = pd.api.types.is_integer_dtype(resultado['Total_Final'])
+            if centavos is None:
+                centavos = inteiro
+            elif inteiro != centavos:
+                raise ValueError("Resultados em modo centavos e em reais no mesmo lote")
+            bloco.append(resultado)
+            casos.append(caso)
+            linhas += len(resultado)
+            if linhas >= LINHAS_POR_GRUPO:
+                yield tabela_do_bloco(bloco, casos)
+                bloco, casos, linhas = [], [], 0
+        if bloco:
+            yield tabela_do_bloco(bloco, casos)
+
+    gerador = tabelas()
+    primeira = next(gerador, None)
+    if primeira is None:
+        return pasta
+
+    def lotes():
+        yield from primeira.to_batches()
+        for tabela in gerador:
+            if not tabela.schema.equals(primeira.schema):
+                raise ValueError("Resultados com colunas extras diferentes no mesmo lote")
+            yield from tabela.to_batches()
+
+    formato = ds.ParquetFileFormat()
+    ds.write_dataset(
+        lotes(), pasta, schema=primeira.schema, format=formato,
+        file_options=formato.make_write_options(compression=COMPRESSAO),
+        partitioning=particoes, partitioning_flavor='hive',
+        min_rows_per_group=LINHAS_POR_GRUPO, max_rows_per_group=8 * LINHAS_POR_GRUPO,
+        basename_template=f"resultados-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return pasta
+
+
+# --- LEITURA ---
+def ler_resultados(caminho, filtro=None, colunas=None):
+    """
+    Lê um arquivo Parquet/Arrow ou um dataset particionado (pasta) de volta para DataFrame, com os tipos originais.
+    filtro: expressão pyarrow, ex.: ds.field('Ano') >= 2022 (só as partições/linhas que passam são lidas).
+    """
+    if os.path.isdir(caminho):
+        dados = ds.dataset(caminho, format='parquet', partitioning='hive')
+    elif caminho.endswith(('.arrow', '.feather')):
+        dados = ds.dataset(caminho, format='ipc')
+    else:
+        dados = ds.dataset(caminho, format='parquet')
+    return dados.to_table(columns=colunas, filter=filtro).to_pandas()
@@ -0,0 +1,121 @@
+"""
+Formatação pt-BR de colunas inteiras (app, laudo PDF e CSV exportado).
+
+Converte Series/arrays de uma vez, sem chamada Python por célula e sem depender do locale do
+processo (locale.setlocale é global: muda a formatação de todas as sessões/threads ao mesmo tempo).
+    moeda(valores)        1234.5   -> '1.234,50'   (prefixo='R$ ' -> 'R$ 1.234,50')
+    decimal(valores, 10)  1.381    -> '1,3810000000'
+    percentual(valores)   0.381    -> '38,10%'
+    data(valores)         Timestamp -> '10/2022'   (formato='%d/%m/%Y' para a data completa)
+Ausentes (NaN/NaT) viram o texto de 'vazio'. Valores escalares devolvem str.
+"""
+import numpy as np
+import pandas as pd
+
+FORMATO_MES = '%m/%Y'
+FORMATO_DATA = '%d/%m/%Y'
+
+
+# Grupos de 3 dígitos com zeros à esquerda ('000'...'999'): os números são montados por consulta
+GRUPOS = np.array([f"{k:03d}" for k in range(1000)])
+
+def _como_array(valores):
+    if isinstance(valores, pd.Series):
+        return valores.to_numpy()
+    return np.atleast_1d(np.asarray(valores))
+
+def _saida(textos, valores):
+    """ Mesmo formato da entrada: escalar -> str, Series -> Series (mesmo índice), resto -> array de str. """
+    if isinstance(textos, pd.Series):
+        textos = textos.to_numpy()
+    if isinstance(valores, pd.Series):
+        return pd.Series(textos, index=valores.index, dtype=object)
+    if np.ndim(valores) == 0:
+        return str(textos[0])
+    return textos
+
+def _digitos(inteiros, separador):
+    """ Inteiros >= 0 como texto, em grupos de 3 dígitos (consulta em GRUPOS), sem zeros à esquerda. """
+    grupos = []
+    resto = inteiros
+    while True:
+        grupos.append(GRUPOS[resto % 1000])
+        resto = resto // 1000
+        if not resto.any():
+            break
+    texto = grupos[-1]
+    for grupo in reversed(grupos[:-1]):
+        texto = np.char.add(np.char.add(texto, separador), grupo)
+    texto = np.char.lstrip(texto, '0' + separador)
+    return np.where(texto == '', '0', texto)
+
+def decimal(valores, casas=2, milhar=True, prefixo='', sufixo='', vazio='-'):
+    """
+    Números com vírgula decimal (e ponto de milhar), arredondados a 'casas' casas.
+    Limite: |valor| * 10 ** casas até 2 ** 53, onde o float ainda é exato na unidade
+    (reais com 2 casas: até ~9e13; fatores com 10: até ~9e5).
+    """
+    numeros = pd.to_numeric(_como_array(valores), errors='coerce').astype(float)
+    ausente = ~np.isfinite(numeros)
+    escala = 10 ** casas
+    absolutos = np.abs(np.where(ausente, 0.0, numeros))
+    escalados = absolutos * escala
+    unidades = np.round(escalados).astype('int64')
+    # Perto de meia unidade o produto em float pode cair do lado errado: esses poucos valores são
+    # arredondados pelo próprio Python, como f"{x:.2f}" (mesmo texto que o laudo sempre imprimiu)
+    empate = np.flatnonzero(np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6)
+    for i in empate:
+        unidades[i] = int(f"{absolutos[i]:.{casas}f}".replace('.', ''))
+    inteiros, fracao = np.divmod(unidades, escala)
+
+    texto = _digitos(inteiros, '.' if milhar else '')
+    if casas > 0:
+        # Fração completada até múltiplo de 3 dígitos e cortada de volta em 'casas' caracteres
+        largura = -(-casas // 3) * 3
+        fracao = fracao * 10 ** (largura - casas)
+        partes = [GRUPOS[(fracao // 10 ** (largura - 3 * (i + 1))) % 1000] for i in range(largura // 3)]
+        texto_fracao = partes[0]
+        for parte in partes[1:]:
+            texto_fracao = np.char.add(texto_fracao, parte)
+        texto = np.char.add(np.char.add(texto, ','), texto_fracao.astype(f'U{casas}'))
+    negativo = (numeros < 0) & (unidades > 0)
+    texto = np.where(negativo, np.char.add('-', texto), texto)
+    if prefixo or sufixo:
+        texto = np.char.add(np.char.add(prefixo, texto), sufixo)
+    return _saida(np.where(ausente, vazio, texto).astype(object), valores)
+
+def moeda(valores, prefixo='', vazio='-'):
+    """ Valores em reais: '1.234,56' (prefixo='R$ ' para o símbolo). """
+    return decimal(valores, 2, prefixo=prefixo, vazio=vazio)
+
+def percentual(valores, casas=2, vazio='-'):
+    """ Fração como percentual: 0.381 -> '38,10%'. """
+    numeros = pd.to_numeric(_como_array(valores), errors='coerce').astype(float)
+    return _saida(decimal(numeros * 100, casas, sufixo='%', vazio=vazio), valores)
+
+def data(valores, formato=FORMATO_MES, vazio=''):
+    """ Datas no formato pedido (padrão mês/ano); aceita texto DD/MM/AAAA. """
+    datas = pd.DatetimeIndex(pd.to_datetime(_como_array(valores), dayfirst=True, errors='coerce'))
+    textos = np.asarray(datas.strftime(formato), dtype=object)
+    return _saida(np.where(datas.isna(), vazio, textos), valores)
+
+def linhas(*colunas):
+    """ Colunas já formatadas (mesmo tamanho) -> lista de linhas para uma tabela do laudo. """
+    return [list(linha) for linha in zip(*(list(coluna) for coluna in colunas))]
+
+
+# --- TABELAS INTEIRAS ---
+def tabela_visual(df, moedas=(), meses=(), datas=(), prefixo='R$ '):
+    """ Cópia do DataFrame com as colunas indicadas formatadas para exibição (app). """
+    df = df.copy()
+    for coluna in moedas:
+        df[coluna] = moeda(df[coluna], prefixo=prefixo)
+    for coluna in meses:
+        df[coluna] = data(df[coluna], FORMATO_MES)
+    for coluna in datas:
+        df[coluna] = data(df[coluna], FORMATO_DATA)
+    return df
+
+def csv_ptbr(df):
+    """ CSV no padrão do Excel Brasil: ';', vírgula decimal e datas DD/MM/AAAA (bytes UTF-8). """
+    return df.to_csv(sep=';', decimal=',', date_format=FORMATO_DATA, index=False).encode('utf-8')
@@ -0,0 +1,433 @@
+"""
+Fichas financeiras sintéticas (PDF, HTML e CSV) com gabarito, para medir os leitores em escala.
+
+Cada ficha sai de uma carreira aleatória reprodutível (semente, nº da ficha): ingresso, promoções,
+subsídio mensal (355), férias (359), 13º (351), diferenças pagas em folhas posteriores (retroativos)
+e ruído de ficha real (descontos, totais 997/998/999, quebras de linha nas células, cabeçalhos,
+páginas sem lançamentos). O gabarito é o que um leitor perfeito devolveria depois de consolidar:
+uma linha por (Competencia, Tipo), nas mesmas convenções de data dos leitores.
+
+    PDF:  layout do Portal do Servidor (uma linha de texto por lançamento, células quebradas)
+    HTML: tabela por exercício com colunas Competência / Rubrica / Valor / Cargo
+    CSV:  Modelo Manual (Competencia;Valor;Cargo, tipo pelo dia da data)
+
+O leitor de HTML só reconhece o subsídio (355): na conferência do HTML o gabarito é filtrado.
+
+Uso:
+    python gerador_fichas.py --quantidade 2000 --formatos pdf html csv --pasta fichas_sinteticas
+    python gerador_fichas.py --medir --quantidade 50 --formatos pdf     (vazão e acerto dos leitores)
+"""
+import argparse
+import html
+import os
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from registros_ficha import (RegistroFicha, ConsolidadorFicha, TIPO_SUBSIDIO, TIPO_NATALINA, TIPO_FERIAS)
+from verificar_equivalencia import DATA_CALCULO, TRILHA_PRACAS, TRILHA_OFICIAIS
+
+# Posto do cálculo -> (código do cargo, texto do cargo como sai na ficha)
+CARGOS_FICHA = {
+    'Soldado': ('132009', 'SOLDADO - PM/CBM'),
+    'Cabo': ('132008', 'CABO - PM/CBM'),
+    '3º Sargento': ('132007', 'TERCEIRO SARGENTO - PM/CBM'),
+    '2º Sargento': ('132006', 'SEGUNDO SARGENTO - PM/CBM'),
+    '1º Sargento': ('132005', 'PRIMEIRO SARGENTO - PM/CBM'),
+    'Subtenente': ('132004', 'SUBTENENTE - PM/CBM'),
+    'Aluno CFO 1': ('106108', 'ALUNO CFO I - PM/CBM'),
+    'Aluno CFO 2': ('106109', 'ALUNO CFO II - PM/CBM'),
+    'Aluno CFO 3': ('106110', 'ALUNO CFO III - PM/CBM'),
+    'Aspirante': ('106107', 'ASPIRANTE - PM/CBM'),
+    '2º Tenente': ('106106', 'SEGUNDO TENENTE - PM/CBM'),
+    '1º Tenente': ('106105', 'PRIMEIRO TENENTE - PM/CBM'),
+    'Capitão': ('106104', 'CAPITAO - PM/CBM'),
+    'Major': ('106103', 'MAJOR - PM/CBM'),
+    'Tenente-Coronel': ('106102', 'TENENTE CORONEL - PM/CBM'),
+    'Coronel': ('106101', 'CORONEL - PM/CBM'),
+}
+
+# Subsídio aproximado de 2020 por posto (reajuste anual aplicado em cima)
+SUBSIDIO_2020 = {
+    'Soldado': 4100.0, 'Cabo': 4700.0, '3º Sargento': 5400.0, '2º Sargento': 6000.0,
+    '1º Sargento': 6700.0, 'Subtenente': 7500.0, 'Aluno CFO 1': 2900.0, 'Aluno CFO 2': 3100.0,
+    'Aluno CFO 3': 6315.75, 'Aspirante': 8800.0, '2º Tenente': 10000.0, '1º Tenente': 11500.0,
+    'Capitão': 13500.0, 'Major': 16000.0, 'Tenente-Coronel': 18500.0, 'Coronel': 21000.0,
+}
+
+# Rubricas alvo dos leitores: código, descrição e tipo
+RUBRICAS_ALVO = {
+    TIPO_SUBSIDIO: ('355', 'SUBSIDIO PM/CBM (LCE 463/12)'),
+    TIPO_NATALINA: ('351', 'GRATIFICACAO NATALINA'),
+    TIPO_FERIAS: ('359', 'ADICIONAL DE FERIAS 1/3'),
+}
+
+# Ruído: descontos como aparecem na ficha (código, descrição, fração do subsídio ou valor fixo)
+DESCONTOS = [
+    ('502', 'RETENCAO DE IMPOSTO DE RENDA NA FONTE', 0.15),
+    ('869', 'CONTR MILITAR - INSTITUTO PREV ESTADUAL DO RN - IPERN ATIVO', 0.11),
+    ('771', 'ASSOCIACAO DOS OFICIAIS MILITARES DO RN', 85.00),
+    ('571', 'EMPRESTIMO CONSIGNADO', 0.08),
+    ('917', 'PLANO DE SAUDE', 0.03),
+]
+
+# Tipos que cada leitor reconhece (o gabarito é filtrado na conferência)
+TIPOS_LIDOS = {
+    'pdf': {TIPO_SUBSIDIO, TIPO_NATALINA, TIPO_FERIAS},
+    'html': {TIPO_SUBSIDIO},
+    'csv': {TIPO_SUBSIDIO, TIPO_NATALINA, TIPO_FERIAS},
+}
+EXTENSOES = {'pdf': '.pdf', 'html': '.html', 'csv': '.csv'}
+# Última folha = mês anterior a esta data: a mesma semente gera a mesma ficha em qualquer dia
+DATA_REFERENCIA = DATA_CALCULO
+
+
+# --- CARREIRA E LANÇAMENTOS ---
+def _dinheiro(valor):
+    """ 1234.5 -> '1.234,50' (formato da ficha). """
+    return f"{valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+def _competencia_do_leitor(direito, tipo):
+    """ Mesmas convenções de data dos leitores: Subsídio dia 01, 13º 13/12, Férias dia 15. """
+    if tipo == TIPO_NATALINA:
+        return pd.Timestamp(year=direito.year, month=12, day=13)
+    if tipo == TIPO_FERIAS:
+        return direito.replace(day=15)
+    return direito.replace(day=1)
+
+def gerar_militar(semente, numero, anos=(3, 15), prob_retroativo=0.05, ruido=3, data_referencia=DATA_REFERENCIA):
+    """
+    Um militar sintético reprodutível: dict com nome, matrícula, ingresso, histórico e lançamentos.
+    anos: (mínimo, máximo) de anos de serviço cobertos pela ficha, até o mês anterior a data_referencia.
+    prob_retroativo: chance de parte do subsídio de um mês ser paga numa folha posterior.
+    ruido: nº máximo de descontos por folha (além dos totais 997/998/999).
+    Cada lançamento: folha (mês da folha), n_folha, direito (mês de direito), natureza,
+    rubrica, descricao, valor, posto e tipo (None para o que não é rubrica alvo).
+    """
+    rng = np.random.default_rng([semente, numero])
+    n_anos = int(rng.integers(anos[0], anos[1] + 1))
+    referencia = pd.Timestamp(pd.to_datetime(data_referencia, dayfirst=True)).normalize()
+    fim = referencia.replace(day=1) - pd.DateOffset(months=1)
+    ingresso = fim - pd.DateOffset(years=n_anos) + pd.Timedelta(days=int(rng.integers(0, 28)))
+
+    trilha = TRILHA_PRACAS if rng.random() < 0.6 else TRILHA_OFICIAIS
+    historico = [{'Data': ingresso, 'Posto': trilha[0]}]
+    data = ingresso
+    for posto in trilha[1:]:
+        data = data + pd.Timedelta(days=int(rng.integers(300, 5 * 365)))
+        if data > fim:
+            break
+        historico.append({'Data': data, 'Posto': posto})
+    datas_promocao = np.array([h['Data'] for h in historico], dtype='datetime64[ns]')
+
+    lancamentos = []
+    def lancar(folha, n_folha, direito, natureza, rubrica, descricao, valor, posto, tipo=None):
+        lancamentos.append({'folha': folha, 'n_folha': n_folha, 'direito': direito, 'natureza': natureza,
+                            'rubrica': rubrica, 'descricao': descricao, 'valor': round(float(valor), 2),
+                            'posto': posto, 'tipo': tipo})
+
+    meses = pd.date_range(ingresso.replace(day=1), fim, freq='MS')
+    mes_ferias = {ano: int(rng.integers(1, 13)) for ano in meses.year.unique()}
+    for mes in meses:
+        # Mês do ingresso (antes do dia da posse) já sai no primeiro posto
+        vigente = int(np.searchsorted(datas_promocao, mes.to_datetime64(), side='right')) - 1
+        posto = historico[max(vigente, 0)]['Posto']
+        trienios = max((mes.year - ingresso.year) // 3, 0)
+        subsidio = round(SUBSIDIO_2020[posto] * 1.04 ** (mes.year - 2020) * 1.03 ** trienios, 2)
+        codigo, descricao = RUBRICAS_ALVO[TIPO_SUBSIDIO]
+
+        # Retroativo: parte do subsídio deste mês sai numa folha de 1 a 4 meses depois
+        if rng.random() < prob_retroativo and mes + pd.DateOffset(months=1) <= fim:
+            parte = round(subsidio * float(rng.uniform(0.1, 0.5)), 2)
+            atraso = int(rng.integers(1, 5))
+            folha_retro = min(mes + pd.DateOffset(months=atraso), fim)
+            lancar(mes, 1, mes, 'Vantagem', codigo, descricao, subsidio - parte, posto, TIPO_SUBSIDIO)
+            lancar(folha_retro, int(rng.integers(2, 11)), mes, 'Vantagem', codigo, descricao, parte, posto,
+                   TIPO_SUBSIDIO)
+        else:
+            lancar(mes, 1, mes, 'Vantagem', codigo, descricao, subsidio, posto, TIPO_SUBSIDIO)
+
+        vantagens = subsidio
+        if mes.month == mes_ferias[mes.year]:
+            codigo_f, descricao_f = RUBRICAS_ALVO[TIPO_FERIAS]
+            lancar(mes, 1, mes, 'Vantagem', codigo_f, descricao_f, subsidio / 3, posto, TIPO_FERIAS)
+            vantagens += round(subsidio / 3, 2)
+        if mes.month == 12:
+            codigo_n, descricao_n = RUBRICAS_ALVO[TIPO_NATALINA]
+            lancar(mes, 5, mes, 'Vantagem', codigo_n, descricao_n, subsidio, posto, TIPO_NATALINA)
+
+        # Ruído da folha: descontos sorteados e os totais
+        descontos = 0.0
+        for i in sorted(rng.choice(len(DESCONTOS), size=int(rng.integers(0, ruido + 1)), replace=False)):
+            codigo_d, descricao_d, fator = DESCONTOS[i]
+            valor = fator if fator > 1 else subsidio * fator * float(rng.uniform(0.8, 1.2))
+            lancar(mes, 1, mes, 'Desconto', codigo_d, descricao_d, valor, posto)
+            descontos += round(valor, 2)
+        lancar(mes, 1, mes, 'Total', '997', 'TOTAL DE VANTAGENS', vantagens, posto)
+        lancar(mes, 1, mes, 'Total', '998', 'TOTAL DE DESCONTOS', descontos, posto)
+        lancar(mes, 1, mes, 'Total', '999', 'TOTAL LIQUIDO', vantagens - descontos, posto)
+
+    lancamentos.sort(key=lambda l: (l['folha'], l['n_folha'], l['natureza'] == 'Total'))
+    return {
+        'nome': f"MILITAR SINTETICO {numero:05d}",
+        'matricula': f"{int(rng.integers(1_000_000, 9_999_999))}",
+        'ingresso': ingresso,
+        'historico': historico,
+        'lancamentos': lancamentos,
+    }
+
+def gabarito(militar):
+    """ O que um leitor perfeito devolve: Competencia, Tipo, Valor_Achado e Posto (consolidado). """
+    consolidador = ConsolidadorFicha()
+    for l in militar['lancamentos']:
+        if l['tipo'] is not None:
+            consolidador.adicionar(RegistroFicha(_competencia_do_leitor(l['direito'], l['tipo']), l['tipo'],
+                                                 l['valor'], l['posto']))
+    return consolidador.para_dataframe().rename(columns={'Cargo_Detectado': 'Posto'})
+
+
+# --- FORMATOS ---
+# PDF: colunas (x em pontos, largura) no layout do Portal; células quebram em várias linhas
+COLUNAS_PDF = [('Mês/Ano', 28, 40), ('Folha', 72, 22), ('Direito', 96, 40), ('Desc Vant', 140, 40),
+               ('Rubr', 184, 22), ('Descrição', 210, 95), ('Valor', 310, 62), ('Cargo', 378, 70)]
+FONTE_PDF, TAMANHO_PDF, ENTRELINHA_PDF = 'Helvetica', 7, 9
+
+def _quebrar(texto, largura):
+    """ Quebra por palavras para caber na largura da célula (como o Portal faz). """
+    linhas, atual = [], ''
+    for palavra in str(texto).split():
+        tentativa = f"{atual} {palavra}".strip()
+        if atual and stringWidth(tentativa, FONTE_PDF, TAMANHO_PDF) > largura:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = tentativa
+    return linhas + [atual] if atual else linhas or ['']
+
+def _linhas_do_lancamento(l):
+    """ Linhas físicas (lista de (x, texto)) de um lançamento com células quebradas. """
+    codigo_cargo, texto_cargo = CARGOS_FICHA[l['posto']]
+    celulas = [f"{l['folha']:%m/%Y}", str(l['n_folha']), f"{l['direito']:%m/%Y}", l['natureza'], l['rubrica'],
+               l['descricao'], f"R$ {_dinheiro(l['valor'])}", f"{codigo_cargo} {texto_cargo}"]
+    quebradas = [_quebrar(c, largura) for c, (_, _, largura) in zip(celulas, COLUNAS_PDF)]
+    return [[(x, partes[i]) for (_, x, _), partes in zip(COLUNAS_PDF, quebradas) if i < len(partes)]
+            for i in range(max(len(p) for p in quebradas))]
+
+def ficha_pdf(militar, linhas_por_pagina=70, paginas_extras=1):
+    """ Bytes de um PDF no layout do Portal do Servidor. paginas_extras: páginas finais sem lançamentos. """
+    emissao = pd.Timestamp.today()
+    cabecalho = [[(28, f"{emissao:%d/%m/%Y, %H:%M} Portal do Servidor do RN")]]
+    titulo_colunas = [[(x, nome) for nome, x, _ in COLUNAS_PDF]]
+    primeiro_cargo = CARGOS_FICHA[militar['historico'][0]['Posto']][1]
+    identificacao = [
+        [(28, "Governo do Estado do RN"), (300, f"Emissão:{emissao:%d/%m/%Y - %H:%M:%S}")],
+        [(28, "Secretaria de Estado da Administração")],
+        [(28, "Ficha Financeira")],
+        [(28, f"Nome: {militar['nome']}"), (260, f"Matrícula: {militar['matricula']}"), (380, "Vínculo: 1")],
+        [(28, f"Lotação: CORPO DE ALUNOS / CSFA/DAG"), (260, f"Cargo: {primeiro_cargo}")],
+    ]
+
+    # Monta as páginas (listas de linhas físicas); um lançamento nunca é partido entre páginas
+    paginas, atual, ano = [], cabecalho + identificacao + titulo_colunas, None
+    for l in militar['lancamentos']:
+        bloco = _linhas_do_lancamento(l)
+        if l['folha'].year != ano:
+            ano = l['folha'].year
+            bloco = [[(28, "Exercício"), (90, str(ano))]] + bloco
+        if len(atual) + len(bloco) > linhas_por_pagina:
+            paginas.append(atual)
+            atual = cabecalho + titulo_colunas
+        atual = atual + bloco
+    paginas.append(atual)
+    for _ in range(paginas_extras):
+        paginas.append(cabecalho + [[(28, "Secretaria da Administração do RN Versão 6.4.5")], [(28, "Ergon")],
+                                    [(28, "Nome do banco de dados : ERG2016")]])
+
+    buffer = BytesIO()
+    largura, altura = A4
+    c = canvas.Canvas(buffer, pagesize=A4)
+    c.setTitle("Ficha Financeira")
+    for numero, linhas in enumerate(paginas, start=1):
+        c.setFont(FONTE_PDF, TAMANHO_PDF)
+        y = altura - 30
+        for linha in linhas:
+            for x, texto in linha:
+                c.drawString(x, y, texto)
+            y -= ENTRELINHA_PDF
+        c.drawString(28, 20, f"https://portaldoservidor.rn.gov.br/ficha-financeira {numero}/{len(paginas)}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def ficha_html(militar):
+    """ HTML com uma tabela por exercício (cabeçalho que o leitor de HTML mapeia). """
+    colunas = ['Mês/Ano', 'Folha', 'Competência', 'Tipo', 'Nome da Rubrica', 'Rubrica', 'Valor', 'Cargo']
+    partes = ["<html><head><meta charset='utf-8'><title>Ficha Financeira</title></head><body>",
+              f"<h1>Ficha Financeira</h1><p>Nome: {html.escape(militar['nome'])} - "
+              f"Matrícula: {militar['matricula']}</p>"]
+    por_ano = {}
+    for l in militar['lancamentos']:
+        por_ano.setdefault(l['folha'].year, []).append(l)
+    for ano, lancamentos in por_ano.items():
+        partes.append(f"<h2>Exercício {ano}</h2><table border='1'><tr>" +
+                      "".join(f"<th>{html.escape(c)}</th>" for c in colunas) + "</tr>")
+        for l in lancamentos:
+            codigo_cargo, texto_cargo = CARGOS_FICHA[l['posto']]
+            celulas = [f"{l['folha']:%m/%Y}", l['n_folha'], f"{l['direito']:%m/%Y}", l['natureza'],
+                       l['descricao'], l['rubrica'], f"R$ {_dinheiro(l['valor'])}", texto_cargo]
+            partes.append("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in celulas) + "</tr>")
+        partes.append("</table>")
+    partes.append("</body></html>")
+    return "\n".join(partes)
+
+def ficha_csv(militar, prob_linha_invalida=0.02, semente=0):
+    """
+    Modelo Manual (Competencia;Valor;Cargo), só com as rubricas alvo, data no padrão dos leitores.
+    Ruído: linhas vazias e valores ilegíveis, que o leitor deve ignorar.
+    """
+    rng = np.random.default_rng([semente, int(militar['matricula'])])
+    linhas = ["Competencia;Valor;Cargo"]
+    for l in militar['lancamentos']:
+        if l['tipo'] is None:
+            continue
+        if rng.random() < prob_linha_invalida:
+            linhas.append(rng.choice([";;", f"{l['direito']:%d/%m/%Y};-;", f"{l['direito']:%d/%m/%Y};0,00;"]))
+        competencia = _competencia_do_leitor(l['direito'], l['tipo'])
+        linhas.append(f"{competencia:%d/%m/%Y};{_dinheiro(l['valor'])};{CARGOS_FICHA[l['posto']][1]}")
+    return "\n".join(linhas) + "\n"
+
+def gerar_ficha(formato, militar, **opcoes):
+    """ Bytes da ficha no formato pedido ('pdf', 'html' ou 'csv'). """
+    if formato == 'pdf':
+        return ficha_pdf(militar, **opcoes)
+    if formato == 'html':
+        return ficha_html(militar).encode('utf-8')
+    if formato == 'csv':
+        return ficha_csv(militar).encode('utf-8')
+    raise ValueError(f"Formato desconhecido: {formato}")
+
+
+# --- LOTE EM DISCO ---
+def gerar_lote(pasta, quantidade, formatos=('pdf', 'html', 'csv'), semente=0, opcoes_militar=None, opcoes_pdf=None,
+               data_referencia=DATA_REFERENCIA):
+    """
+    Grava 'quantidade' militares (fichas até data_referencia, ver gerar_militar) em cada formato na pasta, mais:
+        gabarito.csv  (Arquivo;Competencia;Tipo;Valor_Achado;Posto)
+        carreiras.csv (Arquivo;Ingresso;Data;Posto)
+    O gabarito já vem filtrado pelos tipos que o leitor de cada formato reconhece.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    gabaritos, carreiras = [], []
+    for numero in range(quantidade):
+        militar = gerar_militar(semente, numero, data_referencia=data_referencia, **(opcoes_militar or {}))
+        esperado = gabarito(militar)
+        for formato in formatos:
+            nome = f"ficha_{numero:05d}{EXTENSOES[formato]}"
+            opcoes = (opcoes_pdf or {}) if formato == 'pdf' else {}
+            with open(os.path.join(pasta, nome), 'wb') as f:
+                f.write(gerar_ficha(formato, militar, **opcoes))
+            gabaritos.append(esperado[esperado['Tipo'].isin(TIPOS_LIDOS[formato])].assign(Arquivo=nome))
+            carreiras.append(pd.DataFrame(militar['historico']).assign(Arquivo=nome, Ingresso=militar['ingresso']))
+
+    pd.concat(gabaritos, ignore_index=True)[['Arquivo', 'Competencia', 'Tipo', 'Valor_Achado', 'Posto']] \
+        .to_csv(os.path.join(pasta, 'gabarito.csv'), sep=';', index=False)
+    pd.concat(carreiras, ignore_index=True)[['Arquivo', 'Ingresso', 'Data', 'Posto']] \
+        .to_csv(os.path.join(pasta, 'carreiras.csv'), sep=';', index=False)
+    return pasta
+
+
+# --- MEDIÇÃO DOS LEITORES ---
+def conferir_leitura(lido, esperado, tolerancia=0.005):
+    """ Compara o DataFrame de um leitor com o gabarito: contagens de certos, errados, faltando e sobrando. """
+    chave = ['Competencia', 'Tipo']
+    lido = lido[chave + ['Valor_Achado']] if not lido.empty else pd.DataFrame(columns=chave + ['Valor_Achado'])
+    cruzado = pd.merge(esperado[chave + ['Valor_Achado']], lido, on=chave, how='outer',
+                       suffixes=('_esperado', '_lido'), indicator=True)
+    ambos = cruzado[cruzado['_merge'] == 'both']
+    certos = (ambos['Valor_Achado_esperado'] - ambos['Valor_Achado_lido']).abs() <= tolerancia
+    return {
+        'certos': int(certos.sum()),
+        'valor_errado': int((~certos).sum()),
+        'faltando': int((cruzado['_merge'] == 'left_only').sum()),
+        'sobrando': int((cruzado['_merge'] == 'right_only').sum()),
+        'exemplos': cruzado[(cruzado['_merge'] != 'both') | ~cruzado.index.isin(ambos[certos].index)].head(3),
+    }
+
+def medir_leitores(quantidade, formatos=('pdf', 'html', 'csv'), semente=0, opcoes_militar=None, opcoes_pdf=None,
+                   data_referencia=DATA_REFERENCIA):
+    """
+    Gera as fichas (até data_referencia) em memória e mede cada leitor (leitor_fichas.extrair_dados_arquivo):
+    vazão (fichas/s, registros/s, MB/s) e acerto contra o gabarito. Retorna dict por formato.
+    """
+    from leitor_fichas import extrair_dados_arquivo
+
+    resultado = {f: {'fichas': 0, 'bytes': 0, 'segundos': 0.0, 'registros': 0, 'certos': 0, 'valor_errado': 0,
+                     'faltando': 0, 'sobrando': 0, 'erros': 0, 'exemplos': []} for f in formatos}
+    for numero in range(quantidade):
+        militar = gerar_militar(semente, numero, data_referencia=data_referencia, **(opcoes_militar or {}))
+        esperado = gabarito(militar)
+        for formato in formatos:
+            opcoes = (opcoes_pdf or {}) if formato == 'pdf' else {}
+            conteudo = gerar_ficha(formato, militar, **opcoes)
+            r = resultado[formato]
+            inicio = time.perf_counter()
+            try:
+                lido = extrair_dados_arquivo(f"ficha_{numero:05d}{EXTENSOES[formato]}", conteudo)
+            except Exception as e:
+                r['erros'] += 1
+                r['exemplos'].append(f"ficha {numero}: {e}")
+                continue
+            finally:
+                r['segundos'] += time.perf_counter() - inicio
+            r['fichas'] += 1
+            r['bytes'] += len(conteudo)
+            r['registros'] += len(lido)
+            conferencia = conferir_leitura(lido, esperado[esperado['Tipo'].isin(TIPOS_LIDOS[formato])])
+            for campo in ('certos', 'valor_errado', 'faltando', 'sobrando'):
+                r[campo] += conferencia[campo]
+            if not conferencia['exemplos'].empty and len(r['exemplos']) < 5:
+                r['exemplos'].append(f"ficha {numero}:\n{conferencia['exemplos'].to_string(index=False)}")
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fichas sintéticas (PDF/HTML/CSV) com gabarito')
+    parser.add_argument('--quantidade', type=int, default=100)
+    parser.add_argument('--formatos', nargs='+', choices=sorted(EXTENSOES), default=['pdf', 'html', 'csv'])
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--anos', type=int, nargs=2, default=[3, 15], metavar=('MIN', 'MAX'),
+                        help='Anos de serviço cobertos pela ficha')
+    parser.add_argument('--retroativos', type=float, default=0.05, help='Chance de retroativo por mês')
+    parser.add_argument('--ruido', type=int, default=3, help='Máximo de descontos por folha')
+    parser.add_argument('--linhas-por-pagina', type=int, default=70)
+    parser.add_argument('--paginas-extras', type=int, default=1, help='Páginas finais sem lançamentos (PDF)')
+    parser.add_argument('--data-referencia', default=f"{DATA_REFERENCIA:%d/%m/%Y}",
+                        help='Fichas vão até o mês anterior a esta data (DD/MM/AAAA)')
+    parser.add_argument('--pasta', default='fichas_sinteticas')
+    parser.add_argument('--medir', action='store_true', help='Mede vazão e acerto dos leitores (sem gravar)')
+    args = parser.parse_args()
+
+    opcoes_militar = {'anos': tuple(args.anos), 'prob_retroativo': args.retroativos, 'ruido': args.ruido}
+    opcoes_pdf = {'linhas_por_pagina': args.linhas_por_pagina, 'paginas_extras': args.paginas_extras}
+    if not args.medir:
+        inicio = time.perf_counter()
+        gerar_lote(args.pasta, args.quantidade, args.formatos, args.semente, opcoes_militar, opcoes_pdf,
+                   args.data_referencia)
+        print(f"{args.quantidade * len(args.formatos)} fichas em {args.pasta}/ "
+              f"({time.perf_counter() - inicio:.1f}s) + gabarito.csv e carreiras.csv")
+    else:
+        for formato, r in medir_leitores(args.quantidade, args.formatos, args.semente,
+                                         opcoes_militar, opcoes_pdf, args.data_referencia).items():
+            total = r['certos'] + r['valor_errado'] + r['faltando']
+            segundos = max(r['segundos'], 1e-9)
+            print(f"{formato}: {r['fichas']} fichas, {r['erros']} com erro | {r['fichas'] / segundos:.1f} fichas/s, "
+                  f"{r['registros'] / segundos:.0f} registros/s, {r['bytes'] / segundos / 1e6:.2f} MB/s")
+            print(f"     acerto {r['certos']}/{total} | valor errado {r['valor_errado']} | "
+                  f"faltando {r['faltando']} | sobrando {r['sobrando']}")
+            for exemplo in r['exemplos']:
+                print("    ", exemplo.replace('\n', '\n     '))
@@ -3,36 +3,81 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.pdfbase.pdfdoc import PDFStream, PDFZCompress
 from io import BytesIO
-import locale
+import numpy as np
 import pandas as pd # Adicione o import do Pandas, pois ele é fundamental para df_final
 
-# Tenta configurar moeda para Brasil
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
-    pass
-
-def formatar_moeda(valor):
-    try:
-        # Usa o método do locale para formatação de moeda brasileira (R$ 1.234,56)
-        # O ReportLab aceita strings formatadas
-        return locale.currency(valor, symbol=False, grouping=True)
-    except:
-        # Se o locale falhar (como no ambiente Streamlit/Cloud), usa a formatação manual
-        try:
-            return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        except:
-            return str(valor)
-
-def formatar_data(data):
-    try:
-        # Usa a formatação do Pandas para lidar com Timestamps
-        if isinstance(data, pd.Timestamp):
-            return data.strftime("%m/%Y")
-        return data.strftime("%m/%Y")
-    except:
-        return str(data)
+from formatacao import FORMATO_DATA, moeda, decimal, percentual, data, linhas
+from perfil_memoria import etapa, perfilar
+
+# Formatação pt-BR pelas colunas inteiras (formatacao.py): sem locale do processo e sem laço por célula
+def _fatores_texto(competencias, ipca, juros, selic, corte):
+    """ Colunas IPCA-E / Juros / SELIC (%) do laudo: '-' onde o fator não se aplica (IPCA: do corte em diante). """
+    competencias = pd.to_datetime(pd.Series(competencias)).dt.to_period('M').dt.to_timestamp().to_numpy()
+    ipca, juros, selic = (np.asarray(v, dtype=float) for v in (ipca, juros, selic))
+    return (np.where(competencias < np.datetime64(corte, 'D'), decimal(ipca, 10, milhar=False), "-"),
+            np.where(juros > 0, decimal(juros, 10, milhar=False), "-"),
+            np.where(selic > 0, percentual(selic), "-"))
+
+# --- REGIME DE ACUMULAÇÃO (core.REGIMES) ---
+# O laudo descreve o regime e o corte da EC 113 da tabela de fatores usada (df_fatores.attrs);
+# sem a tabela, vale o padrão do cálculo (soma simples, Selic desde dez/2021).
+CORTE_PADRAO = pd.Timestamp('2021-12-01')
+ACUMULACAO_JUROS = {'soma': '', 'composto': ', capitalizada mês a mês', 'selic_acumulada': ''}
+ACUMULACAO_SELIC = {'soma': 'Soma Simples', 'composto': 'Capitalização Composta',
+                    'selic_acumulada': 'série SelicAcumulada publicada'}
+MESES_ABREV = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+
+def _mes_abrev(mes):
+    return f"{MESES_ABREV[mes.month - 1]}/{mes.year}"
+
+def _regime_do_laudo(df_fatores):
+    """ (regime, mês do corte) da tabela de fatores; padrão do cálculo sem ela. """
+    atributos = df_fatores.attrs if df_fatores is not None else {}
+    corte = atributos.get('data_corte_selic')
+    return atributos.get('regime') or 'soma', CORTE_PADRAO if corte is None else pd.Timestamp(corte).replace(day=1)
+
+# --- PERFIL COMPACTO ---
+# Laudos em lote vão para arquivo e para o peticionamento eletrônico, que limita o tamanho do PDF.
+# compacto=True: tabelas só com filetes (sem grade, fundo do cabeçalho e linhas zebradas), linhas mais
+# baixas (mais meses por página) e streams só com Flate, sem a camada ASCII85 (texto 7 bits, ~25% maior)
+# que o reportlab põe por padrão. As fontes já são só as 14 padrão do PDF (Helvetica), não embutidas.
+# O ASCII85 é decidido por documento (canvas do perfil), sem alterar rl_config.useA85, que é global ao
+# processo: laudos padrão e compactos podem ser montados ao mesmo tempo em outras sessões/threads.
+class _CanvasCompacto(Canvas):
+    """ Canvas do perfil compacto: conteúdo das páginas só com Flate, sem a camada ASCII85. """
+    def save(self):
+        if len(self._code): self.showPage()
+        for pagina in self._doc.Pages.pages:
+            # Com Contents já pronto, o reportlab não monta o stream com os filtros globais
+            if pagina.compression and not pagina.Contents and pagina.stream:
+                fluxo = PDFStream(content=pagina.stream, filters=[PDFZCompress])
+                fluxo.__Comment__ = "page stream"
+                pagina.Contents = fluxo
+        super().save()
+
+def _estilo_tabela(compacto, *comandos):
+    """ Estilo comum das tabelas do laudo (cabeçalho em negrito) + os comandos próprios de cada uma. """
+    if compacto:
+        base = [
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('LINEBELOW', (0,0), (-1,0), 0.5, colors.black),
+            ('LINEBELOW', (0,-1), (-1,-1), 0.5, colors.black),
+            ('TOPPADDING', (0,0), (-1,-1), 1),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+            ('LEFTPADDING', (0,0), (-1,-1), 2),
+            ('RIGHTPADDING', (0,0), (-1,-1), 2),
+        ]
+    else:
+        base = [
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
+        ]
+    return TableStyle(base + list(comandos))
 
 # Seu DataFrame de exemplo (substitua pelos nomes reais das colunas de índices)
 # Se o seu df_final não tiver estas colunas, o código vai falhar.
@@ -44,7 +89,16 @@ Colunas NECESSÁRIAS em df_final para o novo laudo:
 'IPCA_Acumulado', 'Juros_Fator', 'Selic_Acumulada', 'Valor_Atualizado'
 """
 
-def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_historico):
+@perfilar('laudo.gerar_pdf')
+def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_historico, df_fatores=None, previa=False,
+              compacto=False, memorial_unico=False):
+    """
+    df_fatores: tabela de fatores usada na atualização (core.obter_tabela_fatores) -> Anexo III.
+    previa=True: só a primeira página (identificação, carreira e resumo); ver gerar_previa.
+    compacto=True: PDF menor para arquivo/peticionamento (ver PERFIL COMPACTO).
+    memorial_unico=True: memorial nominal e atualização numa tabela só (uma linha por mês/rubrica).
+    """
+    regime, corte = _regime_do_laudo(df_fatores)
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1.5*cm, leftMargin=1.5*cm, topMargin=2*cm, bottomMargin=2*cm)
     elementos = []
@@ -100,22 +154,12 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
     
     if not df_historico.empty:
         df_historico_ord = df_historico.sort_values('Data')
-        
-        for idx, row in df_historico_ord.iterrows():
-            linha = [
-                row['Data'].strftime('%d/%m/%Y'), 
-                str(row['Posto'])
-        ]
-            linhas_hist.append(linha)
+        linhas_hist = linhas(data(df_historico_ord['Data'], FORMATO_DATA), df_historico_ord['Posto'].astype(str))
 
     tabela_hist = Table(cabecalho_hist + linhas_hist, colWidths=[4*cm, 10*cm])
-    tabela_hist.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    tabela_hist.setStyle(_estilo_tabela(compacto,
         ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-    ]))
+    ))
     elementos.append(tabela_hist)
     elementos.append(Spacer(1, 1*cm))
     
@@ -129,9 +173,9 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
 
     dados_resumo = [
         ["RESUMO DOS CÁLCULOS", ""],
-        ["1. Diferença de Subsídio (Principal Nominal)", f"R$ {formatar_moeda(total_principal)}"],
-        ["2. Atualização (IPCA-E) + Juros + SELIC", f"R$ {formatar_moeda(total_acessorios)}"],
-        ["TOTAL DA CONDENAÇÃO", f"R$ {formatar_moeda(total_final_causa)}"]
+        ["1. Diferença de Subsídio (Principal Nominal)", moeda(total_principal, prefixo="R$ ")],
+        ["2. Atualização (IPCA-E) + Juros + SELIC", moeda(total_acessorios, prefixo="R$ ")],
+        ["TOTAL DA CONDENAÇÃO", moeda(total_final_causa, prefixo="R$ ")]
     ]
 
     tabela_resumo = Table(dados_resumo, colWidths=[10*cm, 5*cm])
@@ -151,6 +195,15 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
     elementos.append(tabela_resumo)
     elementos.append(Spacer(1, 1*cm))
 
+    # --- PRÉVIA: PARA AQUI (SEM MEMÓRIA DE CÁLCULO, NOTAS E ANEXOS) ---
+    if previa:
+        elementos.append(Paragraph("PRÉVIA: a memória de cálculo mês a mês, a nota metodológica e os anexos "
+                                   "constam do laudo completo.", estilo_nota))
+        with etapa('laudo.render_previa'):
+            _montar(doc, elementos, compacto)
+        buffer.seek(0)
+        return buffer
+
     # --- 5. TÍTULO GERAL CENTRALIZADO ---
     elementos.append(Paragraph("MEMÓRIA DE CÁLCULO DETALHADA MÊS A MÊS", estilo_titulo_principal))
     elementos.append(Spacer(1, 0.2*cm))
@@ -159,121 +212,111 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
 
     # ... (código anterior)
 
-    # -----------------------------------------------------
-    # 💡 SEÇÃO 5A: TABELA 1 - MEMORIAL DE CÁLCULO NOMINAL
-    # -----------------------------------------------------
-    elementos.append(Paragraph("Memorial de Cálculo (Valores Nominais)", estilo_subtitulo))
-    
-    # Colunas: Mês/Ref; Tipo; Posto/Grad; Nível; Devido; Recebido; Diferença.
-    cabecalho_nominal = [
-        'Mês/Ref', 'Tipo', 'Posto/Grad', 'Nível', 
-        'Devido', 'Recebido', 'Diferença'
-    ]
-    linhas_nominais = []
-    
     # Filtra linhas zeradas
     df_imprimir = df_final[(df_final['Valor_Devido'] > 0) | (df_final['Valor_Pago'] > 0)].copy()
 
-
-    for idx, row in df_imprimir.iterrows():
-        # Calcula Diferença: max(devido - recebido, 0)
-        diferenca = max(row['Valor_Devido'] - row['Valor_Pago'], 0)
-        
-        linha = [
-            row['Competencia'].strftime('%m/%Y'),
-            # 💡 USA A NOVA COLUNA CRIADA NO CORE:
-            row['Rubrica_Tipo'], 
-            row['Posto_Grad'], 
-            str(row['Nivel']), 
-            formatar_moeda(row['Valor_Devido']),
-            formatar_moeda(row['Valor_Pago']),
-            formatar_moeda(diferenca)
-        ]
-        linhas_nominais.append(linha)
-
-
-    col_widths_nominal = [2*cm, 2.5*cm, 2.5*cm, 1.5*cm, 2.5*cm, 2.5*cm, 2.5*cm]
-    tabela_nominal = Table([cabecalho_nominal] + linhas_nominais, colWidths=col_widths_nominal, repeatRows=1)
-    
-    tabela_nominal.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        # Alinha valores monetários à direita
-        ('ALIGN', (4,1), (-1,-1), 'RIGHT'), 
-        ('FONTSIZE', (0,0), (-1,-1), 8),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-    ]))
-    elementos.append(tabela_nominal)
-    elementos.append(Spacer(1, 1.0*cm))
-
-
-    # -----------------------------------------------------
-    # 💡 SEÇÃO 5B: TABELA 2 - ATUALIZAÇÃO DOS VALORES DEVIDOS
-    # -----------------------------------------------------
-    elementos.append(Paragraph("Atualização Monetária e Juros", estilo_subtitulo))
-    
-    # Colunas: Mês/Ref; Diferença; IPCA-E; Juros de Mora; Selic; Valor atualizado.
-    cabecalho_atualizacao = [
-        'Mês/Ref', 'Principal', 
-        'IPCA-E', 'Juros Mora', 'SELIC (%)', 
-        'Valor Atualizado'
+    # Diferença: max(devido - recebido, 0)
+    diferenca_nominal = (df_imprimir['Valor_Devido'] - df_imprimir['Valor_Pago']).clip(lower=0)
+    colunas_nominais = [
+        data(df_imprimir['Competencia']),
+        # 💡 USA A NOVA COLUNA CRIADA NO CORE:
+        df_imprimir['Rubrica_Tipo'].astype(str),
+        df_imprimir['Posto_Grad'].astype(str),
+        df_imprimir['Nivel'].astype(str),
+        moeda(df_imprimir['Valor_Devido']),
+        moeda(df_imprimir['Valor_Pago']),
+        moeda(diferenca_nominal),
     ]
-    linhas_atualizacao = []
-    
-    # NOTA: O DF 'df_imprimir' já foi filtrado acima.
-    Data_inicio_SELIC = pd.to_datetime('2021-12-01')
-    
-    for idx, row in df_imprimir.iterrows():
-        # Diferença: max(devido - recebido, 0) - Recalculada para garantir consistência
-        diferenca_nominal = max(row['Valor_Devido'] - row['Valor_Pago'], 0)
-        
-        # Recupera os fatores ou valores de atualização (ASSUME nomes de colunas do seu Core)
-        ipca_perc = row['IPCA_Fator']
-        juros_perc = row['Juros_Fator']
-        selic_perc = row['Selic_Fator'] * 100 # Assumindo que este é o fator acumulado
-        
-
-        linha = [
-            row['Competencia'].strftime('%m/%Y'),
-            formatar_moeda(diferenca_nominal),
-            f"{ipca_perc:.10f}" if row['Competencia'].replace(day=1) <= Data_inicio_SELIC else "-",
-            f"{juros_perc:.10f}" if juros_perc > 0 else "-",
-            f"{selic_perc:.2f}%" if selic_perc > 0 else "-",
-            formatar_moeda(row['Total_Final']) # ASSUME que 'Total_Final' é o Valor Atualizado
+    # Fatores: IPCA só até a virada para a SELIC; Selic_Fator é o acumulado (impresso em %)
+    colunas_fatores = _fatores_texto(df_imprimir['Competencia'], df_imprimir['IPCA_Fator'], df_imprimir['Juros_Fator'],
+                                     df_imprimir['Selic_Fator'], corte)
+    valor_atualizado = moeda(df_imprimir['Total_Final']) # 'Total_Final' é o Valor Atualizado
+
+    if memorial_unico:
+        # -----------------------------------------------------
+        # SEÇÃO 5: TABELA ÚNICA - NOMINAL + ATUALIZAÇÃO (mesmas linhas das duas tabelas)
+        # -----------------------------------------------------
+        elementos.append(Paragraph("Memorial de Cálculo (Valores Nominais, Atualização Monetária e Juros)", estilo_subtitulo))
+        cabecalho_unico = [
+            'Mês/Ref', 'Tipo', 'Posto/Grad', 'Nível', 'Devido', 'Recebido', 'Diferença',
+            'IPCA-E', 'Juros Mora', 'SELIC (%)', 'Atualizado'
+        ]
+        col_widths_unico = [1.3*cm, 1.8*cm, 2.0*cm, 0.7*cm, 1.5*cm, 1.5*cm, 1.5*cm, 2.0*cm, 2.0*cm, 1.2*cm, 1.9*cm]
+        tabela_unica = Table([cabecalho_unico] + linhas(*colunas_nominais, *colunas_fatores, valor_atualizado),
+                             colWidths=col_widths_unico, repeatRows=1)
+        tabela_unica.setStyle(_estilo_tabela(compacto,
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            # Alinha valores monetários à direita
+            ('ALIGN', (4,1), (6,-1), 'RIGHT'),
+            ('ALIGN', (10,1), (10,-1), 'RIGHT'),
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+        ))
+        elementos.append(tabela_unica)
+        elementos.append(Spacer(1, 1.0*cm))
+    else:
+        # -----------------------------------------------------
+        # 💡 SEÇÃO 5A: TABELA 1 - MEMORIAL DE CÁLCULO NOMINAL
+        # -----------------------------------------------------
+        elementos.append(Paragraph("Memorial de Cálculo (Valores Nominais)", estilo_subtitulo))
+
+        # Colunas: Mês/Ref; Tipo; Posto/Grad; Nível; Devido; Recebido; Diferença.
+        cabecalho_nominal = [
+            'Mês/Ref', 'Tipo', 'Posto/Grad', 'Nível', 
+            'Devido', 'Recebido', 'Diferença'
+        ]
+        col_widths_nominal = [2*cm, 2.5*cm, 2.5*cm, 1.5*cm, 2.5*cm, 2.5*cm, 2.5*cm]
+        tabela_nominal = Table([cabecalho_nominal] + linhas(*colunas_nominais), colWidths=col_widths_nominal, repeatRows=1)
+
+        tabela_nominal.setStyle(_estilo_tabela(compacto,
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            # Alinha valores monetários à direita
+            ('ALIGN', (4,1), (-1,-1), 'RIGHT'), 
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+        ))
+        elementos.append(tabela_nominal)
+        elementos.append(Spacer(1, 1.0*cm))
+
+
+        # -----------------------------------------------------
+        # 💡 SEÇÃO 5B: TABELA 2 - ATUALIZAÇÃO DOS VALORES DEVIDOS
+        # -----------------------------------------------------
+        elementos.append(Paragraph("Atualização Monetária e Juros", estilo_subtitulo))
+
+        # Colunas: Mês/Ref; Diferença; IPCA-E; Juros de Mora; Selic; Valor atualizado.
+        cabecalho_atualizacao = [
+            'Mês/Ref', 'Principal', 
+            'IPCA-E', 'Juros Mora', 'SELIC (%)', 
+            'Valor Atualizado'
         ]
-        linhas_atualizacao.append(linha)
+        # NOTA: O DF 'df_imprimir' já foi filtrado acima; a diferença é a mesma da tabela nominal.
+        linhas_atualizacao = linhas(colunas_nominais[0], colunas_nominais[-1], *colunas_fatores, valor_atualizado)
 
-    col_widths_atualizacao = [2*cm, 2.5*cm, 2*cm, 2*cm, 2*cm, 3.5*cm]
-    tabela_atualizacao = Table([cabecalho_atualizacao] + linhas_atualizacao, colWidths=col_widths_atualizacao, repeatRows=1)
-    
-    tabela_atualizacao.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('ALIGN', (0,0), (-1,0), 'CENTER'),
-        # Centraliza fatores (IPCA, Juros, Selic)
-        ('ALIGN', (2,1), (4,-1), 'CENTER'), 
-        # Alinha valores monetários à direita
-        ('ALIGN', (1,1), (1,-1), 'RIGHT'), 
-        ('ALIGN', (5,1), (5,-1), 'RIGHT'), 
-        ('FONTSIZE', (0,0), (-1,-1), 8),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-    ]))
-    elementos.append(tabela_atualizacao)
-    elementos.append(Spacer(1, 1.0*cm))
+        col_widths_atualizacao = [2*cm, 2.5*cm, 2*cm, 2*cm, 2*cm, 3.5*cm]
+        tabela_atualizacao = Table([cabecalho_atualizacao] + linhas_atualizacao, colWidths=col_widths_atualizacao, repeatRows=1)
+
+        tabela_atualizacao.setStyle(_estilo_tabela(compacto,
+            ('ALIGN', (0,0), (-1,0), 'CENTER'),
+            # Centraliza fatores (IPCA, Juros, Selic)
+            ('ALIGN', (2,1), (4,-1), 'CENTER'), 
+            # Alinha valores monetários à direita
+            ('ALIGN', (1,1), (1,-1), 'RIGHT'), 
+            ('ALIGN', (5,1), (5,-1), 'RIGHT'), 
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+        ))
+        elementos.append(tabela_atualizacao)
+        elementos.append(Spacer(1, 1.0*cm))
 
 
     # --- 6. NOTA METODOLÓGICA ---
     # ... (restante do seu código)
     elementos.append(Paragraph("<b>NOTA METODOLÓGICA:</b>", estilo_normal))
-    texto_nota = """
+    ate, desde = _mes_abrev(corte - pd.DateOffset(months=1)), _mes_abrev(corte)
+    texto_nota = f"""
     1. O cálculo apura as diferenças remuneratórias decorrentes da aplicação incorreta do escalonamento vertical e progressão de níveis.<br/>
     2. Respeitou-se a prescrição quinquenal a partir da data de ajuizamento.<br/>
-    3. <b>Correção Monetária:</b> Aplicação do IPCA-E (Índices Acumulados) até nov/2021.<br/>
-    4. <b>Juros de Mora:</b> Aplicação da remuneração da Caderneta de Poupança (Lei 11.960/09) até nov/2021, incidindo a partir do mês subsequente ao vencimento.<br/>
-    5. <b>Atualização EC 113/21:</b> A partir de dez/2021, aplica-se exclusivamente a Taxa SELIC acumulada (Soma Simples).<br/>
+    3. <b>Correção Monetária:</b> Aplicação do IPCA-E (Índices Acumulados) até {ate}.<br/>
+    4. <b>Juros de Mora:</b> Aplicação da remuneração da Caderneta de Poupança (Lei 11.960/09) até {ate}, incidindo a partir do mês subsequente ao vencimento{ACUMULACAO_JUROS[regime]}.<br/>
+    5. <b>Atualização EC 113/21:</b> A partir de {desde}, aplica-se exclusivamente a Taxa SELIC acumulada ({ACUMULACAO_SELIC[regime]}).<br/>
     """
     elementos.append(Paragraph(texto_nota, estilo_nota))
     
@@ -288,27 +331,19 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
     elementos.append(Spacer(1, 0.2*cm))
 
     cabecalho_lei = [['Data Início', 'Data Fim', 'Valor Base', 'Norma Legal']]
-    linhas_lei = []
-    
-    for idx, row in df_tabela_lei.iterrows():
-        norma = row.get('Norma', 'LCE 515/2014')
-        linha = [
-            formatar_data(row['Data_Inicio']),
-            formatar_data(row['Data_Fim']),
-            formatar_moeda(row['Valor']),
-            str(norma)
-        ]
-        linhas_lei.append(linha)
+    normas = df_tabela_lei['Norma'].astype(str) if 'Norma' in df_tabela_lei.columns else ['LCE 515/2014'] * len(df_tabela_lei)
+    linhas_lei = linhas(
+        data(df_tabela_lei['Data_Inicio']),
+        data(df_tabela_lei['Data_Fim']),
+        moeda(df_tabela_lei['Valor']),
+        normas,
+    )
 
     tabela_lei = Table(cabecalho_lei + linhas_lei, colWidths=[3*cm, 3*cm, 4*cm, 7*cm])
-    tabela_lei.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    tabela_lei.setStyle(_estilo_tabela(compacto,
         ('ALIGN', (0,0), (-1,-1), 'CENTER'),
         ('ALIGN', (3,1), (3,-1), 'LEFT'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-    ]))
+    ))
     elementos.append(tabela_lei)
     elementos.append(Spacer(1, 1*cm))
 
@@ -317,29 +352,17 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
     elementos.append(Spacer(1, 0.2*cm))
 
     cabecalho_esc = [['Posto / Graduação', 'Percentual (%)']]
-    linhas_esc = []
-    
-    for idx, row in df_escalonamento.iterrows():
-        # Trata percentual para exibição
-        perc_texto = str(row['Percentual']).replace('.', ',')
-        # Se for decimal pequeno (ex: 0.2), converte pra 20%
-        try:
-            val = float(str(row['Percentual']).replace(',', '.'))
-            if val < 1.5: val = val * 100
-            perc_texto = f"{val:.2f}%"
-        except: pass
-            
-        linha = [row['Posto'], perc_texto]
-        linhas_esc.append(linha)
+    # Trata percentual para exibição: aceita '20', '20,5' ou fração (0.2 -> 20%); o que não for número sai como veio
+    perc_bruto = df_escalonamento['Percentual'].astype(str)
+    perc_valor = pd.to_numeric(perc_bruto.str.replace(',', '.', regex=False), errors='coerce')
+    perc_valor = perc_valor.where(perc_valor >= 1.5, perc_valor * 100)
+    perc_texto = np.where(perc_valor.notna(), percentual(perc_valor / 100), perc_bruto.str.replace('.', ',', regex=False))
+    linhas_esc = linhas(df_escalonamento['Posto'], perc_texto)
 
     tabela_esc = Table(cabecalho_esc + linhas_esc, colWidths=[10*cm, 4*cm])
-    tabela_esc.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    tabela_esc.setStyle(_estilo_tabela(compacto,
         ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.white]),
-    ]))
+    ))
     elementos.append(tabela_esc)
     elementos.append(Spacer(1, 0.5*cm))
 
@@ -352,6 +375,129 @@ def gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_histo
     """
     elementos.append(Paragraph(nota_aspirante, estilo_nota))
 
-    doc.build(elementos)
+    # --- 10. ANEXO III: TABELA DE FATORES DE ATUALIZAÇÃO ---
+    if df_fatores is not None and not df_fatores.empty and not df_final.empty:
+        elementos.append(Spacer(1, 1*cm))
+        elementos.append(Paragraph("ANEXO III: TABELA DE FATORES DE ATUALIZAÇÃO", estilo_subtitulo))
+        data_calculo = df_fatores.attrs.get('data_calculo')
+        origem = f"Índices: snapshot {df_fatores.attrs.get('snapshot_indices', '-')}"
+        if data_calculo is not None:
+            origem += f" | Data de cálculo: {data(data_calculo, FORMATO_DATA)}"
+        if df_fatores.attrs.get('regime') is not None:
+            origem += f" | Acumulação: {regime}, Selic desde {corte:%m/%Y}"
+        elementos.append(Paragraph(f"Fatores comuns a todos os cálculos na mesma data. {origem}.", estilo_nota))
+        elementos.append(Spacer(1, 0.2*cm))
+
+        # Só os meses do período calculado
+        competencias = pd.to_datetime(df_final['Competencia'])
+        periodo = df_fatores[(df_fatores['Competencia'] >= competencias.min().replace(day=1)) &
+                             (df_fatores['Competencia'] <= competencias.max())]
+        cabecalho_fatores = [['Mês/Ref', 'IPCA-E', 'Juros Mora', 'SELIC (%)', 'Fator Total']]
+        fator_total = periodo['IPCA_Fator'] * (1 + periodo['Juros_Fator']) * (1 + periodo['Selic_Fator'])
+        linhas_fatores = linhas(
+            data(periodo['Competencia']),
+            *_fatores_texto(periodo['Competencia'], periodo['IPCA_Fator'], periodo['Juros_Fator'], periodo['Selic_Fator'], corte),
+            decimal(fator_total, 10, milhar=False),
+        )
+
+        tabela_fatores = Table(cabecalho_fatores + linhas_fatores, colWidths=[2.5*cm, 3.5*cm, 3.5*cm, 2.5*cm, 3.5*cm],
+                               repeatRows=1)
+        tabela_fatores.setStyle(_estilo_tabela(compacto,
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+        ))
+        elementos.append(tabela_fatores)
+
+    # Montagem das tabelas (flowables) = laudo.gerar_pdf menos esta etapa
+    with etapa('laudo.render'):
+        _montar(doc, elementos, compacto)
     buffer.seek(0)
     return buffer
+
+def _montar(doc, elementos, compacto):
+    doc.build(elementos, canvasmaker=_CanvasCompacto if compacto else Canvas)
+
+# --- PRÉVIA ---
+def gerar_previa(df_final, dados_militar, df_historico):
+    """ Primeira página do laudo (identificação, carreira e resumo), para conferir antes de baixar o completo. """
+    return gerar_pdf(df_final, dados_militar, None, None, df_historico, previa=True)
+
+# --- MEDIÇÃO DOS PERFIS ---
+PERFIS = {
+    'padrao': {},
+    'compacto': {'compacto': True},
+    'compacto_memorial_unico': {'compacto': True, 'memorial_unico': True},
+}
+
+def medir_perfis(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_historico, df_fatores=None, repeticoes=3):
+    """ Tamanho, páginas e tempo médio de cada perfil do laudo para o mesmo caso (e a razão contra o padrão). """
+    import time
+    import pypdfium2
+    medidas = {}
+    for nome, opcoes in PERFIS.items():
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            pdf = gerar_pdf(df_final, dados_militar, df_tabela_lei, df_escalonamento, df_historico,
+                            df_fatores=df_fatores, **opcoes).getvalue()
+        segundos = (time.perf_counter() - inicio) / repeticoes
+        documento = pypdfium2.PdfDocument(pdf)
+        medidas[nome] = {'bytes': len(pdf), 'paginas': len(documento), 'ms': round(segundos * 1000, 1)}
+        documento.close()
+    padrao = medidas['padrao']
+    for medida in medidas.values():
+        medida['bytes_vs_padrao'] = round(medida['bytes'] / padrao['bytes'], 3)
+        medida['tempo_vs_padrao'] = round(medida['ms'] / padrao['ms'], 3)
+    return medidas
+
+def imagem_previa(pdf, escala=1.0):
+    """ PNG da primeira página de um PDF (pypdfium2, que já vem com o pdfplumber). """
+    import pypdfium2
+    conteudo = pdf.getvalue() if hasattr(pdf, 'getvalue') else pdf
+    documento = pypdfium2.PdfDocument(conteudo)
+    try:
+        imagem = documento[0].render(scale=escala).to_pil()
+    finally:
+        documento.close()
+    saida = BytesIO()
+    imagem.save(saida, format='PNG')
+    return saida.getvalue()
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Tamanho e tempo de montagem do laudo em cada perfil (caso de exemplo)')
+    parser.add_argument('--ficha', help='Ficha (PDF/HTML/CSV) para o confronto de valores pagos')
+    parser.add_argument('--ingresso', default='01/02/2010')
+    parser.add_argument('--ajuizamento', default='15/03/2025')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', help='Grava as medidas em JSON')
+    args = parser.parse_args()
+
+    from core import carregar_referencias, executar_calculo
+
+    historico = [
+        {'Data': args.ingresso, 'Posto': 'Soldado'},
+        {'Data': '21/04/2014', 'Posto': 'Cabo'},
+        {'Data': '25/12/2022', 'Posto': '2º Tenente'},
+    ]
+    pagamentos = None
+    if args.ficha:
+        from leitor_fichas import extrair_dados_arquivo
+        with open(args.ficha, 'rb') as f:
+            pagamentos = extrair_dados_arquivo(args.ficha, f.read())
+
+    carregar_referencias()
+    calc, resultado = executar_calculo(args.ingresso, args.ajuizamento, historico, df_pagamentos=pagamentos)
+    dados_militar = {'nome': 'Medição', 'inicio': calc.data_ingresso, 'ajuizamento': calc.data_ajuizamento}
+    df_escalonamento = pd.read_csv('dados/escalonamento.csv', sep=';')
+    medidas = medir_perfis(resultado, dados_militar, calc.df_tabela_lei.copy(), df_escalonamento, calc.df_carreira.copy(),
+                           df_fatores=calc.tabela_fatores(), repeticoes=args.repeticoes)
+    for nome, m in medidas.items():
+        print(f"{nome:<25} {m['bytes'] / 1024:>8.1f} KB ({m['bytes_vs_padrao']:.0%}) | {m['paginas']:>3} páginas "
+              f"| {m['ms']:>7.1f} ms ({m['tempo_vs_padrao']:.0%})")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(medidas, f, ensure_ascii=False, indent=2)
+        print(f"Medidas: {args.saida}")
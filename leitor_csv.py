@@ -1,72 +1,63 @@
 import pandas as pd
-import streamlit as st
 
-def extrair_dados_csv(arquivo_csv):
+from registros_ficha import RegistroFicha, ErroLeituraFicha, consolidar_registros, tipo_pelo_dia
+
+def ler_registros_csv(arquivo_csv, linhas_por_bloco=1000):
     """
-    Lê um arquivo CSV padronizado (Modelo Manual) com as colunas:
+    Gerador: lê um arquivo CSV padronizado (Modelo Manual) com as colunas
     Competencia; Valor; Cargo
+    e entrega um RegistroFicha por linha válida, em blocos (o arquivo não é carregado inteiro).
+    O tipo vem do dia da competência (13 = 13º Salário, 15 = Férias, demais = Subsídio).
+    Levanta ErroLeituraFicha se o arquivo não puder ser lido ou faltar coluna.
     """
     try:
         # Lê o CSV usando ponto e vírgula como separador (Padrão Excel Brasil)
-        df = pd.read_csv(arquivo_csv, sep=';', dtype=str)
-        
-        # Limpa nomes das colunas (remove espaços extras)
-        df.columns = df.columns.str.strip().str.lower()
-        
-        # Verifica se as colunas obrigatórias existem
-        colunas_necessarias = ['competencia', 'valor', 'cargo']
-        if not all(col in df.columns for col in colunas_necessarias):
-            st.error("O arquivo CSV precisa ter as colunas: 'Competencia', 'Valor' e 'Cargo'.")
-            return pd.DataFrame()
+        blocos = pd.read_csv(arquivo_csv, sep=';', dtype=str, chunksize=linhas_por_bloco)
+
+        for df in blocos:
+            # Limpa nomes das colunas (remove espaços extras)
+            df.columns = df.columns.str.strip().str.lower()
+
+            # Verifica se as colunas obrigatórias existem
+            colunas_necessarias = ['competencia', 'valor', 'cargo']
+            if not all(col in df.columns for col in colunas_necessarias):
+                raise ErroLeituraFicha("O arquivo CSV precisa ter as colunas: 'Competencia', 'Valor' e 'Cargo'.")
+
+            for data_str, valor_str, cargo_str in zip(df['competencia'], df['valor'], df['cargo']):
+                data_str = str(data_str).strip()
+                valor_str = str(valor_str).strip()
+                cargo_str = str(cargo_str).strip().upper()
 
-        dados_formatados = []
+                # Pula linhas vazias
+                if not data_str or not valor_str:
+                    continue
 
-        for index, row in df.iterrows():
-            data_str = str(row['competencia']).strip()
-            valor_str = str(row['valor']).strip()
-            cargo_str = str(row['cargo']).strip().upper()
-            
-            # Pula linhas vazias
-            if not data_str or not valor_str:
-                continue
+                # Tratamento do Valor (Aceita 1000,00 ou 1000.00)
+                valor_str = valor_str.replace('R$', '').replace(' ', '')
+                if ',' in valor_str:
+                    valor_str = valor_str.replace('.', '').replace(',', '.')
 
-            # Tratamento do Valor (Aceita 1000,00 ou 1000.00)
-            valor_str = valor_str.replace('R$', '').replace(' ', '')
-            if ',' in valor_str:
-                valor_str = valor_str.replace('.', '').replace(',', '.')
-            
-            try:
-                val_final = float(valor_str)
-                
-                # Só adiciona se tiver valor
-                if val_final > 0:
-                    dados_formatados.append({
-                        'Competencia': data_str,
-                        'Valor_Achado': val_final,
-                        'Cargo_Detectado': cargo_str
-                    })
-            except:
-                continue # Pula linha com valor inválido
+                try:
+                    val_final = float(valor_str)
+                except ValueError:
+                    continue # Pula linha com valor inválido
 
-        # Consolidação Final
-        if dados_formatados:
-            df_final = pd.DataFrame(dados_formatados)
-            # Converte data (espera formato DD/MM/AAAA ou MM/AAAA)
-            df_final['Competencia'] = pd.to_datetime(df_final['Competencia'], dayfirst=True, errors='coerce')
-            
-            # Remove datas inválidas (NaT)
-            df_final = df_final.dropna(subset=['Competencia'])
-            
-            # Soma valores de mesma competência
-            df_final = df_final.groupby('Competencia', as_index=False).agg({
-                'Valor_Achado': 'sum',
-                'Cargo_Detectado': 'first'
-            })
-            
-            return df_final.sort_values('Competencia')
-        
-        return pd.DataFrame()
+                # Só entrega se tiver valor e data válida (DD/MM/AAAA ou MM/AAAA)
+                if not val_final > 0:
+                    continue
+                competencia = pd.to_datetime(data_str, dayfirst=True, errors='coerce')
+                if pd.isna(competencia):
+                    continue
+                yield RegistroFicha(competencia, tipo_pelo_dia(competencia.day), val_final, cargo_str)
 
+    except ErroLeituraFicha:
+        raise
     except Exception as e:
-        st.error(f"Erro ao ler CSV: {e}")
-        return pd.DataFrame()
+        raise ErroLeituraFicha(f"Erro ao ler CSV: {e}") from e
+
+def extrair_dados_csv(arquivo_csv):
+    """
+    Lê o CSV do Modelo Manual e soma valores de mesma competência
+    (uma linha por Competencia/Tipo, ordenado por data).
+    """
+    return consolidar_registros(ler_registros_csv(arquivo_csv))
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import pandas as pd
+
+from leitor_pdf import extrair_dados_pdf, ler_registros_pdf
+from leitor_html import extrair_dados_html, ler_registros_html
+from leitor_csv import extrair_dados_csv, ler_registros_csv
+from registros_ficha import TIPO_SUBSIDIO, tipo_pelo_dia
+
+def extrair_dados_arquivo(nome, conteudo):
+    """
+    Seletor de leitura pela extensão do arquivo (mesma regra do app).
+    Recebe o nome e os bytes do arquivo; devolve o DataFrame do leitor correspondente.
+    """
+    nome = nome.lower()
+    if nome.endswith('.csv'):
+        return extrair_dados_csv(BytesIO(conteudo))
+    elif nome.endswith('.pdf'):
+        return extrair_dados_pdf(BytesIO(conteudo))
+    return extrair_dados_html(conteudo.decode('utf-8', errors='ignore'))
+
+def ler_registros_arquivo(nome, conteudo):
+    """
+    Versão em fluxo de extrair_dados_arquivo: gerador de RegistroFicha (competencia, tipo, valor, cargo)
+    entregues à medida que o arquivo é lido. Consolide com registros_ficha.ConsolidadorFicha.
+    """
+    nome = nome.lower()
+    if nome.endswith('.csv'):
+        return ler_registros_csv(BytesIO(conteudo))
+    elif nome.endswith('.pdf'):
+        return ler_registros_pdf(BytesIO(conteudo))
+    return ler_registros_html(conteudo.decode('utf-8', errors='ignore'))
+
+def criar_pool_leitura(max_workers=None):
+    """
+    Pool de processos para a leitura em paralelo, com início por forkserver: os workers não nascem
+    de um fork do processo (o servidor do Streamlit tem várias threads, e um fork herdaria travas
+    seguradas por elas). Crie uma vez e reaproveite (app: st.cache_resource).
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context('forkserver'))
+
+def _ler_com_erro(nome, conteudo):
+    """ Versão para o pool: nunca levanta exceção, devolve (df, mensagem de erro). """
+    try:
+        return extrair_dados_arquivo(nome, conteudo), None
+    except Exception as e:
+        return pd.DataFrame(), str(e)
+
+def extrair_dados_arquivos(arquivos, max_workers=None, pool=None):
+    """
+    Lê várias fichas (PDF/HTML/CSV) em paralelo e junta tudo em um único DataFrame
+    com uma linha por (Competencia, Tipo).
+
+    arquivos: lista de (nome, bytes). A ORDEM da lista define a prioridade:
+    se dois arquivos trazem a mesma Competencia/Tipo com valores diferentes,
+    vale o arquivo que aparece por último (o resultado não depende de qual leitura termina antes).
+
+    Retorna (df, relatorio), onde relatorio é um dict com:
+        'arquivos':   registros e erro de leitura por arquivo
+        'duplicados': mesma Competencia/Tipo em mais de um arquivo, com o mesmo valor
+        'conflitos':  mesma Competencia/Tipo com valores diferentes (e qual arquivo venceu)
+        'lacunas':    meses sem Subsídio entre a primeira e a última competência
+
+    pool: pool de leitura já aberto (criar_pool_leitura), reaproveitado entre chamadas; sem ele,
+    um pool temporário é criado para esta chamada.
+    """
+    arquivos = list(arquivos)
+    if len(arquivos) > 1 and pool is not None:
+        futuros = [pool.submit(_ler_com_erro, nome, conteudo) for nome, conteudo in arquivos]
+        lidos = [f.result() for f in futuros]
+    elif len(arquivos) > 1:
+        # Um processo por arquivo (até o nº de CPUs): o tempo total fica perto do arquivo mais lento
+        with criar_pool_leitura(min(max_workers or os.cpu_count() or 1, len(arquivos))) as pool:
+            futuros = [pool.submit(_ler_com_erro, nome, conteudo) for nome, conteudo in arquivos]
+            lidos = [f.result() for f in futuros]
+    else:
+        lidos = [_ler_com_erro(nome, conteudo) for nome, conteudo in arquivos]
+
+    resumo_arquivos = []
+    partes = []
+    for ordem, ((nome, _), (df, erro)) in enumerate(zip(arquivos, lidos)):
+        resumo_arquivos.append({'Arquivo': nome, 'Registros': len(df), 'Erro': erro})
+        if df.empty:
+            continue
+        df = df.copy()
+        df['Competencia'] = pd.to_datetime(df['Competencia'])
+        if 'Tipo' not in df.columns:
+            df['Tipo'] = df['Competencia'].dt.day.map(tipo_pelo_dia)
+        if 'Cargo_Detectado' not in df.columns:
+            df['Cargo_Detectado'] = ''
+        df['Arquivo'] = nome
+        df['_ordem'] = ordem
+        partes.append(df[['Competencia', 'Tipo', 'Valor_Achado', 'Cargo_Detectado', 'Arquivo', '_ordem']])
+
+    relatorio = {
+        'arquivos': pd.DataFrame(resumo_arquivos),
+        'duplicados': pd.DataFrame(columns=['Competencia', 'Tipo', 'Valor_Achado', 'Arquivos']),
+        'conflitos': pd.DataFrame(columns=['Competencia', 'Tipo', 'Valores', 'Arquivos', 'Arquivo_Escolhido']),
+        'lacunas': pd.DatetimeIndex([]),
+    }
+    if not partes:
+        return pd.DataFrame(), relatorio
+
+    df_todos = pd.concat(partes, ignore_index=True).sort_values(['Competencia', 'Tipo', '_ordem'], kind='stable')
+    chave = ['Competencia', 'Tipo']
+
+    # --- SOBREPOSIÇÕES ---
+    repetidos = df_todos[df_todos.duplicated(chave, keep=False)]
+    if not repetidos.empty:
+        grupos = repetidos.groupby(chave, sort=True).agg(
+            Valores=('Valor_Achado', lambda v: [round(x, 2) for x in v]),
+            Arquivos=('Arquivo', list),
+            Arquivo_Escolhido=('Arquivo', 'last'),
+        ).reset_index()
+        iguais = grupos['Valores'].apply(lambda v: len(set(v)) == 1)
+        duplicados = grupos[iguais].copy()
+        duplicados['Valor_Achado'] = duplicados['Valores'].str[0]
+        relatorio['duplicados'] = duplicados[['Competencia', 'Tipo', 'Valor_Achado', 'Arquivos']].reset_index(drop=True)
+        relatorio['conflitos'] = grupos[~iguais].reset_index(drop=True)
+
+    # Regra de conflito: vale o último arquivo da lista
+    df_final = df_todos.drop_duplicates(chave, keep='last').drop(columns=['_ordem'])
+    df_final = df_final.sort_values(['Competencia', 'Tipo']).reset_index(drop=True)
+
+    # --- LACUNAS (meses sem subsídio) ---
+    meses = df_final.loc[df_final['Tipo'] == TIPO_SUBSIDIO, 'Competencia']
+    if not meses.empty:
+        esperados = pd.date_range(meses.min(), meses.max(), freq='MS')
+        relatorio['lacunas'] = esperados.difference(pd.DatetimeIndex(meses.dt.to_period('M').dt.to_timestamp()))
+
+    return df_final, relatorio
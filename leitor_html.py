@@ -1,9 +1,10 @@
 from bs4 import BeautifulSoup
-import pandas as pd
-import streamlit as st
+from datetime import datetime
 import re
 import unicodedata
 
+from registros_ficha import RegistroFicha, ErroLeituraFicha, consolidar_registros, TIPO_SUBSIDIO
+
 def remover_acentos(texto):
     """Remove acentos e coloca em maiúsculo (Ex: 'Subsídio' -> 'SUBSIDIO')"""
     try:
@@ -14,18 +15,17 @@ def remover_acentos(texto):
     except:
         return str(texto).upper()
 
-def extrair_dados_html(conteudo_html):
+def ler_registros_html(conteudo_html):
     """
-    Lê HTML e extrai: Competência, Valor e CARGO.
+    Gerador: lê HTML e entrega um RegistroFicha (Competência, Valor e CARGO) por linha de subsídio.
     Versão Flexível: Normaliza acentos e busca termos parciais.
+    Levanta ErroLeituraFicha se o HTML não puder ser lido.
     """
-    dados_encontrados = []
-    
     try:
         soup = BeautifulSoup(conteudo_html, 'html.parser')
         tabelas = soup.find_all('table')
         
-        if not tabelas: return pd.DataFrame()
+        if not tabelas: return
 
         for tabela in tabelas:
             linhas = tabela.find_all('tr')
@@ -117,31 +117,23 @@ def extrair_dados_html(conteudo_html):
                     if idx_cargo != -1 and len(colunas) > idx_cargo:
                         texto_cargo = remover_acentos(colunas[idx_cargo].get_text(strip=True))
                     
-                    # Salva
+                    # Entrega (competência fora do padrão MM/AAAA é descartada)
                     if re.match(r'\d{2}/\d{4}', texto_data) and valor_final > 0:
-                        dados_encontrados.append({
-                            'Competencia': texto_data,
-                            'Valor_Achado': valor_final,
-                            'Cargo_Detectado': texto_cargo
-                        })
-
-        if dados_encontrados:
-            df = pd.DataFrame(dados_encontrados)
-            df['Competencia'] = pd.to_datetime(df['Competencia'], format='%m/%Y', dayfirst=True, errors='coerce')
-            
-            # Soma valores de mesma competência
-            df = df.groupby('Competencia', as_index=False).agg({
-                'Valor_Achado': 'sum',
-                'Cargo_Detectado': 'first'
-            })
-            
-            return df.sort_values('Competencia')
-        else:
-            return pd.DataFrame()
+                        try:
+                            competencia = datetime.strptime(texto_data, '%m/%Y')
+                        except ValueError:
+                            continue
+                        yield RegistroFicha(competencia, TIPO_SUBSIDIO, valor_final, texto_cargo)
 
     except Exception as e:
-        st.error(f"Erro ao ler HTML: {e}")
-        return pd.DataFrame()
+        raise ErroLeituraFicha(f"Erro ao ler HTML: {e}") from e
+
+def extrair_dados_html(conteudo_html):
+    """
+    Lê HTML e extrai: Competência, Valor e CARGO.
+    Soma valores de mesma competência (uma linha por Competencia/Tipo).
+    """
+    return consolidar_registros(ler_registros_html(conteudo_html))
 
 def limpar_valor(texto):
     try:
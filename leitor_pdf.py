@@ -1,8 +1,15 @@
 import pdfplumber
+from pdfplumber.page import Page
+from pdfminer.pdfpage import PDFPage
+import numpy as np
 import pandas as pd
-import streamlit as st
 import re
 import unicodedata
+import mmap
+from datetime import datetime
+
+from registros_ficha import (RegistroFicha, ErroLeituraFicha, consolidar_registros,
+                             TIPO_SUBSIDIO, TIPO_NATALINA, TIPO_FERIAS)
 
 def remover_acentos(texto):
     """Remove acentos, coloca em maiúsculo e substitui quebras de linha por espaços"""
@@ -69,110 +76,214 @@ def limpar_cargo(texto):
         
     return texto.strip()
 
-def extrair_dados_pdf(arquivo_pdf):
+# Regex Universal:
+# 1. Data (MM/AAAA)
+# 2. Texto qualquer até achar 355 (Rubrica)
+# 3. Valor OBRIGATÓRIO ter decimal
+# 4. Resto (Cargo)
+regex_subsidio = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?355.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
+regex_natalina = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?351.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
+regex_ferias = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?359.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
+
+# Tipo de pagamento -> nome da rubrica no DataFrame final
+NOMES_TIPO = {'mensal': TIPO_SUBSIDIO, 'natalina': TIPO_NATALINA, 'ferias': TIPO_FERIAS}
+
+def interpretar_linha(linha):
     """
-    Lê PDF e extrai dados.
-    Estratégia: Varredura inteligente em tabelas e texto.
+    Aplica as regras de rubrica (355/351/359) a uma linha de texto da ficha.
+    Retorna (data_final 'DD/MM/AAAA', tipo_pagamento, valor, cargo) ou None.
     """
-    dados_encontrados = []
+    linha_limpa = remover_acentos(linha)
     
-    # Regex Universal:
-    # 1. Data (MM/AAAA)
-    # 2. Texto qualquer até achar 355 (Rubrica)
-    # 3. Valor OBRIGATÓRIO ter decimal
-    # 4. Resto (Cargo)
-    regex_subsidio = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?355.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
-    regex_natalina = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?351.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
-    regex_ferias = re.compile(r'\d{2}/\d{4}.*?(\d{2}/\d{4}).*?359.*?(\d{1,3}(?:[.,]\d{3})*[.,]\d{2})\s+(.*)')
-    try:
-        with pdfplumber.open(arquivo_pdf) as pdf:
-            for page in pdf.pages:
-                texto_pagina = page.extract_text()
-                if texto_pagina:
-                    for linha in texto_pagina.split('\n'):
-                        linha_limpa = remover_acentos(linha)
-                        
-                        # Filtra linhas de interesse
-                        eh_subsidio = "355" in linha_limpa
-                        eh_natalina = "351" in linha_limpa
-                        eh_ferias   = "359" in linha_limpa # ou "359", confirme seu código
-
-                        # Inicializa variáveis para este loop
-                        match = None
-                        tipo_pagamento = ""
-
-                        # Lógica de decisão
-                        if eh_subsidio:
-                            match = regex_subsidio.search(linha_limpa)
-                            tipo_pagamento = "mensal"
-                        elif eh_natalina:
-                            match = regex_natalina.search(linha_limpa)
-                            tipo_pagamento = "natalina"
-                        elif eh_ferias:
-                            match = regex_ferias.search(linha_limpa)
-                            tipo_pagamento = "ferias"
-
-                        # Se houve match, processa
-                        if match:
-                            data_str = match.group(1)
-                            valor_str = match.group(2)
-                            cargo_str = match.group(3)
-                            
-                            val_final = limpar_dinheiro_inteligente(valor_str)
-                            
-                            if val_final > 0:
-                                # --- PADRONIZAÇÃO DE DATAS ---
-                                try:
-                                    if tipo_pagamento == "natalina":
-                                        # Natalina = Dia 13
-                                        ano = data_str.split('/')[1]
-                                        data_final = f"13/12/{ano}"
-                                        
-                                    elif tipo_pagamento == "ferias":
-                                        # Férias = Dia 15 (Convenção para não misturar)
-                                        mes, ano = data_str.split('/')
-                                        data_final = f"15/{mes}/{ano}"
-                                        
-                                    else: 
-                                        # Mensal = Dia 01
-                                        data_final = f"01/{data_str}"
-                                except:
-                                    data_final = data_str
-
-                                cargo_final = limpar_cargo(cargo_str)
-
-                                dados_encontrados.append({
-                                    'Competencia': data_final,
-                                    'Valor_Achado': val_final,
-                                    'Cargo_Detectado': cargo_final
-                                })
-
-        # --- CONSOLIDAÇÃO FORA DO LOOP ---
-        if dados_encontrados:
-            df = pd.DataFrame(dados_encontrados)
-            
-            # Função interna para aplicar no apply
-            def definir_tipo(row):
-                s = str(row['Competencia'])
-                if s.startswith('13/'): return '13º Salário'
-                if s.startswith('15/'): return 'Férias (1/3)'
-                return 'Subsídio'
+    # Filtra linhas de interesse
+    eh_subsidio = "355" in linha_limpa
+    eh_natalina = "351" in linha_limpa
+    eh_ferias   = "359" in linha_limpa # ou "359", confirme seu código
+
+    # Inicializa variáveis para este loop
+    match = None
+    tipo_pagamento = ""
 
-            df['Tipo'] = df.apply(definir_tipo, axis=1)
+    # Lógica de decisão
+    if eh_subsidio:
+        match = regex_subsidio.search(linha_limpa)
+        tipo_pagamento = "mensal"
+    elif eh_natalina:
+        match = regex_natalina.search(linha_limpa)
+        tipo_pagamento = "natalina"
+    elif eh_ferias:
+        match = regex_ferias.search(linha_limpa)
+        tipo_pagamento = "ferias"
+
+    if not match:
+        return None
 
-            # Converte para data com segurança (DD/MM/AAAA)
-            df['Competencia'] = pd.to_datetime(df['Competencia'], dayfirst=True, errors='coerce')
+    data_str = match.group(1)
+    valor_str = match.group(2)
+    cargo_str = match.group(3)
+    
+    val_final = limpar_dinheiro_inteligente(valor_str)
+    if val_final <= 0:
+        return None
+
+    # --- PADRONIZAÇÃO DE DATAS ---
+    try:
+        if tipo_pagamento == "natalina":
+            # Natalina = Dia 13
+            ano = data_str.split('/')[1]
+            data_final = f"13/12/{ano}"
             
-            # Agrupa (caso haja férias parceladas no mesmo mês, ele soma)
-            df = df.groupby(['Competencia', 'Tipo'], as_index=False).agg({
-                'Valor_Achado': 'sum',
-                'Cargo_Detectado': 'first'
-            })
+        elif tipo_pagamento == "ferias":
+            # Férias = Dia 15 (Convenção para não misturar)
+            mes, ano = data_str.split('/')
+            data_final = f"15/{mes}/{ano}"
             
-            return df.sort_values(['Competencia'])
-        else:
-            return pd.DataFrame()
+        else: 
+            # Mensal = Dia 01
+            data_final = f"01/{data_str}"
+    except:
+        data_final = data_str
+
+    return data_final, tipo_pagamento, val_final, limpar_cargo(cargo_str)
+
+def registro_da_linha(linha):
+    """ interpretar_linha no formato comum dos leitores (RegistroFicha), ou None. """
+    resultado = interpretar_linha(linha)
+    if not resultado:
+        return None
+    data_final, tipo_pagamento, val_final, cargo_final = resultado
+    try:
+        competencia = datetime.strptime(data_final, '%d/%m/%Y')
+    except ValueError:
+        return None
+    return RegistroFicha(competencia, NOMES_TIPO[tipo_pagamento], val_final, cargo_final)
 
+def _registros_das_paginas(paginas):
+    for page in paginas:
+        texto_pagina = page.extract_text()
+        if texto_pagina:
+            for linha in texto_pagina.split('\n'):
+                registro = registro_da_linha(linha)
+                if registro:
+                    yield registro
+
+def ler_registros_pdf(arquivo_pdf):
+    """
+    Gerador: entrega cada RegistroFicha assim que a linha é lida (página a página).
+    Levanta ErroLeituraFicha se o PDF não puder ser lido.
+    """
+    try:
+        with pdfplumber.open(arquivo_pdf) as pdf:
+            yield from _registros_das_paginas(pdf.pages)
+    except ErroLeituraFicha:
+        raise
     except Exception as e:
-        st.error(f"Erro ao ler PDF: {e}")
-        return pd.DataFrame()
+        raise ErroLeituraFicha(f"Erro ao ler PDF: {e}") from e
+
+def extrair_dados_pdf(arquivo_pdf):
+    """
+    Lê PDF e extrai dados.
+    Estratégia: Varredura inteligente em tabelas e texto.
+    Uma linha por (Competencia, Tipo); férias parceladas no mesmo mês são somadas.
+    """
+    return consolidar_registros(ler_registros_pdf(arquivo_pdf))
+
+# --- MODO DE MEMÓRIA LIMITADA (fichas muito grandes, lidas do disco) ---
+def _cache_de_objetos(pdf):
+    """
+    Cache de objetos do pdfminer (PDFDocument._cached_objs): atributo interno, sem API pública para
+    esvaziá-lo. A versão do pdfminer.six fica fixada no requirements.txt; se o atributo mudar numa
+    atualização, a leitura falha aqui em vez de perder o limite de memória sem aviso.
+    """
+    cache = getattr(pdf.doc, '_cached_objs', None)
+    if not isinstance(cache, dict):
+        raise RuntimeError("pdfminer sem PDFDocument._cached_objs: revise _paginas_liberando_cache para esta versão")
+    return cache
+
+def _paginas_liberando_cache(pdf):
+    """
+    Percorre as páginas uma a uma sem guardar os objetos de layout.
+    pdf.pages mantém todas as páginas (e seus caracteres) vivas até o fechamento;
+    aqui cada página é fechada logo após o uso e o cache de objetos do pdfminer
+    é esvaziado, então a memória fica limitada ao tamanho de uma página.
+    """
+    cache = _cache_de_objetos(pdf)
+    doctop = 0
+    for i, pagina_miner in enumerate(PDFPage.create_pages(pdf.doc)):
+        pagina = Page(pdf, pagina_miner, page_number=i + 1, initial_doctop=doctop)
+        try:
+            yield pagina
+        finally:
+            doctop += pagina.height
+            pagina.close()
+            # Sem limpar o cache do documento, todo objeto já lido fica em memória
+            cache.clear()
+
+def ler_registros_pdf_caminho(caminho, usar_mmap=False):
+    """
+    Gerador de memória limitada: lê direto do disco (ou de um memory map, se usar_mmap=True)
+    e libera o cache de cada página após a leitura.
+    """
+    try:
+        with open(caminho, 'rb') as arquivo:
+            fonte = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) if usar_mmap else arquivo
+            try:
+                with pdfplumber.open(fonte) as pdf:
+                    yield from _registros_das_paginas(_paginas_liberando_cache(pdf))
+            finally:
+                if usar_mmap:
+                    fonte.close()
+    except ErroLeituraFicha:
+        raise
+    except Exception as e:
+        raise ErroLeituraFicha(f"Erro ao ler PDF: {e}") from e
+
+def extrair_dados_pdf_caminho(caminho, usar_mmap=False):
+    """
+    Mesma saída de extrair_dados_pdf, mas com memória limitada (para fichas de milhares de páginas):
+    páginas liberadas uma a uma (ler_registros_pdf_caminho) e registros somados à medida que chegam
+    pela mesma consolidação dos outros leitores (registros_ficha.ConsolidadorFicha).
+    """
+    return consolidar_registros(ler_registros_pdf_caminho(caminho, usar_mmap))
+
+# --- MEDIÇÃO DE PICO DE MEMÓRIA ---
+def _medir_no_processo(caminho, modo, conexao):
+    import resource
+    import time
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    if modo == 'padrao':
+        with open(caminho, 'rb') as f:
+            df = extrair_dados_pdf(f)
+    else:
+        df = extrair_dados_pdf_caminho(caminho, usar_mmap=(modo == 'mmap'))
+    conexao.send({
+        'modo': modo,
+        'registros': len(df),
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'pico_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'acrescimo_rss_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_kb) / 1024, 1),
+    })
+    conexao.close()
+
+def medir_pico_memoria(caminho, modo='limitado'):
+    """
+    Pico de RSS (ru_maxrss) da extração em um processo filho isolado.
+    modo: 'padrao' (extrair_dados_pdf), 'limitado' (extrair_dados_pdf_caminho) ou 'mmap'.
+    Só Linux/macOS (módulo resource).
+    """
+    import multiprocessing
+    receptor, emissor = multiprocessing.Pipe(duplex=False)
+    processo = multiprocessing.Process(target=_medir_no_processo, args=(caminho, modo, emissor))
+    processo.start()
+    resultado = receptor.recv()
+    processo.join()
+    return resultado
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print("Uso: python leitor_pdf.py ficha.pdf")
+        sys.exit(1)
+    for modo in ('padrao', 'limitado', 'mmap'):
+        print(medir_pico_memoria(sys.argv[1], modo))
@@ -0,0 +1,306 @@
+"""
+Laudos em lote (ação coletiva): um PDF por caso, gerados num pool de processos e gravados num ZIP
+em disco à medida que ficam prontos, com um índice CSV dos totais ao lado (laudos.zip -> laudos_indice.csv).
+
+Casos no mesmo JSON do servidor (servidor.py: data_ingresso, data_ajuizamento, historico, pagamentos...),
+mais "nome" e, opcional, "arquivo" (nome do PDF dentro do ZIP; padrão: posição no lote + nome).
+Todo o lote usa uma data de cálculo só (a pedida ou a de hoje), gravada no índice: a retomada em outro
+dia continua com a mesma data, e os laudos do lote saem iguais aos de uma execução sem queda.
+O regime de acumulação e o corte da EC 113 (core.REGIMES) e o perfil do laudo (compacto, memorial único)
+também valem para o lote todo e vão para o índice; retomar pedindo outra data, regime, corte ou perfil é
+recusado (use outro ZIP).
+Memória limitada: no máximo 'por_worker' laudos por processo em andamento ou esperando gravação;
+cada PDF vai para o disco assim que chega e não fica guardado.
+
+Retomada: o índice é o diário do lote, uma linha por laudo gravado no ZIP (escrita depois do laudo).
+Rodar de novo com os mesmos casos e o mesmo ZIP pula os laudos já gravados. Se o processo caiu no
+meio, o ZIP fica sem o diretório central: ele é reconstruído com as entradas inteiras (CRC conferido)
+que também estão no índice, e o resto é refeito. Casos com erro ficam no índice com a mensagem, não
+vão para o ZIP e são tentados de novo na retomada.
+
+Uso:
+    python lote_laudos.py casos.json laudos.zip --workers 4 --compacto
+    python lote_laudos.py --sinteticos 200 laudos.zip
+"""
+import argparse
+import json
+import os
+import re
+import struct
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import pandas as pd
+
+from core import DATA_CORTE_SELIC, REGIME_PADRAO, REGIMES
+
+COLUNAS_INDICE = ['Arquivo', 'Nome', 'Data_Ingresso', 'Data_Ajuizamento', 'Data_Calculo', 'Regime', 'Corte_Selic',
+                  'Compacto', 'Memorial_Unico', 'Principal', 'Acessorios', 'Total', 'Bytes', 'Segundos', 'Erro']
+
+
+# --- FUNÇÕES DOS WORKERS (executadas no pool de processos) ---
+def _aquecer_worker():
+    """ Inicializador do pool: referências, tabela de fatores e reportlab prontos no processo. """
+    from core import carregar_referencias, obter_tabela_fatores
+    import gerador_pdf  # noqa: F401
+    carregar_referencias()
+    obter_tabela_fatores()
+
+def _laudo_com_erro(caso):
+    """ Versão para o pool: nunca levanta exceção, devolve (pdf, totais, mensagem de erro, segundos). """
+    from servidor import laudo_do_caso
+    inicio = time.perf_counter()
+    try:
+        pdf, totais = laudo_do_caso(caso)
+        return pdf, totais, None, time.perf_counter() - inicio
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}", time.perf_counter() - inicio
+
+
+# --- NOMES E ÍNDICE ---
+def nome_no_zip(caso, posicao):
+    """ Nome estável do PDF no ZIP (a retomada reconhece os laudos prontos por ele). """
+    if caso.get('arquivo'):
+        return caso['arquivo']
+    nome = re.sub(r'\W+', '_', str(caso.get('nome', '')).strip()).strip('_')
+    return f"LAUDO_{posicao:05d}{'_' + nome if nome else ''}.pdf"
+
+def caminho_indice(caminho_zip):
+    return os.path.splitext(caminho_zip)[0] + '_indice.csv'
+
+def _ler_indice(caminho):
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return pd.DataFrame(columns=COLUNAS_INDICE)
+    textos = ['Arquivo', 'Nome', 'Data_Calculo', 'Regime', 'Corte_Selic', 'Compacto', 'Memorial_Unico', 'Erro']
+    indice = pd.read_csv(caminho, sep=';', decimal=',', dtype=dict.fromkeys(textos, str))
+    return indice.reindex(columns=COLUNAS_INDICE)
+
+def _gravar_indice(df, caminho):
+    """ Reescreve o índice inteiro (arquivo temporário + troca, como a tabela de fatores). """
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    df[COLUNAS_INDICE].to_csv(temporario, sep=';', decimal=',', index=False)
+    os.replace(temporario, caminho)
+
+def _linha_indice(arquivo, caso, totais, erro, tamanho, segundos):
+    totais = totais or {}
+    return {
+        'Arquivo': arquivo,
+        'Nome': caso.get('nome', ''),
+        'Data_Ingresso': caso.get('data_ingresso'),
+        'Data_Ajuizamento': caso.get('data_ajuizamento'),
+        'Data_Calculo': caso.get('data_calculo'),
+        'Regime': caso.get('regime'),
+        'Corte_Selic': caso.get('data_corte_selic'),
+        'Compacto': bool(caso.get('compacto')),
+        'Memorial_Unico': bool(caso.get('memorial_unico')),
+        'Principal': round(totais['principal'], 2) if totais else None,
+        'Acessorios': round(totais['acessorios'], 2) if totais else None,
+        'Total': round(totais['total'], 2) if totais else None,
+        'Bytes': tamanho,
+        'Segundos': round(segundos, 3),
+        'Erro': erro or '',
+    }
+
+
+# --- ZIP: RECUPERAÇÃO DEPOIS DE UMA QUEDA ---
+def _entradas_inteiras(caminho):
+    """
+    Entradas completas de um ZIP sem diretório central (gravação interrompida), lidas pelos
+    cabeçalhos locais em sequência: {nome: conteúdo}. Para na primeira entrada cortada ou com CRC errado.
+    """
+    entradas = {}
+    with open(caminho, 'rb') as f:
+        while True:
+            cabecalho = f.read(zipfile.sizeFileHeader)
+            if len(cabecalho) < zipfile.sizeFileHeader or cabecalho[:4] != zipfile.stringFileHeader:
+                break
+            (_, _, _, flags, metodo, _, _, crc, tamanho_comprimido, _, tamanho_nome,
+             tamanho_extra) = struct.unpack(zipfile.structFileHeader, cabecalho)
+            # Bit 3: tamanhos num descritor depois dos dados (não usado em arquivo com seek)
+            if flags & 0x08 or metodo not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                break
+            nome = f.read(tamanho_nome).decode('utf-8' if flags & 0x800 else 'cp437')
+            f.seek(tamanho_extra, os.SEEK_CUR)
+            dados = f.read(tamanho_comprimido)
+            if len(dados) < tamanho_comprimido:
+                break
+            conteudo = zlib.decompress(dados, -15) if metodo == zipfile.ZIP_DEFLATED else dados
+            if zlib.crc32(conteudo) != crc:
+                break
+            entradas[nome] = conteudo
+    return entradas
+
+def _preparar_zip(caminho, registrados):
+    """
+    Deixa o ZIP só com os laudos que estão no índice ('registrados') e devolve os nomes dele.
+    ZIP íntegro e sem sobras: usado como está. Cortado (queda) ou com sobras: reconstruído.
+    """
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return set()
+    try:
+        with zipfile.ZipFile(caminho) as zf:
+            nomes = set(zf.namelist())
+            if nomes <= registrados:
+                return nomes
+            entradas = {nome: zf.read(nome) for nome in nomes & registrados}
+    except zipfile.BadZipFile:
+        entradas = {nome: conteudo for nome, conteudo in _entradas_inteiras(caminho).items() if nome in registrados}
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(temporario, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in entradas.items():
+            zf.writestr(nome, conteudo)
+    os.replace(temporario, caminho)
+    return set(entradas)
+
+def _fixar_no_lote(indice, coluna, pedido, padrao, data=False, logico=False):
+    """
+    Valor do lote para uma coluna do índice: na retomada, o já gravado (pedir outro é erro: o ZIP
+    misturaria laudos); num lote novo, o pedido ou o padrão.
+    data=True: compara como DD/MM/AAAA; logico=True: sim/não (no CSV, True/False).
+    """
+    if pedido is not None and data:
+        pedido = pd.to_datetime(pedido, dayfirst=True).strftime('%d/%m/%Y')
+    if pedido is not None and logico:
+        pedido = bool(pedido)
+    anteriores = indice[coluna].dropna()
+    if logico:
+        anteriores = anteriores.map({'True': True, 'False': False}).dropna()
+    if not len(anteriores):
+        return padrao if pedido is None else pedido
+    if pedido is not None and pedido != anteriores.iloc[0]:
+        raise ValueError(f"Lote retomado com {coluna} = {anteriores.iloc[0]}, diferente do pedido ({pedido}): use outro ZIP")
+    return anteriores.iloc[0]
+
+
+# --- LOTE ---
+def gerar_lote_laudos(casos, caminho_zip, workers=None, compacto=None, memorial_unico=None, por_worker=2,
+                      data_calculo=None, regime=None, data_corte_selic=None):
+    """
+    Gera o laudo de cada caso e grava no ZIP na ordem em que ficam prontos (retoma um lote interrompido).
+    compacto / memorial_unico: perfil do laudo para todos os casos (ver gerador_pdf), salvo se o caso disser outro;
+    sem eles, os do índice (retomada) ou o perfil padrão.
+    data_calculo (DD/MM/AAAA): padrão para os casos; sem ela, a do índice (retomada) ou a de hoje.
+    regime / data_corte_selic: acumulação dos índices para os casos (ver core.REGIMES); sem eles, os do
+    índice (retomada) ou o padrão. Retomar pedindo valores diferentes dos do índice levanta ValueError.
+    Retorna o resumo: gravados nesta execução, já prontos, erros, segundos e tamanho do ZIP.
+    """
+    casos = list(casos)
+    nomes = [nome_no_zip(caso, posicao) for posicao, caso in enumerate(casos)]
+    repetidos = sorted({nome for nome in nomes if nomes.count(nome) > 1})
+    if repetidos:
+        raise ValueError(f"Nomes de arquivo repetidos no lote: {repetidos[:5]}")
+
+    arquivo_indice = caminho_indice(caminho_zip)
+    indice = _ler_indice(arquivo_indice)
+    indice = indice[indice['Erro'].fillna('') == '']
+    prontos = _preparar_zip(caminho_zip, set(indice['Arquivo']))
+    # Índice = diário: só os laudos que estão de fato no ZIP (erros e linhas órfãs saem e são refeitos)
+    _gravar_indice(indice[indice['Arquivo'].isin(prontos)], arquivo_indice)
+
+    data_calculo = _fixar_no_lote(indice, 'Data_Calculo', data_calculo, pd.Timestamp.today().strftime('%d/%m/%Y'), data=True)
+    regime = _fixar_no_lote(indice, 'Regime', regime, REGIME_PADRAO)
+    data_corte_selic = _fixar_no_lote(indice, 'Corte_Selic', data_corte_selic, DATA_CORTE_SELIC.strftime('%d/%m/%Y'),
+                                      data=True)
+    compacto = _fixar_no_lote(indice, 'Compacto', compacto, False, logico=True)
+    memorial_unico = _fixar_no_lote(indice, 'Memorial_Unico', memorial_unico, False, logico=True)
+    padrao = {'compacto': compacto, 'memorial_unico': memorial_unico, 'data_calculo': data_calculo,
+              'regime': regime, 'data_corte_selic': data_corte_selic}
+    pendentes = iter([(posicao, {**padrao, **caso}) for posicao, caso in enumerate(casos) if nomes[posicao] not in prontos])
+    workers = workers or os.cpu_count() or 1
+    limite = workers * por_worker
+    gravados, erros = 0, []
+    inicio = time.perf_counter()
+
+    with open(caminho_zip, 'r+b' if os.path.exists(caminho_zip) else 'w+b') as arquivo, \
+            zipfile.ZipFile(arquivo, 'a', compression=zipfile.ZIP_DEFLATED) as zf, \
+            open(arquivo_indice, 'a', encoding='utf-8', newline='') as f_indice, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_aquecer_worker) as pool:
+        em_andamento = {}
+
+        def submeter():
+            for posicao, caso in islice(pendentes, limite - len(em_andamento)):
+                em_andamento[pool.submit(_laudo_com_erro, caso)] = (posicao, caso)
+
+        submeter()
+        while em_andamento:
+            feitos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                posicao, caso = em_andamento.pop(futuro)
+                pdf, totais, erro, segundos = futuro.result()
+                if erro is None:
+                    zf.writestr(nomes[posicao], pdf)
+                    arquivo.flush()
+                    gravados += 1
+                else:
+                    erros.append({'caso': posicao, 'arquivo': nomes[posicao], 'erro': erro})
+                # Linha do índice só depois do laudo no disco: o que está no índice está no ZIP
+                linha = _linha_indice(nomes[posicao], caso, totais, erro, len(pdf) if pdf else 0, segundos)
+                pd.DataFrame([linha], columns=COLUNAS_INDICE).to_csv(
+                    f_indice, sep=';', decimal=',', index=False, header=f_indice.tell() == 0)
+                f_indice.flush()
+                del pdf
+            submeter()
+
+    return {
+        'casos': len(casos),
+        'gravados': gravados,
+        'ja_prontos': len(prontos),
+        'erros': erros,
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'zip_bytes': os.path.getsize(caminho_zip),
+        'indice': arquivo_indice,
+    }
+
+def casos_sinteticos(quantidade, semente=0, data_ajuizamento=None):
+    """ Casos de teste a partir dos militares sintéticos (gerador_fichas), sem ficha de pagamentos. """
+    from gerador_fichas import gerar_militar
+    ajuizamento = data_ajuizamento or pd.Timestamp.today().strftime('%d/%m/%Y')
+    casos = []
+    for numero in range(quantidade):
+        militar = gerar_militar(semente, numero)
+        casos.append({
+            'nome': militar['nome'],
+            'data_ingresso': militar['ingresso'].strftime('%d/%m/%Y'),
+            'data_ajuizamento': ajuizamento,
+            'historico': [{'Data': h['Data'].strftime('%d/%m/%Y'), 'Posto': h['Posto']} for h in militar['historico']],
+        })
+    return casos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Laudos em lote num ZIP (pool de processos, com retomada)')
+    parser.add_argument('casos', nargs='?', help='JSON com a lista de casos (ou {"casos": [...]})')
+    parser.add_argument('zip', help='ZIP de saída (o índice CSV fica ao lado)')
+    parser.add_argument('--sinteticos', type=int, help='Usa N casos sintéticos em vez do JSON')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='Processos do pool (padrão: nº de CPUs)')
+    parser.add_argument('--compacto', action='store_true', default=None,
+                        help='Perfil compacto do laudo (PDF menor; na retomada, vale o do lote)')
+    parser.add_argument('--memorial-unico', action='store_true', default=None,
+                        help='Memorial nominal e atualização numa tabela só (na retomada, vale o do lote)')
+    parser.add_argument('--data-calculo', help='Data de cálculo do lote, DD/MM/AAAA (padrão: hoje, ou a do lote retomado)')
+    parser.add_argument('--regime', choices=sorted(REGIMES),
+                        help=f'Acumulação de juros e Selic (core.REGIMES; padrão: {REGIME_PADRAO}, ou a do lote retomado)')
+    parser.add_argument('--data-corte-selic', help='Mês da EC 113, DD/MM/AAAA (padrão: 01/12/2021, ou o do lote retomado)')
+    args = parser.parse_args()
+
+    if args.sinteticos:
+        casos = casos_sinteticos(args.sinteticos, args.semente)
+    elif args.casos:
+        with open(args.casos, encoding='utf-8') as f:
+            dados = json.load(f)
+        casos = dados['casos'] if isinstance(dados, dict) else dados
+    else:
+        parser.error('informe o JSON de casos ou --sinteticos N')
+
+    resumo = gerar_lote_laudos(casos, args.zip, args.workers, args.compacto, args.memorial_unico,
+                               data_calculo=args.data_calculo, regime=args.regime,
+                               data_corte_selic=args.data_corte_selic)
+    print(f"{resumo['gravados']} laudos gravados ({resumo['ja_prontos']} já estavam prontos) de {resumo['casos']} "
+          f"em {resumo['segundos']}s | ZIP {resumo['zip_bytes'] / 1024:.0f} KB | índice: {resumo['indice']}")
+    for erro in resumo['erros'][:5]:
+        print(f"    erro no caso {erro['caso']} ({erro['arquivo']}): {erro['erro']}")
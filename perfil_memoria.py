@@ -0,0 +1,266 @@
+"""
+Perfil de memória opcional (tracemalloc) das etapas do cálculo e do laudo.
+
+Desativado por padrão: etapa() e @perfilar custam só um if. Quando ativo, cada etapa registra
+    - pico de memória alocada durante a etapa (acima do que já existia ao entrar)
+    - memória líquida retida ao sair (depois de um gc.collect; crescimento a cada chamada = vazamento)
+    - principais locais de alocação (linha que alocou + linha do projeto que a originou)
+agregados por nome de etapa ao longo de todas as chamadas.
+
+Ativação:
+    CALC_PERFIL_MEMORIA=perfil.json streamlit run app.py    (relatório gravado ao encerrar o processo)
+    python perfil_memoria.py --repeticoes 5 --saida perfil.json
+    ou, no código: ativar() ... salvar_relatorio('perfil.json')
+
+Com várias sessões simultâneas os picos se misturam (tracemalloc é global ao processo):
+para atribuir memória a uma etapa, perfile uma sessão por vez.
+"""
+import atexit
+import functools
+import gc
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+VARIAVEL_AMBIENTE = 'CALC_PERFIL_MEMORIA'
+PASTA_PROJETO = os.path.dirname(os.path.abspath(__file__))
+
+_estado = {'ativo': False, 'top': 10}
+_etapas = {}
+_trava = threading.Lock()
+_local = threading.local()
+_NULO = nullcontext()
+_IGNORAR = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            tracemalloc.Filter(False, __file__))
+
+
+def ativar(quadros=10, top=10):
+    """
+    Liga o perfil. quadros: profundidade da pilha guardada por alocação, usada para achar a linha
+    do projeto que originou a alocação. Custo medido no cálculo de exemplo: 1 quadro ~4x mais lento,
+    10 quadros ~20x, 25 quadros ~30x. Se a 'origem' vier vazia (pilha do pandas mais funda), aumente.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(quadros)
+    _estado.update(ativo=True, top=top)
+
+def desativar():
+    _estado['ativo'] = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def ativo():
+    return _estado['ativo']
+
+def limpar():
+    """ Descarta o que foi agregado até aqui. """
+    with _trava:
+        _etapas.clear()
+
+
+# --- ETAPAS ---
+def _pilha():
+    if not hasattr(_local, 'pilha'):
+        _local.pilha = []
+    return _local.pilha
+
+def _locais(depois, antes, top):
+    """ Maiores acréscimos entre dois snapshots: (linha que alocou, linha do projeto que originou). """
+    locais = {}
+    for stat in depois.compare_to(antes, 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        quadros = list(stat.traceback)  # do mais antigo para o mais recente
+        local = f"{quadros[-1].filename}:{quadros[-1].lineno}"
+        do_projeto = [q for q in quadros if q.filename.startswith(PASTA_PROJETO)]
+        origem = f"{os.path.basename(do_projeto[-1].filename)}:{do_projeto[-1].lineno}" if do_projeto else ''
+        acumulado = locais.setdefault((local, origem), [0, 0])
+        acumulado[0] += stat.size_diff
+        acumulado[1] += stat.count_diff
+    return sorted(locais.items(), key=lambda item: -item[1][0])[:top]
+
+class _Etapa:
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        pilha = _pilha()
+        # Coleta antes de medir: o líquido da etapa não pode incluir lixo que veio de antes dela
+        gc.collect()
+        self.antes = tracemalloc.take_snapshot().filter_traces(_IGNORAR)
+        self.inicio_bytes, pico = tracemalloc.get_traced_memory()
+        # O pico é global: guarda o da etapa de fora antes de zerá-lo para esta
+        if pilha:
+            pilha[-1].pico_filhos = max(pilha[-1].pico_filhos, pico)
+        tracemalloc.reset_peak()
+        self.pico_filhos = 0
+        self.inicio = time.perf_counter()
+        pilha.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        pilha = _pilha()
+        pilha.pop()
+        pico = max(tracemalloc.get_traced_memory()[1], self.pico_filhos)
+        gc.collect()
+        atual = tracemalloc.get_traced_memory()[0]
+        if pilha:
+            pilha[-1].pico_filhos = max(pilha[-1].pico_filhos, pico)
+
+        depois = tracemalloc.take_snapshot().filter_traces(_IGNORAR)
+        locais = _locais(depois, self.antes, _estado['top'])
+        self.antes = None
+        _registrar(self.nome, segundos, pico - self.inicio_bytes, atual - self.inicio_bytes, locais)
+        return False
+
+def _registrar(nome, segundos, pico, liquido, locais):
+    with _trava:
+        dados = _etapas.setdefault(nome, {'chamadas': 0, 'segundos': 0.0, 'pico_max': 0, 'pico_soma': 0,
+                                          'liquido_soma': 0, 'liquido_ultimo': 0, 'locais': {}})
+        dados['chamadas'] += 1
+        dados['segundos'] += segundos
+        dados['pico_max'] = max(dados['pico_max'], pico)
+        dados['pico_soma'] += pico
+        dados['liquido_soma'] += liquido
+        dados['liquido_ultimo'] = liquido
+        for chave, (tamanho, blocos) in locais:
+            acumulado = dados['locais'].setdefault(chave, [0, 0])
+            acumulado[0] += tamanho
+            acumulado[1] += blocos
+
+def etapa(nome):
+    """ Context manager de uma etapa. Sem o perfil ativo, não faz nada. """
+    if not _estado['ativo']:
+        return _NULO
+    return _Etapa(nome)
+
+def perfilar(nome):
+    """ Decorador: a chamada inteira da função vira uma etapa. """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _estado['ativo']:
+                return funcao(*args, **kwargs)
+            with _Etapa(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+# --- RELATÓRIO ---
+def relatorio():
+    """ Relatório agregado (dict serializável em JSON), etapas ordenadas pelo maior pico. """
+    kb = lambda b: round(b / 1024, 1)
+    with _trava:
+        etapas = []
+        for nome, d in _etapas.items():
+            locais = sorted(d['locais'].items(), key=lambda item: -item[1][0])[:_estado['top']]
+            etapas.append({
+                'etapa': nome,
+                'chamadas': d['chamadas'],
+                'segundos': round(d['segundos'], 4),
+                'pico_kb_max': kb(d['pico_max']),
+                'pico_kb_medio': kb(d['pico_soma'] / d['chamadas']),
+                'liquido_kb_total': kb(d['liquido_soma']),
+                'liquido_kb_ultima': kb(d['liquido_ultimo']),
+                'top_alocacoes': [{'local': local, 'origem': origem, 'kb': kb(tamanho), 'blocos': blocos}
+                                  for (local, origem), (tamanho, blocos) in locais],
+            })
+    etapas.sort(key=lambda e: -e['pico_kb_max'])
+    atual = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    return {'processo_kb_atual': kb(atual), 'etapas': etapas}
+
+def salvar_relatorio(caminho):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio(), f, ensure_ascii=False, indent=2)
+    return caminho
+
+# --- TAMANHO DE OBJETOS (ESTADO DE SESSÃO) ---
+def tamanho_objeto(obj, _vistos=None):
+    """
+    Bytes aproximados de um objeto e do que ele referencia (DataFrames pelo memory_usage profundo).
+    Objetos compartilhados só contam uma vez por medição.
+    """
+    import sys
+    import pandas as pd
+    vistos = set() if _vistos is None else _vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    tamanho = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        tamanho += sum(tamanho_objeto(k, vistos) + tamanho_objeto(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        tamanho += sum(tamanho_objeto(item, vistos) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        tamanho += tamanho_objeto(vars(obj), vistos)
+    return tamanho
+
+def bytes_por_sessao(estado):
+    """ Bytes por chave de um st.session_state (ou dict) e o total, em ordem decrescente. """
+    vistos = set()
+    tamanhos = {str(chave): tamanho_objeto(estado[chave], vistos) for chave in list(estado.keys())}
+    tamanhos = dict(sorted(tamanhos.items(), key=lambda item: -item[1]))
+    tamanhos['_total'] = sum(tamanhos.values())
+    return tamanhos
+
+# Ativação pelo ambiente (ex.: processo do Streamlit): grava o relatório ao encerrar
+if os.environ.get(VARIAVEL_AMBIENTE):
+    _destino = os.environ[VARIAVEL_AMBIENTE]
+    ativar()
+    atexit.register(salvar_relatorio, 'perfil_memoria.json' if _destino in ('1', 'true', 'sim') else _destino)
+
+
+if __name__ == '__main__':
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Perfil de memória do cálculo + laudo (caso de exemplo)')
+    parser.add_argument('--ficha', help='Ficha (PDF/HTML/CSV) para o confronto de valores pagos')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções (líquido crescente = vazamento)')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--quadros', type=int, default=10, help='Profundidade da pilha por alocação')
+    parser.add_argument('--saida', default='perfil_memoria.json')
+    args = parser.parse_args()
+
+    # Mesmo módulo que core/gerador_pdf importam (este arquivo, rodando como script, é o __main__)
+    import perfil_memoria
+    from core import carregar_referencias, executar_calculo
+    from gerador_pdf import gerar_pdf
+
+    historico = [
+        {'Data': '01/02/2010', 'Posto': 'Soldado'},
+        {'Data': '21/04/2014', 'Posto': 'Cabo'},
+        {'Data': '15/06/2019', 'Posto': 'Aluno CFO 1'},
+        {'Data': '10/03/2020', 'Posto': 'Aluno CFO 2'},
+        {'Data': '21/08/2021', 'Posto': 'Aspirante'},
+        {'Data': '25/12/2022', 'Posto': '2º Tenente'},
+    ]
+    pagamentos = None
+    if args.ficha:
+        from leitor_fichas import extrair_dados_arquivo
+        with open(args.ficha, 'rb') as f:
+            pagamentos = extrair_dados_arquivo(args.ficha, f.read())
+
+    carregar_referencias()  # cache de referências fora da medição
+    df_escalonamento = pd.read_csv('dados/escalonamento.csv', sep=';')
+    perfil_memoria.ativar(quadros=args.quadros, top=args.top)
+    for _ in range(args.repeticoes):
+        calc, resultado = executar_calculo('01/02/2010', '15/03/2025', historico, df_pagamentos=pagamentos)
+        dados_militar = {'nome': 'Perfil', 'inicio': calc.data_ingresso, 'ajuizamento': calc.data_ajuizamento}
+        gerar_pdf(resultado, dados_militar, calc.df_tabela_lei.copy(), df_escalonamento, calc.df_carreira.copy(),
+                  df_fatores=calc.tabela_fatores())
+
+    perfil_memoria.salvar_relatorio(args.saida)
+    for e in perfil_memoria.relatorio()['etapas']:
+        print(f"{e['etapa']:<32} pico {e['pico_kb_max']:>10.1f} KB | líquido {e['liquido_kb_total']:>9.1f} KB "
+              f"| {e['chamadas']}x {e['segundos']:.2f}s")
+    print(f"Relatório: {args.saida}")
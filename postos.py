@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Termos/siglas como aparecem na ficha -> Posto usado no cálculo (escalonamento.csv)
+MAPA_PATENTES = {
+    "CORONEL": "Coronel", "CEL": "Coronel",
+    "TENENTE CORONEL": "Tenente-Coronel", "TENENTE-CORONEL": "Tenente-Coronel",
+    "TEN CEL": "Tenente-Coronel", "TC": "Tenente-Coronel",
+    "MAJOR": "Major", "CAPITÃO": "Capitão", "CAP": "Capitão",
+    "PRIMEIRO TENENTE": "1º Tenente", "1º TEN": "1º Tenente",
+    "SEGUNDO TENENTE": "2º Tenente", "2º TEN": "2º Tenente",
+    "ASPIRANTE": "Aspirante", "ASP": "Aspirante",
+    "ALUNO": "Aluno CFO 1", "ALUNO CFO I": "Aluno CFO 1",
+    "ALUNO CFO II": "Aluno CFO 2", "ALUNO CFO III": "Aluno CFO 3",
+    "SUBTENENTE": "Subtenente", "SUB": "Subtenente",
+    "PRIMEIRO SARGENTO": "1º Sargento", "1º SGT": "1º Sargento",
+    "SEGUNDO SARGENTO": "2º Sargento", "2º SGT": "2º Sargento",
+    "TERCEIRO SARGENTO": "3º Sargento", "3º SGT": "3º Sargento",
+    "CABO": "Cabo", "CB": "Cabo", "SOLDADO": "Soldado", "SD": "Soldado"
+}
+
+def _sem_acento(texto):
+    """ Maiúsculo e sem acentos (os leitores de PDF/HTML já entregam o cargo assim). """
+    nfkd = unicodedata.normalize('NFD', str(texto))
+    return "".join(c for c in nfkd if unicodedata.category(c) != 'Mn').upper()
+
+_MAPA_NORMALIZADO = {_sem_acento(sigla): posto for sigla, posto in MAPA_PATENTES.items()}
+
+# Um único padrão compilado: alternativas da mais longa para a mais curta, sempre em
+# fronteira de palavra. Assim "SUBTENENTE" não cai em "SUB" e "CAPITAO" não cai em "CAP",
+# e o resultado não depende da ordem do dicionário.
+_PADRAO_PATENTES = re.compile(
+    r'(?<!\w)(' +
+    '|'.join(re.escape(s) for s in sorted(_MAPA_NORMALIZADO, key=lambda s: (-len(s), s))) +
+    r')(?!\w)'
+)
+
+@lru_cache(maxsize=4096)
+def normalizar_posto(texto_cargo):
+    """ Posto do cálculo para um texto de cargo da ficha, ou None se nada for reconhecido. """
+    encontrado = _PADRAO_PATENTES.search(_sem_acento(texto_cargo))
+    return _MAPA_NORMALIZADO[encontrado.group(1)] if encontrado else None
+
+def normalizar_postos(cargos):
+    """ normalizar_posto aplicado só aos valores distintos e mapeado de volta para a Series. """
+    cargos = pd.Series(cargos)
+    mapa = {cargo: normalizar_posto(str(cargo)) for cargo in cargos.unique()}
+    return cargos.map(mapa)
+
+# --- FUNÇÃO DE INTELIGÊNCIA ---
+def inferir_historico_promocoes(df_extraido):
+    """
+    Deduz o histórico de promoções a partir do cargo detectado em cada competência.
+    A primeira patente entra na data da primeira competência; as mudanças seguintes recebem
+    a data de promoção padrão anterior (21/04, 21/08 ou 25/12).
+    """
+    df_unico = df_extraido.drop_duplicates(subset=['Competencia'], keep='first').sort_values('Competencia')
+    if 'Cargo_Detectado' in df_unico.columns:
+        cargos = df_unico['Cargo_Detectado']
+    else:
+        cargos = pd.Series('', index=df_unico.index)
+
+    postos = normalizar_postos(cargos)
+    identificados = postos.notna()
+    postos = postos[identificados]
+    competencias = pd.to_datetime(df_unico.loc[identificados, 'Competencia'])
+
+    # Só as linhas em que a patente muda em relação à última reconhecida
+    mudou = postos.ne(postos.shift())
+    postos = postos[mudou]
+    competencias = competencias[mudou]
+    if postos.empty:
+        return pd.DataFrame()
+
+    mes = competencias.dt.month.values
+    ano = competencias.dt.year.values
+    datas_promo = np.select(
+        [(mes >= 5) & (mes < 9), mes >= 9],
+        [pd.to_datetime(dict(year=ano, month=4, day=21)).values,
+         pd.to_datetime(dict(year=ano, month=8, day=21)).values],
+        default=pd.to_datetime(dict(year=ano - 1, month=12, day=25)).values,
+    )
+    # A primeira patente vale desde a primeira competência
+    datas_promo[0] = competencias.values[0]
+
+    return pd.DataFrame({"Data": pd.to_datetime(datas_promo), "Posto": postos.values})
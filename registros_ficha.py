@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import NamedTuple
+import pandas as pd
+
+# Tipos de pagamento (mesmos rótulos usados no cálculo e no laudo)
+TIPO_SUBSIDIO = 'Subsídio'
+TIPO_NATALINA = '13º Salário'
+TIPO_FERIAS = 'Férias (1/3)'
+
+COLUNAS_FICHA = ['Competencia', 'Tipo', 'Valor_Achado', 'Cargo_Detectado']
+
+class RegistroFicha(NamedTuple):
+    """ Um pagamento lido da ficha, no formato comum a todos os leitores (PDF, HTML, CSV). """
+    competencia: datetime
+    tipo: str
+    valor: float
+    cargo: str
+
+class ErroLeituraFicha(ValueError):
+    """ Falha ao ler uma ficha. Quem exibe a mensagem é o chamador (app, serviço ou CLI). """
+
+def tipo_pelo_dia(dia):
+    """ Convenção das datas: dia 13 = 13º Salário, dia 15 = Férias, demais = Subsídio. """
+    if dia == 13: return TIPO_NATALINA
+    if dia == 15: return TIPO_FERIAS
+    return TIPO_SUBSIDIO
+
+class ConsolidadorFicha:
+    """
+    Agrega registros à medida que chegam: soma por (Competencia, Tipo) e guarda o cargo do
+    primeiro registro do grupo. A memória depende só do nº de competências, não do tamanho do arquivo.
+    A soma é compensada (Kahan), igual ao groupby().sum() do pandas, então o resultado é o mesmo
+    da consolidação antiga feita no DataFrame completo.
+    """
+    def __init__(self):
+        self._grupos = {}  # (competencia, tipo) -> [soma, compensacao, cargo]
+
+    def __len__(self):
+        return len(self._grupos)
+
+    def adicionar(self, registro):
+        if registro.competencia is None or pd.isna(registro.competencia):
+            return
+        chave = (registro.competencia, registro.tipo)
+        grupo = self._grupos.get(chave)
+        if grupo is None:
+            self._grupos[chave] = [registro.valor, 0.0, registro.cargo]
+            return
+        soma, compensacao, _ = grupo
+        y = registro.valor - compensacao
+        t = soma + y
+        grupo[1] = (t - soma) - y
+        grupo[0] = t
+
+    def consumir(self, registros):
+        """ Adiciona todos os registros de um iterável (ex.: o gerador de um leitor). """
+        for registro in registros:
+            self.adicionar(registro)
+        return self
+
+    def para_dataframe(self):
+        """ DataFrame no formato dos leitores: uma linha por (Competencia, Tipo), ordenado por data. """
+        if not self._grupos:
+            return pd.DataFrame()
+        chaves = sorted(self._grupos)
+        return pd.DataFrame({
+            'Competencia': pd.to_datetime([c for c, _ in chaves]),
+            'Tipo': [t for _, t in chaves],
+            'Valor_Achado': [self._grupos[k][0] for k in chaves],
+            'Cargo_Detectado': [self._grupos[k][2] for k in chaves],
+        })
+
+def consolidar_registros(registros):
+    """ Atalho: consome um gerador de RegistroFicha e devolve o DataFrame consolidado. """
+    return ConsolidadorFicha().consumir(registros).para_dataframe()
@@ -0,0 +1,280 @@
+"""
+Serviço HTTP local da Calculadora (sem Streamlit).
+
+Endpoints (todas as datas no padrão DD/MM/AAAA, igual ao modelo CSV do app):
+    GET  /saude            -> {"status": "ok"}
+    POST /ficha?nome=X.pdf -> corpo = bytes do arquivo (PDF, HTML ou CSV); devolve registros + histórico deduzido
+    POST /ficha            -> JSON {"arquivos": [{"nome": ..., "conteudo_base64": ...}, ...]} (lote)
+    POST /calculo          -> JSON de um caso ou {"casos": [...]} (lote). ?formato=csv devolve CSV;
+                              ?formato=parquet ou arrow, o resultado com os tipos preservados (lote: coluna Caso)
+    POST /laudo            -> JSON de um caso + "nome" -> PDF do laudo
+
+Caso (JSON):
+    {"data_ingresso": "01/02/2010", "data_ajuizamento": "15/03/2025",
+     "historico": [{"Data": "01/02/2010", "Posto": "Soldado"}, ...],
+     "pagamentos": [{"Competencia": "01/01/2020", "Valor_Achado": 4500.0}, ...],   (opcional)
+     "datas_ferias": ["15/01/2021", ...],                                           (opcional)
+     "data_calculo": "10/10/2025",     (opcional: fixa o fim da timeline e a Selic; sem ela, vale o dia de hoje)
+     "regime": "composto",             (opcional: soma | composto | selic_acumulada; padrão soma, ver core.REGIMES)
+     "data_corte_selic": "01/12/2021", (opcional: mês da EC 113 em que a Selic substitui IPCA + juros)
+     "centavos": true}                 (opcional: dinheiro em inteiros de centavos, totais exatos)
+Em /laudo, opcionais "compacto": true (PDF menor, para arquivo/peticionamento) e "memorial_unico": true
+(memorial nominal e atualização numa tabela só).
+
+Uso:
+    python servidor.py --porta 8765 --workers 4
+
+O servidor só escuta em 127.0.0.1. Os workers são processos que carregam os dados de
+referência e as bibliotecas pesadas (pdfplumber, reportlab) uma vez, na inicialização.
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from core import REGIME_PADRAO, executar_calculo, obter_motor, obter_tabela_fatores, resumir_totais, totais_centavos
+from exportacao import FORMATOS, exportar
+from formatacao import csv_ptbr
+
+HOST_LOCAL = '127.0.0.1'
+
+
+# --- FUNÇÕES DOS WORKERS (executadas no pool de processos) ---
+def _aquecer_worker(barreira=None):
+    """
+    Inicializador do pool: motor (referências), tabela de fatores e bibliotecas prontos no processo.
+    barreira: só sai do inicializador quando todos os workers estiverem aquecidos (ver criar_servidor).
+    """
+    obter_motor()
+    obter_tabela_fatores()
+    import leitor_fichas, gerador_pdf, postos  # noqa: F401
+    if barreira is not None:
+        barreira.wait()
+
+
+def _ler_ficha_com_historico(nome, conteudo):
+    """ Registros da ficha + histórico de promoções deduzido dos cargos (como no app). """
+    from leitor_fichas import extrair_dados_arquivo
+    from postos import inferir_historico_promocoes
+
+    df = extrair_dados_arquivo(nome, conteudo)
+    historico = pd.DataFrame()
+    if not df.empty and 'Cargo_Detectado' in df.columns:
+        historico = inferir_historico_promocoes(df)
+    return df, historico
+
+
+def _pagamentos_do_caso(caso):
+    pagamentos = caso.get('pagamentos')
+    if not pagamentos:
+        return None
+    df = pd.DataFrame(pagamentos)
+    df['Competencia'] = pd.to_datetime(df['Competencia'], dayfirst=True)
+    df['Valor_Achado'] = pd.to_numeric(df['Valor_Achado'])
+    return df
+
+
+def _calcular_caso(caso):
+    _, resultado = executar_calculo(
+        caso['data_ingresso'],
+        caso['data_ajuizamento'],
+        caso['historico'],
+        df_pagamentos=_pagamentos_do_caso(caso),
+        datas_ferias=caso.get('datas_ferias'),
+        centavos=bool(caso.get('centavos')),
+        data_calculo=caso.get('data_calculo'),
+        regime=caso.get('regime') or REGIME_PADRAO,
+        data_corte_selic=caso.get('data_corte_selic'),
+    )
+    return resultado
+
+
+def laudo_do_caso(caso):
+    """ PDF do laudo de um caso (JSON deste serviço) e os totais do cálculo: (bytes, dict). """
+    from gerador_pdf import gerar_pdf
+
+    calc, resultado = executar_calculo(
+        caso['data_ingresso'],
+        caso['data_ajuizamento'],
+        caso['historico'],
+        df_pagamentos=_pagamentos_do_caso(caso),
+        datas_ferias=caso.get('datas_ferias'),
+        data_calculo=caso.get('data_calculo'),
+        regime=caso.get('regime') or REGIME_PADRAO,
+        data_corte_selic=caso.get('data_corte_selic'),
+    )
+    dados_militar = {
+        'nome': caso.get('nome', ''),
+        'inicio': calc.data_ingresso,
+        'ajuizamento': calc.data_ajuizamento,
+    }
+    df_escalonamento = pd.read_csv('dados/escalonamento.csv', sep=';')
+    buffer = gerar_pdf(resultado, dados_militar, calc.df_tabela_lei.copy(), df_escalonamento, calc.df_carreira.copy(),
+                       df_fatores=calc.tabela_fatores(), compacto=bool(caso.get('compacto')),
+                       memorial_unico=bool(caso.get('memorial_unico')))
+    return buffer.getvalue(), resumir_totais(resultado)
+
+
+def _gerar_laudo(caso):
+    return laudo_do_caso(caso)[0]
+
+
+# --- SERIALIZAÇÃO ---
+def _df_para_registros(df):
+    """ DataFrame -> lista de dicts serializável (datas DD/MM/AAAA, NaN -> null). """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%d/%m/%Y')
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+def _resultado_para_json(resultado):
+    # Modo centavos: Total_Final inteiro -> totais exatos em centavos
+    if pd.api.types.is_integer_dtype(resultado['Total_Final']):
+        totais = totais_centavos(resultado)
+    else:
+        totais = resumir_totais(resultado)
+    return {'totais': totais, 'linhas': _df_para_registros(resultado)}
+
+
+def _juntar_resultados(resultados):
+    """ Um resultado como está; em lote, todos juntos com a coluna 'Caso' (posição no pedido). """
+    if len(resultados) == 1:
+        return resultados[0]
+    return pd.concat([r.assign(Caso=i) for i, r in enumerate(resultados)], ignore_index=True)
+
+
+def _resultados_para_csv(resultados):
+    """ CSV no mesmo padrão do app (';' e vírgula decimal). Em lote, ganha a coluna 'Caso'. """
+    return csv_ptbr(_juntar_resultados(resultados))
+
+
+# --- HTTP ---
+class ManipuladorCalculadora(BaseHTTPRequestHandler):
+    server_version = 'CalculadoraMilitar/1.0'
+    pool = None  # ProcessPoolExecutor, definido em criar_servidor()
+
+    def log_message(self, formato, *args):
+        if not getattr(self.server, 'silencioso', False):
+            super().log_message(formato, *args)
+
+    def _responder(self, status, corpo, tipo='application/json; charset=utf-8'):
+        if isinstance(corpo, (dict, list)):
+            corpo = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(tamanho) if tamanho else b''
+
+    def _ler_json(self):
+        try:
+            return json.loads(self._ler_corpo().decode('utf-8'))
+        except ValueError as e:
+            raise ValueError(f"JSON inválido: {e}")
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/saude':
+            self._responder(200, {'status': 'ok'})
+        else:
+            self._responder(404, {'erro': 'Endpoint não encontrado.'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        rotas = {'/ficha': self._post_ficha, '/calculo': self._post_calculo, '/laudo': self._post_laudo}
+        rota = rotas.get(url.path)
+        if rota is None:
+            self._responder(404, {'erro': 'Endpoint não encontrado.'})
+            return
+        try:
+            rota(params)
+        except (ValueError, KeyError, TypeError) as e:
+            self._responder(400, {'erro': f"Requisição inválida: {e}"})
+        except Exception as e:
+            self._responder(500, {'erro': f"Erro interno: {e}"})
+
+    def _post_ficha(self, params):
+        if 'nome' in params:
+            arquivos = [(params['nome'][0], self._ler_corpo())]
+        else:
+            dados = self._ler_json()
+            arquivos = [(a['nome'], base64.b64decode(a['conteudo_base64'])) for a in dados['arquivos']]
+
+        futuros = [self.pool.submit(_ler_ficha_com_historico, nome, conteudo) for nome, conteudo in arquivos]
+        resposta = []
+        for (nome, _), futuro in zip(arquivos, futuros):
+            df, historico = futuro.result()
+            resposta.append({'nome': nome, 'registros': _df_para_registros(df),
+                             'historico': _df_para_registros(historico)})
+        self._responder(200, resposta[0] if 'nome' in params else {'arquivos': resposta})
+
+    def _post_calculo(self, params):
+        dados = self._ler_json()
+        casos = dados['casos'] if 'casos' in dados else [dados]
+        resultados = list(self.pool.map(_calcular_caso, casos))
+
+        formato = params.get('formato', ['json'])[0]
+        if formato == 'csv':
+            self._responder(200, _resultados_para_csv(resultados), 'text/csv; charset=utf-8')
+        elif formato in FORMATOS:
+            self._responder(200, exportar(_juntar_resultados(resultados), formato), FORMATOS[formato])
+        elif 'casos' in dados:
+            self._responder(200, {'resultados': [_resultado_para_json(r) for r in resultados]})
+        else:
+            self._responder(200, _resultado_para_json(resultados[0]))
+
+    def _post_laudo(self, params):
+        caso = self._ler_json()
+        pdf = self.pool.submit(_gerar_laudo, caso).result()
+        self._responder(200, pdf, 'application/pdf')
+
+
+def criar_servidor(porta=8765, workers=None, silencioso=False):
+    """
+    Cria o servidor HTTP (threads) com o pool de processos já aquecido.
+    Devolve (servidor, pool); quem chama deve encerrar ambos.
+    """
+    workers = workers or os.cpu_count() or 1
+    contexto = multiprocessing.get_context()
+    barreira = contexto.Barrier(workers)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_aquecer_worker,
+                               initargs=(barreira,))
+    # Força a subida dos workers antes de aceitar requisições. Nenhuma tarefa roda antes do inicializador,
+    # e nenhum inicializador termina antes de todos passarem pela barreira: com a primeira resposta,
+    # os N workers já estão aquecidos.
+    list(pool.map(int, range(workers)))
+
+    manipulador = type('Manipulador', (ManipuladorCalculadora,), {'pool': pool})
+    servidor = ThreadingHTTPServer((HOST_LOCAL, porta), manipulador)
+    servidor.silencioso = silencioso
+    servidor.workers = workers
+    return servidor, pool
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serviço HTTP local da Calculadora Militar RN')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='Processos do pool (padrão: nº de CPUs)')
+    args = parser.parse_args()
+
+    servidor, pool = criar_servidor(args.porta, args.workers)
+    print(f"Servindo em http://{HOST_LOCAL}:{args.porta} com {servidor.workers} workers")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        pool.shutdown()
@@ -0,0 +1,281 @@
+"""
+Teste de carga local do app: N sessões simultâneas fazendo o fluxo completo, no mesmo processo.
+
+Cada sessão é um AppTest (o executor headless do próprio Streamlit) rodando em sua thread, todas
+compartilhando o processo e os caches (st.cache_resource/cache_data), como num servidor real.
+Passos medidos por sessão:
+    abrir     primeira execução da página
+    upload    ficha enviada + leitura + histórico inferido (data de ingresso da própria ficha)
+    gerar     botão "Gerar Cálculo e Confrontar Valores"
+    editar    alteração de Valor_Pago no editor da conferência
+    calcular  botão "Calcular Resultado Final"
+    laudo     nome digitado (libera os downloads; o PDF ainda não é montado)
+    baixar    clique em "Baixar Laudo Técnico (PDF)": o servidor executa a função adiada do botão
+Para cada N: p50/p95 de cada passo, memória residente do processo com as N sessões vivas e
+tamanho médio do estado de sessão.
+
+A ficha é enviada pelo próprio uploader do AppTest. O clique de download não é simulado: as
+funções adiadas dos botões (data=callable) são guardadas no registro e chamadas pelo passo 'baixar'.
+O Runtime que o AppTest instala é global ao processo e removido no fim de cada execução: com
+sessões em paralelo, a primeira a terminar deixaria as outras sem runtime (sem mídia nem downloads
+adiados). Aqui todas as sessões usam um runtime só, como no servidor real. O resto do app roda sem
+alteração.
+Runtime compartilhado e download simulado dependem de internos do Streamlit (Runtime._instance,
+app_test.Runtime, MediaFileManager.add_deferred...): a versão fica fixada no requirements.txt e, se
+algum deles faltar, o teste para logo no início com a lista do que mudou (ver conferir_streamlit).
+
+Uso:
+    python teste_carga.py --sessoes 1 2 4 8 --formato csv
+    python teste_carga.py --sessoes 4 --ficha dados/minha_ficha.pdf --saida carga.json
+"""
+import argparse
+import gc
+import json
+import mimetypes
+import os
+import resource
+import threading
+import time
+from datetime import date
+
+from unittest.mock import MagicMock
+
+import numpy as np
+import streamlit
+from streamlit.runtime import Runtime
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import app_test
+
+from gerador_fichas import EXTENSOES, gerar_ficha, gerar_militar
+from perfil_memoria import bytes_por_sessao
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+PASSOS = ['abrir', 'upload', 'gerar', 'editar', 'calcular', 'laudo', 'baixar']
+_ADIADOS = {}
+STREAMLIT_TESTADO = '1.66.0'
+# Internos usados por instalar_runtime_compartilhado / instalar_download_simulado: (objeto, atributo)
+_INTERNOS = [(Runtime, '_instance'), (MediaFileManager, 'add_deferred'), (app_test, 'Runtime'),
+             (app_test, 'MemoryMediaFileStorage'), (app_test, 'DataframeSourceManager'),
+             (app_test, 'MemoryCacheStorageManager'), (app_test, 'BidiComponentManager')]
+
+
+# --- FICHA ENVIADA ---
+def ficha_enviada(nome, conteudo):
+    """ Arquivo no formato do uploader do AppTest: (nome, bytes, tipo MIME). """
+    return nome, conteudo, mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+
+# --- INTERNOS DO STREAMLIT ---
+def conferir_streamlit():
+    """ Falha com mensagem clara se a versão instalada não tem os internos que o teste substitui. """
+    faltando = [f"{getattr(objeto, '__name__', objeto)}.{nome}" for objeto, nome in _INTERNOS if not hasattr(objeto, nome)]
+    if faltando:
+        raise RuntimeError(f"teste_carga foi escrito para o Streamlit {STREAMLIT_TESTADO}; no {streamlit.__version__} "
+                           f"faltam {', '.join(faltando)}. Ajuste instalar_runtime_compartilhado/instalar_download_simulado.")
+
+# --- DOWNLOAD SIMULADO ---
+_add_deferred_original = MediaFileManager.add_deferred
+
+def _registrar_adiado(self, data_callable, *args, **kwargs):
+    file_id = _add_deferred_original(self, data_callable, *args, **kwargs)
+    _ADIADOS[file_id] = data_callable
+    return file_id
+
+def instalar_download_simulado():
+    MediaFileManager.add_deferred = _registrar_adiado
+
+def instalar_runtime_compartilhado():
+    """ Um Runtime falso para todas as sessões; o AppTest passa a instalar/remover o seu num substituto. """
+    if Runtime._instance is not None:
+        return
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(app_test.MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = app_test.DataframeSourceManager()
+    runtime.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    componentes = app_test.BidiComponentManager()
+    componentes.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = componentes
+    app_test.Runtime = type('RuntimeDoAppTest', (), {'_instance': None})
+    Runtime._instance = runtime
+
+def baixar(at, texto):
+    """ Conteúdo de um botão de download com data=callable, como o servidor gera no clique. """
+    botao = next(b for b in at.get('download_button') if texto in b.proto.label)
+    return _ADIADOS.pop(botao.proto.deferred_file_id)()
+
+
+# --- MEMÓRIA DO PROCESSO ---
+def rss_mb():
+    """ Memória residente atual do processo (Linux: /proc; fora dele, o pico). """
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return pico_rss_mb()
+
+def pico_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _estado_da_sessao(at):
+    estado = at.session_state._state
+    return {chave: estado[chave] for chave in estado.filtered_state}
+
+
+# --- UMA SESSÃO ---
+def _botao(at, texto):
+    return next(b for b in at.button if texto in b.label)
+
+def _executar(at, tempos, passo, acao):
+    inicio = time.perf_counter()
+    acao()
+    tempos[passo] = time.perf_counter() - inicio
+    if at.exception:
+        raise RuntimeError(f"{passo}: {at.exception[0].message}")
+
+def simular_sessao(ficha, ingresso, edicoes=3, timeout=600):
+    """
+    Fluxo completo de uma sessão. ficha: (nome, bytes, tipo MIME); ingresso: date.
+    Devolve (AppTest, {passo: segundos}); o AppTest fica vivo para a medição de memória.
+    """
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    tempos = {}
+    _executar(at, tempos, 'abrir', at.run)
+
+    def enviar():
+        at.file_uploader[0].set_value([ficha])
+        at.date_input[0].set_value(ingresso)
+        at.run()
+    _executar(at, tempos, 'upload', enviar)
+    _executar(at, tempos, 'gerar', lambda: _botao(at, 'Gerar Cálculo').click().run())
+
+    def editar():
+        # Mesmo formato que o data_editor devolve ao navegador: {linha: {coluna: valor}}
+        linhas = {i: {'Valor_Pago': 1000.0 + i} for i in range(edicoes)}
+        at.session_state['editor_financeiro_final'] = {'edited_rows': linhas, 'added_rows': [], 'deleted_rows': []}
+        at.run()
+    _executar(at, tempos, 'editar', editar)
+    _executar(at, tempos, 'calcular', lambda: _botao(at, 'Calcular Resultado').click().run())
+    _executar(at, tempos, 'laudo', lambda: at.text_input(key='input_nome_final').input('Sessao de Carga').run())
+    _executar(at, tempos, 'baixar', lambda: baixar(at, 'Laudo Técnico'))
+    return at, tempos
+
+
+# --- N SESSÕES SIMULTÂNEAS ---
+def fichas_sinteticas(quantidade, formato='csv', semente=0):
+    """ Uma ficha sintética diferente por sessão: [(ficha_enviada, ingresso)]. """
+    fichas = []
+    for numero in range(quantidade):
+        militar = gerar_militar(semente, numero)
+        nome = f"ficha_{numero:05d}{EXTENSOES[formato]}"
+        fichas.append((ficha_enviada(nome, gerar_ficha(formato, militar)), militar['ingresso'].date()))
+    return fichas
+
+def _percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else float('nan')
+
+def rodar_nivel(fichas, edicoes=3, timeout=600):
+    """
+    Dispara len(fichas) sessões ao mesmo tempo (uma thread cada) e espera todas.
+    Devolve o resumo do nível: latências por passo, falhas e memória com as sessões vivas.
+    """
+    n = len(fichas)
+    largada = threading.Barrier(n)
+    resultados = [None] * n
+
+    def sessao(i):
+        largada.wait()
+        try:
+            resultados[i] = simular_sessao(*fichas[i], edicoes=edicoes, timeout=timeout)
+        except Exception as e:
+            resultados[i] = e
+
+    gc.collect()
+    rss_antes = rss_mb()
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(i,), daemon=True) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    parede = time.perf_counter() - inicio
+
+    concluidas = [r for r in resultados if not isinstance(r, Exception)]
+    falhas = [f"{type(r).__name__}: {r}" for r in resultados if isinstance(r, Exception)]
+    gc.collect()
+    rss_vivas = rss_mb()
+    estados = [bytes_por_sessao(_estado_da_sessao(at))['_total'] for at, _ in concluidas]
+
+    passos = {}
+    for passo in PASSOS + ['total']:
+        if passo == 'total':
+            valores = [sum(tempos.values()) for _, tempos in concluidas]
+        else:
+            valores = [tempos[passo] for _, tempos in concluidas]
+        passos[passo] = {'p50': round(_percentil(valores, 50), 3), 'p95': round(_percentil(valores, 95), 3)}
+
+    resumo = {
+        'sessoes': n,
+        'concluidas': len(concluidas),
+        'falhas': falhas,
+        'segundos_parede': round(parede, 2),
+        'sessoes_por_minuto': round(60 * len(concluidas) / parede, 2) if parede else 0.0,
+        'passos': passos,
+        'rss_mb_antes': round(rss_antes, 1),
+        'rss_mb_sessoes_vivas': round(rss_vivas, 1),
+        'rss_mb_por_sessao': round((rss_vivas - rss_antes) / n, 1),
+        'rss_mb_pico': round(pico_rss_mb(), 1),
+        'estado_kb_por_sessao': round(float(np.mean(estados)) / 1024, 1) if estados else 0.0,
+    }
+    del concluidas, resultados
+    _ADIADOS.clear()
+    gc.collect()
+    return resumo
+
+def teste_carga(niveis, formato='csv', ficha=None, semente=0, edicoes=3, timeout=600):
+    """
+    Roda cada nível de concorrência em sequência (ex.: [1, 2, 4, 8]).
+    ficha: caminho de uma ficha real usada por todas as sessões; sem ela, cada sessão recebe
+    uma ficha sintética diferente no formato pedido.
+    """
+    conferir_streamlit()
+    instalar_download_simulado()
+    instalar_runtime_compartilhado()
+    if ficha:
+        with open(ficha, 'rb') as f:
+            enviada = ficha_enviada(os.path.basename(ficha), f.read())
+        fichas = [(enviada, date(2010, 2, 1))] * max(niveis)
+    else:
+        fichas = fichas_sinteticas(max(niveis), formato, semente)
+
+    # Aquecimento: caches compartilhados (referências, escalonamento) fora da medição
+    rodar_nivel(fichas[:1], edicoes, timeout)
+    return [rodar_nivel(fichas[:n], edicoes, timeout) for n in niveis]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Teste de carga local: N sessões simultâneas do app')
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 2, 4, 8], help='Níveis de concorrência')
+    parser.add_argument('--formato', choices=sorted(EXTENSOES), default='csv', help='Formato das fichas sintéticas')
+    parser.add_argument('--ficha', help='Ficha real (PDF/HTML/CSV) enviada por todas as sessões')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--edicoes', type=int, default=3, help='Linhas de Valor_Pago alteradas por sessão')
+    parser.add_argument('--timeout', type=int, default=600, help='Segundos por execução do script')
+    parser.add_argument('--saida', help='Grava o relatório em JSON')
+    args = parser.parse_args()
+
+    niveis = teste_carga(args.sessoes, args.formato, args.ficha, args.semente, args.edicoes, args.timeout)
+    for r in niveis:
+        print(f"N={r['sessoes']}: {r['concluidas']}/{r['sessoes']} concluídas em {r['segundos_parede']}s "
+              f"({r['sessoes_por_minuto']} sessões/min) | RSS {r['rss_mb_antes']} -> {r['rss_mb_sessoes_vivas']} MB "
+              f"(+{r['rss_mb_por_sessao']} MB/sessão, pico {r['rss_mb_pico']} MB) | estado {r['estado_kb_por_sessao']} KB/sessão")
+        print("    " + " | ".join(f"{passo} {t['p50']:.2f}/{t['p95']:.2f}s" for passo, t in r['passos'].items())
+              + "   (p50/p95)")
+        for falha in r['falhas'][:3]:
+            print(f"    falha: {falha}")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(niveis, f, ensure_ascii=False, indent=2)
+        print(f"Relatório: {args.saida}")
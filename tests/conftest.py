@@ -0,0 +1,10 @@
+"""
+Testes do pacote: python -m pytest (a partir da raiz do repositório).
+Os módulos leem dados/ relativo ao diretório atual, então os testes rodam na raiz.
+"""
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import centavos_para_reais, executar_calculo, para_centavos, totais_centavos
+from lote_laudos import casos_sinteticos
+
+DATA_CALCULO = '20/11/2025'
+
+
+def _calcular(caso, **opcoes):
+    return executar_calculo(caso['data_ingresso'], caso.get('data_ajuizamento', '15/03/2025'), caso['historico'],
+                            data_calculo=DATA_CALCULO, **opcoes)[1]
+
+
+@pytest.fixture(scope='module')
+def casos():
+    return casos_sinteticos(4, data_ajuizamento='15/03/2025')
+
+
+def test_para_centavos_arredonda_o_valor_digitado():
+    # 2.675 e 1.005 ficam abaixo do meio em binário; a folga faz valer o valor digitado (meio centavo sobe)
+    assert para_centavos([2.675, 1.005, 0.125, -2.675, 1234.56, 0.0]).tolist() == [268, 101, 13, -268, 123456, 0]
+    assert para_centavos([1.004999, 1.0049]).tolist() == [100, 100]
+
+
+def test_centavos_segue_o_calculo_em_reais(casos):
+    for caso in casos:
+        reais = _calcular(caso)
+        centavos = _calcular(caso, centavos=True)
+        assert centavos['Total_Final'].dtype == 'int64'
+        # Valor_Devido arredondado na entrada: no total, no máximo 1 centavo vezes o fator de atualização
+        fator = centavos['IPCA_Fator'] * (1 + centavos['Juros_Fator']) * (1 + centavos['Selic_Fator'])
+        erro = np.abs(np.round(reais['Total_Final'] * 100) - centavos['Total_Final'])
+        assert (erro <= 1 + fator).all()
+        pd.testing.assert_frame_equal(centavos_para_reais(centavos)[['Valor_Devido']],
+                                      reais[['Valor_Devido']].round(2))
+
+
+def test_totais_de_lote_sao_exatos_e_independem_da_ordem(casos):
+    resultados = [_calcular(caso, centavos=True) for caso in casos]
+    totais = totais_centavos(resultados)
+
+    assert totais == totais_centavos(resultados[::-1])
+    assert totais['total'] == sum(totais_centavos(r)['total'] for r in resultados)
+    assert totais['principal'] + totais['acessorios'] == totais['total']
+    assert all(isinstance(v, int) for v in totais.values())
+
@@ -0,0 +1,64 @@
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from core import executar_calculo
+from exportacao import COLUNAS_RESULTADO, exportar, gravar_lote, ler_resultados
+from lote_laudos import casos_sinteticos
+
+DATA_CALCULO = '20/11/2025'
+
+
+def _resultado(caso, centavos=False):
+    return executar_calculo(caso['data_ingresso'], caso['data_ajuizamento'], caso['historico'],
+                            data_calculo=DATA_CALCULO, centavos=centavos)[1]
+
+
+@pytest.fixture(scope='module')
+def casos():
+    return casos_sinteticos(3, data_ajuizamento='15/03/2025')
+
+
+@pytest.mark.parametrize('formato, extensao', [('parquet', '.parquet'), ('arrow', '.arrow')])
+@pytest.mark.parametrize('centavos', [False, True])
+def test_um_resultado_volta_com_os_mesmos_tipos_e_valores(casos, tmp_path, formato, extensao, centavos):
+    resultado = _resultado(casos[0], centavos)
+    caminho = tmp_path / f'resultado{extensao}'
+    caminho.write_bytes(exportar(resultado, formato))
+
+    lido = ler_resultados(str(caminho))
+
+    pd.testing.assert_frame_equal(lido, resultado[COLUNAS_RESULTADO])
+    assert lido['Total_Final'].dtype == ('int64' if centavos else 'float64')
+
+
+def test_lote_particionado_por_ano_volta_caso_a_caso(casos, tmp_path):
+    resultados = {f'caso_{i}': _resultado(caso, centavos=True) for i, caso in enumerate(casos)}
+    gravar_lote(resultados, str(tmp_path))
+
+    assert sorted(p.name for p in tmp_path.iterdir())[0].startswith('Ano=')
+    lido = ler_resultados(str(tmp_path))
+    assert len(lido) == sum(len(r) for r in resultados.values())
+    for caso, resultado in resultados.items():
+        do_caso = lido[lido['Caso'] == caso].sort_values('Competencia').reset_index(drop=True)
+        pd.testing.assert_frame_equal(do_caso[COLUNAS_RESULTADO], resultado[COLUNAS_RESULTADO])
+
+
+def test_filtro_le_so_as_particoes_pedidas(casos, tmp_path):
+    gravar_lote([_resultado(caso) for caso in casos], str(tmp_path))
+
+    lido = ler_resultados(str(tmp_path), filtro=ds.field('Ano') >= 2024)
+
+    assert not lido.empty
+    assert (lido['Competencia'].dt.year >= 2024).all()
+    assert set(lido['Caso']) == {0, 1, 2}
+
+
+def test_lote_nao_mistura_centavos_e_reais(casos, tmp_path):
+    with pytest.raises(ValueError, match='centavos e em reais'):
+        gravar_lote([_resultado(casos[0], centavos=True), _resultado(casos[1])], str(tmp_path))
+
+
+def test_resultado_sem_colunas_do_calculo_e_recusado(casos):
+    with pytest.raises(ValueError, match='Resultado sem as colunas'):
+        exportar(_resultado(casos[0]).drop(columns=['Total_Final']))
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from formatacao import FORMATO_DATA, csv_ptbr, data, decimal, moeda, percentual
+
+
+def _ptbr(valor, casas):
+    """ Referência por célula: formatação do Python com os separadores trocados. """
+    return f"{valor:,.{casas}f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    (0, '0,00'), (0.5, '0,50'), (1234.5, '1.234,50'), (-1234.567, '-1.234,57'),
+    (1_000_000, '1.000.000,00'), (999.999, '1.000,00'), (-0.001, '0,00'),
+])
+def test_moeda(valor, esperado):
+    assert moeda(valor) == esperado
+    assert moeda(valor, prefixo='R$ ') == f"R$ {esperado}"
+
+
+@pytest.mark.parametrize('casas', [0, 2, 4, 10])
+def test_decimal_igual_ao_format_do_python(casas):
+    rng = np.random.default_rng(44)
+    limite = min(1e9, 2 ** 53 / 10 ** casas)  # faixa documentada em decimal()
+    valores = np.concatenate([rng.uniform(-limite, limite, 2000), rng.uniform(0, 2, 2000),
+                              np.round(rng.uniform(0, limite / 10, 2000), casas) + 0.5 / 10 ** casas])
+    esperado = [_ptbr(v, casas) for v in valores]
+    esperado = [t[1:] if t.startswith('-') and not t.strip('-0,.') else t for t in esperado]  # sem '-0,00'
+    assert list(decimal(valores, casas)) == esperado
+
+
+def test_empates_seguem_o_arredondamento_do_python():
+    # 2.675 e 1.005 ficam abaixo do meio em binário; 0.125 é exato e vai para o par
+    assert list(moeda([2.675, 1.005, 0.125, 0.375])) == ['2,67', '1,00', '0,12', '0,38']
+
+
+def test_ausentes_e_sem_milhar():
+    assert list(moeda([np.nan, None, np.inf, 1.5])) == ['-', '-', '-', '1,50']
+    assert moeda(np.nan, vazio='') == ''
+    assert decimal(1234567.891, 1, milhar=False) == '1234567,9'
+
+
+def test_series_mantem_o_indice():
+    valores = pd.Series([1.0, 2500.25], index=['a', 'b'])
+    formatado = moeda(valores)
+    assert formatado.index.tolist() == ['a', 'b']
+    assert formatado.tolist() == ['1,00', '2.500,25']
+
+
+def test_percentual():
+    assert percentual(0.381) == '38,10%'
+    assert list(percentual([0.5, np.nan, 1.234567], casas=1)) == ['50,0%', '-', '123,5%']
+
+
+def test_data():
+    datas = pd.Series(pd.to_datetime(['2022-10-01', None, '2025-01-31']))
+    assert data(datas).tolist() == ['10/2022', '', '01/2025']
+    assert data(datas, FORMATO_DATA).tolist() == ['01/10/2022', '', '31/01/2025']
+    assert data('05/03/2021', FORMATO_DATA) == '05/03/2021'
+
+
+def test_csv_ptbr():
+    df = pd.DataFrame({'Competencia': pd.to_datetime(['2021-03-01']), 'Valor': [1234.5], 'Posto': ['Cabo']})
+    assert csv_ptbr(df).decode('utf-8').splitlines() == ['Competencia;Valor;Posto', '01/03/2021;1234,5;Cabo']
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from leitor_fichas import criar_pool_leitura, extrair_dados_arquivos
+from registros_ficha import TIPO_NATALINA, TIPO_SUBSIDIO
+
+
+def _csv(*linhas):
+    return ('Competencia;Valor;Cargo\n' + '\n'.join(linhas) + '\n').encode('utf-8')
+
+
+ANO_2020 = _csv('01/01/2020;1000,00;SD PM', '01/02/2020;1000,00;SD PM', '01/03/2020;1000,00;SD PM')
+# Março repetido com o mesmo valor, fevereiro com outro valor, abril faltando
+CORRECAO = _csv('01/02/2020;1100,00;SD PM', '01/03/2020;1000,00;SD PM', '01/05/2020;1200,00;CB PM',
+                '13/12/2020;1200,00;CB PM')
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with criar_pool_leitura(2) as pool:
+        yield pool
+
+
+def test_junta_arquivos_e_relata_sobreposicoes_e_lacunas(pool):
+    df, relatorio = extrair_dados_arquivos([('2020.csv', ANO_2020), ('correcao.csv', CORRECAO)], pool=pool)
+
+    assert df[['Competencia', 'Tipo']].duplicated().sum() == 0
+    assert len(df) == 5
+    fevereiro = df[(df['Competencia'] == '2020-02-01') & (df['Tipo'] == TIPO_SUBSIDIO)]
+    assert fevereiro['Valor_Achado'].tolist() == [1100.0]
+    assert fevereiro['Arquivo'].tolist() == ['correcao.csv']
+    assert (df['Tipo'] == TIPO_NATALINA).sum() == 1
+
+    assert relatorio['arquivos']['Registros'].tolist() == [3, 4]
+    assert relatorio['arquivos']['Erro'].isna().all()
+    duplicados = relatorio['duplicados']
+    assert duplicados['Competencia'].tolist() == [pd.Timestamp('2020-03-01')]
+    assert duplicados['Arquivos'].tolist() == [['2020.csv', 'correcao.csv']]
+    conflitos = relatorio['conflitos']
+    assert conflitos['Competencia'].tolist() == [pd.Timestamp('2020-02-01')]
+    assert conflitos['Valores'].tolist() == [[1000.0, 1100.0]]
+    assert conflitos['Arquivo_Escolhido'].tolist() == ['correcao.csv']
+    assert list(relatorio['lacunas']) == [pd.Timestamp('2020-04-01')]
+
+
+def test_ordem_da_lista_decide_o_conflito(pool):
+    df, relatorio = extrair_dados_arquivos([('correcao.csv', CORRECAO), ('2020.csv', ANO_2020)], pool=pool)
+
+    fevereiro = df[(df['Competencia'] == '2020-02-01') & (df['Tipo'] == TIPO_SUBSIDIO)]
+    assert fevereiro['Valor_Achado'].tolist() == [1000.0]
+    assert relatorio['conflitos']['Arquivo_Escolhido'].tolist() == ['2020.csv']
+
+
+def test_arquivo_com_erro_nao_impede_os_demais(pool):
+    df, relatorio = extrair_dados_arquivos([('2020.csv', ANO_2020), ('quebrado.pdf', b'nao e pdf')], pool=pool)
+
+    assert len(df) == 3
+    erros = relatorio['arquivos'].set_index('Arquivo')['Erro']
+    assert pd.isna(erros['2020.csv'])
+    assert 'Erro ao ler PDF' in erros['quebrado.pdf']
+
+
+def test_um_arquivo_so_le_sem_pool():
+    df, relatorio = extrair_dados_arquivos([('2020.csv', ANO_2020)])
+
+    assert df['Valor_Achado'].tolist() == [1000.0] * 3
+    assert relatorio['duplicados'].empty and relatorio['conflitos'].empty and relatorio['lacunas'].empty
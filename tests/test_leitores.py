@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from gerador_fichas import EXTENSOES, TIPOS_LIDOS, conferir_leitura, gabarito, gerar_ficha, gerar_militar
+from leitor_fichas import extrair_dados_arquivo, ler_registros_arquivo
+from leitor_pdf import extrair_dados_pdf_caminho
+from registros_ficha import ConsolidadorFicha, ErroLeituraFicha, RegistroFicha, TIPO_SUBSIDIO
+
+
+@pytest.fixture(scope='module')
+def militar():
+    return gerar_militar(0, 1, anos=(3, 3))
+
+
+@pytest.mark.parametrize('formato', sorted(EXTENSOES))
+def test_leitor_bate_com_o_gabarito(militar, formato):
+    lido = extrair_dados_arquivo(f"ficha{EXTENSOES[formato]}", gerar_ficha(formato, militar))
+    esperado = gabarito(militar)
+    esperado = esperado[esperado['Tipo'].isin(TIPOS_LIDOS[formato])]
+
+    conferencia = conferir_leitura(lido, esperado)
+    assert conferencia['certos'] == len(esperado) > 0
+    assert (conferencia['valor_errado'], conferencia['faltando'], conferencia['sobrando']) == (0, 0, 0)
+
+
+@pytest.mark.parametrize('formato', sorted(EXTENSOES))
+def test_gerador_consolidado_igual_ao_dataframe(militar, formato):
+    nome, conteudo = f"ficha{EXTENSOES[formato]}", gerar_ficha(formato, militar)
+    registros = ler_registros_arquivo(nome, conteudo)
+
+    primeiro = next(registros)
+    assert isinstance(primeiro, RegistroFicha)
+    consolidado = ConsolidadorFicha().consumir([primeiro]).consumir(registros).para_dataframe()
+    pd.testing.assert_frame_equal(consolidado, extrair_dados_arquivo(nome, conteudo))
+
+
+def test_pdf_do_disco_igual_ao_da_memoria(militar, tmp_path):
+    caminho = tmp_path / 'ficha.pdf'
+    caminho.write_bytes(gerar_ficha('pdf', militar))
+    em_memoria = extrair_dados_arquivo('ficha.pdf', caminho.read_bytes())
+
+    for usar_mmap in (False, True):
+        pd.testing.assert_frame_equal(extrair_dados_pdf_caminho(str(caminho), usar_mmap=usar_mmap), em_memoria)
+
+
+def test_consolidador_soma_parcelas_do_mesmo_mes():
+    mes = pd.Timestamp('2021-03-01')
+    consolidado = ConsolidadorFicha().consumir([
+        RegistroFicha(mes, TIPO_SUBSIDIO, 1000.10, 'CABO'),
+        RegistroFicha(mes, TIPO_SUBSIDIO, 500.20, 'SOLDADO'),
+        RegistroFicha(pd.NaT, TIPO_SUBSIDIO, 99.0, 'CABO'),
+    ]).para_dataframe()
+
+    assert len(consolidado) == 1
+    assert consolidado.loc[0, 'Valor_Achado'] == pytest.approx(1500.30)
+    assert consolidado.loc[0, 'Cargo_Detectado'] == 'CABO'  # cargo do primeiro registro
+
+
+@pytest.mark.parametrize('nome, conteudo, mensagem', [
+    ('ficha.pdf', b'isto nao e um pdf', 'Erro ao ler PDF'),
+    ('ficha.csv', 'Data;Quantia\n01/01/2020;10,00\n'.encode(), "colunas: 'Competencia'"),
+])
+def test_arquivo_invalido_levanta_erro_de_leitura(nome, conteudo, mensagem):
+    with pytest.raises(ErroLeituraFicha, match=mensagem):
+        extrair_dados_arquivo(nome, conteudo)
+    # O gerador só falha quando consumido, com o mesmo erro
+    with pytest.raises(ErroLeituraFicha):
+        list(ler_registros_arquivo(nome, conteudo))
@@ -0,0 +1,63 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+from lote_laudos import caminho_indice, casos_sinteticos, gerar_lote_laudos
+
+DATA_CALCULO = '20/11/2025'
+
+
+@pytest.fixture(scope='module')
+def casos():
+    return casos_sinteticos(3, data_ajuizamento='15/03/2025')
+
+
+def _lote(casos, caminho, **opcoes):
+    return gerar_lote_laudos(casos, str(caminho), workers=1, data_calculo=DATA_CALCULO, **opcoes)
+
+
+def test_retomada_mantem_perfil_do_lote(casos, tmp_path):
+    caminho = tmp_path / 'laudos.zip'
+    _lote(casos[:2], caminho, compacto=True)
+    resumo = _lote(casos, caminho)  # sem --compacto: vale o do índice
+
+    assert (resumo['gravados'], resumo['ja_prontos']) == (1, 2)
+    indice = pd.read_csv(caminho_indice(str(caminho)), sep=';', decimal=',', dtype=str)
+    assert indice['Compacto'].tolist() == ['True'] * 3
+    with zipfile.ZipFile(caminho) as zf:
+        # Perfil compacto: streams sem a camada ASCII85
+        assert all(b'ASCII85Decode' not in zf.read(nome) for nome in zf.namelist())
+
+
+@pytest.mark.parametrize('opcoes', [{'compacto': False}, {'memorial_unico': True}, {'regime': 'composto'},
+                                    {'data_corte_selic': '01/06/2021'}])
+def test_retomada_com_outro_perfil_ou_regime_e_recusada(casos, tmp_path, opcoes):
+    caminho = tmp_path / 'laudos.zip'
+    _lote(casos[:1], caminho, compacto=True)
+    with pytest.raises(ValueError, match='Lote retomado'):
+        _lote(casos, caminho, **opcoes)
+
+
+def test_retomada_depois_de_queda_reconstroi_o_zip(casos, tmp_path):
+    caminho = tmp_path / 'laudos.zip'
+    _lote(casos, caminho)
+    with zipfile.ZipFile(caminho) as zf:
+        originais = {nome: zf.read(nome) for nome in zf.namelist()}
+        inicio_diretorio = zf.start_dir
+    # Queda: o ZIP perde o diretório central e o índice fica sem a última linha
+    with open(caminho, 'r+b') as f:
+        f.truncate(inicio_diretorio)
+    arquivo_indice = caminho_indice(str(caminho))
+    with open(arquivo_indice, encoding='utf-8') as f:
+        linhas = f.readlines()
+    with open(arquivo_indice, 'w', encoding='utf-8') as f:
+        f.writelines(linhas[:-1])
+
+    resumo = _lote(casos, caminho)
+
+    assert (resumo['gravados'], resumo['ja_prontos']) == (1, 2)
+    with zipfile.ZipFile(caminho) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(originais)
+    assert len(pd.read_csv(arquivo_indice, sep=';')) == len(casos)
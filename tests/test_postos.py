@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from postos import MAPA_PATENTES, inferir_historico_promocoes, normalizar_posto, normalizar_postos
+
+
+@pytest.mark.parametrize('sigla, posto', sorted(MAPA_PATENTES.items()))
+def test_cada_termo_do_mapa_vira_o_seu_posto(sigla, posto):
+    assert normalizar_posto(sigla) == posto
+    assert normalizar_posto(f"0712 {sigla} PM") == posto
+
+
+@pytest.mark.parametrize('cargo, posto', [
+    ('SUBTENENTE PM', 'Subtenente'),               # não cai em SUB
+    ('TENENTE CORONEL PM', 'Tenente-Coronel'),     # não cai em CORONEL
+    ('TEN CEL QOPM', 'Tenente-Coronel'),
+    ('CAPITAO PM', 'Capitão'),                     # sem acento, como entregam os leitores
+    ('capitão pm', 'Capitão'),
+    ('ALUNO CFO III', 'Aluno CFO 3'),              # não cai em ALUNO CFO I
+    ('ALUNO CFO II', 'Aluno CFO 2'),
+    ('ALUNO CFO I', 'Aluno CFO 1'),
+    ('ALUNO OFICIAL', 'Aluno CFO 1'),
+    ('1º SGT PM', '1º Sargento'),
+    ('SEGUNDO TENENTE', '2º Tenente'),
+])
+def test_termo_mais_longo_vence(cargo, posto):
+    assert normalizar_posto(cargo) == posto
+
+
+@pytest.mark.parametrize('cargo', ['', 'AGENTE ADMINISTRATIVO', 'CABOCLO', 'SDX', 'CAPELAO'])
+def test_sem_patente_reconhecida(cargo):
+    assert normalizar_posto(cargo) is None
+
+
+def test_postos_existem_no_escalonamento():
+    escalonamento = set(pd.read_csv('dados/escalonamento.csv', sep=';')['Posto'])
+    assert set(MAPA_PATENTES.values()) <= escalonamento
+
+
+def test_normalizar_postos_mantem_o_indice():
+    cargos = pd.Series(['CB PM', 'SD PM', 'CB PM', None], index=[10, 11, 12, 13])
+    postos = normalizar_postos(cargos)
+    assert postos.index.tolist() == [10, 11, 12, 13]
+    assert postos.iloc[:3].tolist() == ['Cabo', 'Soldado', 'Cabo']
+    assert pd.isna(postos.iloc[3])
+
+
+def test_historico_usa_as_datas_padrao_de_promocao():
+    ficha = pd.DataFrame({
+        'Competencia': pd.to_datetime(['2018-01-01', '2018-02-01', '2019-03-01', '2020-06-01',
+                                       '2021-10-01', '2021-11-01']),
+        'Cargo_Detectado': ['SD PM', 'SOLDADO', 'CB PM', '3º SGT PM', 'AGENTE', '2º SGT PM'],
+    })
+    historico = inferir_historico_promocoes(ficha)
+
+    assert historico['Posto'].tolist() == ['Soldado', 'Cabo', '3º Sargento', '2º Sargento']
+    assert historico['Data'].dt.strftime('%d/%m/%Y').tolist() == [
+        '01/01/2018',   # primeira patente: desde a primeira competência
+        '25/12/2018',   # jan-abr: promoção de 25/12 do ano anterior
+        '21/04/2020',   # mai-ago: 21/04
+        '21/08/2021',   # set-dez: 21/08
+    ]
+
+
+def test_historico_vazio_sem_patente():
+    ficha = pd.DataFrame({'Competencia': pd.to_datetime(['2020-01-01']), 'Cargo_Detectado': ['AGENTE']})
+    assert inferir_historico_promocoes(ficha).empty
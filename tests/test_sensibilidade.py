@@ -0,0 +1,26 @@
+import pytest
+
+from core import executar_calculo, resumir_totais, varrer_ajuizamento
+from lote_laudos import casos_sinteticos
+
+DATA_CALCULO = '20/11/2025'
+
+
+def _totais(caso, data_ajuizamento):
+    return executar_calculo(caso['data_ingresso'], data_ajuizamento, caso['historico'], data_calculo=DATA_CALCULO)[1]
+
+
+@pytest.mark.parametrize('numero', [0, 1, 2])
+def test_varredura_igual_a_recalcular_com_cada_ajuizamento(numero):
+    caso = casos_sinteticos(numero + 1)[numero]
+    datas = ['15/03/2025', '02/07/2025', '31/10/2025']
+
+    varredura = varrer_ajuizamento(_totais(caso, datas[0]), datas[::-1], caso['data_ingresso'])
+
+    assert varredura['Data_Ajuizamento'].dt.strftime('%d/%m/%Y').tolist() == datas
+    for linha, data in zip(varredura.itertuples(), datas):
+        recalculado = resumir_totais(_totais(caso, data))
+        assert linha.Principal == pytest.approx(recalculado['principal'], abs=1e-6)
+        assert linha.Total_Atualizado == pytest.approx(recalculado['total'], abs=1e-6)
+        assert linha.Juros_Correcao == pytest.approx(recalculado['acessorios'], abs=1e-6)
+    assert varredura['Principal'].is_monotonic_decreasing
@@ -0,0 +1,58 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from core import _tabela_fatores, montar_tabela_fatores, obter_motor, obter_tabela_fatores
+
+
+@pytest.fixture(scope='module')
+def motor(tmp_path_factory):
+    # Cópia dos CSVs de referência: as tabelas gravadas ficam na pasta temporária, não em dados/fatores
+    pasta = tmp_path_factory.mktemp('dados')
+    for nome in ('indices.csv', 'tabelas_lei.csv', 'escalonamento.csv'):
+        shutil.copy(os.path.join('dados', nome), pasta)
+    return obter_motor(str(pasta))
+
+
+def test_mesmo_mes_de_calculo_usa_a_mesma_tabela(motor):
+    dia_5 = obter_tabela_fatores(motor, '05/11/2025')
+    dia_20 = obter_tabela_fatores(motor, '20/11/2025')
+
+    assert dia_5.attrs['arquivo'] == dia_20.attrs['arquivo']
+    assert os.path.basename(dia_5.attrs['arquivo']) == f"fatores_{motor.snapshot_indices}_2025-11_soma_2021-12.csv"
+    pd.testing.assert_frame_equal(dia_5, dia_20)
+    # Só a data exata, que o laudo mostra, muda
+    assert (dia_5.attrs['data_calculo'], dia_20.attrs['data_calculo']) == (pd.Timestamp('2025-11-05'),
+                                                                             pd.Timestamp('2025-11-20'))
+
+
+@pytest.mark.parametrize('opcoes, sufixo', [
+    ({'data_calculo': '20/10/2025'}, '2025-10_soma_2021-12.csv'),
+    ({'regime': 'composto'}, '2025-11_composto_2021-12.csv'),
+    ({'regime': 'selic_acumulada'}, '2025-11_selic_acumulada_2021-12.csv'),
+    ({'data_corte_selic': '15/06/2020'}, '2025-11_soma_2020-06.csv'),
+])
+def test_mes_regime_e_corte_entram_na_chave(motor, opcoes, sufixo):
+    padrao = obter_tabela_fatores(motor, '20/11/2025')
+    outra = obter_tabela_fatores(motor, **{'data_calculo': '20/11/2025', **opcoes})
+
+    assert outra.attrs['arquivo'].endswith(sufixo)
+    assert outra.attrs['arquivo'] != padrao.attrs['arquivo']
+    assert not outra.equals(padrao)
+
+
+def test_tabela_gravada_volta_igual_a_montada(motor):
+    mes = pd.Timestamp('2025-11-01')
+    obter_tabela_fatores(motor, mes, 'composto')
+    _tabela_fatores.cache_clear()  # a próxima consulta lê o arquivo, como outro processo leria
+
+    lida = obter_tabela_fatores(motor, mes, 'composto')
+    montada = montar_tabela_fatores(motor.df_indices, mes, regime='composto', acumulados=motor.acumulados)
+    pd.testing.assert_frame_equal(lida, montada, check_exact=True)
+
+
+def test_regime_desconhecido(motor):
+    with pytest.raises(ValueError, match='Regime desconhecido'):
+        obter_tabela_fatores(motor, '20/11/2025', 'juros_sobre_juros')
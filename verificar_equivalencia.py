@@ -0,0 +1,376 @@
+"""
+Conferência diferencial: caminho linha a linha (validado no Excel) x caminho vetorizado.
+
+Gera carreiras aleatórias (ingresso, promoções no meio do mês, etapas do CFO, férias,
+pagamentos da ficha e data de ajuizamento), roda os dois caminhos do core e exige
+igualdade linha a linha dentro de 1 centavo. Também confere o modo centavos, o motor de
+segmentos e os regimes de acumulação, nos mesmos casos.
+
+    linha a linha: calcular_valor_nominal_com_prorata (apply) -> consolidar_com_pdf -> aplicar_financeiro
+    vetorizado:    calcular_nominal_vetorizado -> consolidar_com_pdf -> aplicar_financeiro_vetorizado
+    centavos:      aplicar_financeiro_centavos (contra o linha a linha arredondado; no total, a
+                   tolerância de 1 centavo da diferença é multiplicada pelo fator de atualização)
+    segmentos:     calcular_nominal_segmentado contra a soma dia a dia do mês (posto e nível de cada dia)
+    regimes:       aplicar_financeiro_vetorizado/centavos em cada regime de REGIMES contra a acumulação
+                   mês a mês direto dos índices, e aplicar_regime sobre o resultado do regime padrão
+
+O ganho é medido por etapa (valor nominal e atualização), sempre com calculadora nova. A tabela
+de fatores (core.obter_tabela_fatores) é do processo, como em produção: montada uma vez, fora da medição.
+
+Uso:
+    python verificar_equivalencia.py --casos 2000 --semente 7
+    python verificar_equivalencia.py --caso 1234 --semente 7 -v   (reproduz um caso)
+
+Sai com código 1 se algum caso divergir. Cada caso usa a semente (semente, nº do caso) e a data de
+cálculo fixa DATA_CALCULO (não o dia de hoje), então qualquer divergência pode ser reproduzida
+isoladamente, em qualquer dia.
+"""
+import argparse
+import sys
+import time
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from core import REGIME_PADRAO, REGIMES, CalculadoraMilitar, aplicar_regime, carregar_referencias, obter_tabela_fatores
+
+TOLERANCIA_REAIS = 0.01
+TOLERANCIA_FATOR = 1e-12
+
+# Primeira competência com índice de correção no dados/indices.csv: o ajuizamento sorteado
+# garante que a prescrição nunca comece antes dela
+PRIMEIRO_AJUIZAMENTO = pd.Timestamp('2019-02-01')
+# Data de cálculo de todos os casos (dentro do último mês de índices): limita os sorteios e vai para
+# os dois caminhos, então o mesmo (semente, caso) é o mesmo cálculo em qualquer dia
+DATA_CALCULO = pd.Timestamp('2025-11-20')
+
+TRILHA_PRACAS = ['Soldado', 'Cabo', '3º Sargento', '2º Sargento', '1º Sargento', 'Subtenente']
+TRILHA_OFICIAIS = ['Aluno CFO 1', 'Aluno CFO 2', 'Aluno CFO 3', 'Aspirante', '2º Tenente',
+                   '1º Tenente', 'Capitão', 'Major', 'Tenente-Coronel', 'Coronel']
+
+
+# --- GERAÇÃO DE CASOS ---
+def _data_aleatoria(rng, inicio, fim):
+    dias = max((fim - inicio).days, 0)
+    return inicio + pd.Timedelta(days=int(rng.integers(0, dias + 1)))
+
+def gerar_caso(semente, numero):
+    """ Um caso aleatório reprodutível: dict com ingresso, ajuizamento, histórico, férias e pagamentos. """
+    rng = np.random.default_rng([semente, numero])
+
+    ingresso = _data_aleatoria(rng, pd.Timestamp('2000-01-01'), pd.Timestamp('2024-06-30'))
+    ajuizamento = _data_aleatoria(rng, max(PRIMEIRO_AJUIZAMENTO, ingresso + pd.DateOffset(months=1)), DATA_CALCULO)
+
+    # Carreira: praça, oficial (com etapas do CFO) ou praça que passa no CFO
+    trilha = rng.choice(['pracas', 'oficiais', 'mista'])
+    if trilha == 'pracas':
+        postos = TRILHA_PRACAS[:rng.integers(1, len(TRILHA_PRACAS) + 1)]
+    elif trilha == 'oficiais':
+        postos = TRILHA_OFICIAIS[:rng.integers(1, len(TRILHA_OFICIAIS) + 1)]
+    else:
+        postos = (TRILHA_PRACAS[:rng.integers(1, 4)] +
+                  TRILHA_OFICIAIS[:rng.integers(1, len(TRILHA_OFICIAIS) + 1)])
+
+    historico = [{'Data': ingresso, 'Posto': postos[0]}]
+    data = ingresso
+    for posto in postos[1:]:
+        # Intervalos curtos (CFO) e longos, em qualquer dia do mês (força o pro rata)
+        data = data + pd.Timedelta(days=int(rng.integers(90, 6 * 365)))
+        if data > DATA_CALCULO:
+            break
+        historico.append({'Data': data, 'Posto': posto})
+
+    # Férias: dia qualquer de meses aleatórios (a timeline normaliza para o dia 15)
+    n_ferias = int(rng.integers(0, 8))
+    datas_ferias = [_data_aleatoria(rng, ingresso, DATA_CALCULO) for _ in range(n_ferias)]
+
+    # Pagamentos da ficha: parte dos meses, com valores abaixo e acima do devido
+    meses = pd.date_range(ingresso.replace(day=1), DATA_CALCULO, freq='MS')
+    sorteados = meses[rng.random(len(meses)) < rng.uniform(0.0, 0.9)]
+    pagamentos = pd.DataFrame({
+        'Competencia': sorteados,
+        'Valor_Achado': np.round(rng.uniform(500, 20000, len(sorteados)), 2),
+    })
+    natalinas = pd.DatetimeIndex([pd.Timestamp(year=a, month=12, day=13) for a in sorted(set(sorteados.year))])
+    natalinas = natalinas[rng.random(len(natalinas)) < 0.5]
+    pagamentos = pd.concat([pagamentos, pd.DataFrame({
+        'Competencia': natalinas,
+        'Valor_Achado': np.round(rng.uniform(500, 20000, len(natalinas)), 2),
+    })], ignore_index=True)
+
+    return {
+        'ingresso': ingresso,
+        'ajuizamento': ajuizamento,
+        'historico': historico,
+        'datas_ferias': datas_ferias,
+        'pagamentos': pagamentos,
+        'data_calculo': DATA_CALCULO,
+    }
+
+
+# --- OS DOIS CAMINHOS ---
+def _calculadora(caso, regime=REGIME_PADRAO):
+    return CalculadoraMilitar(caso['ingresso'], caso['ajuizamento'], caso['historico'],
+                              datas_ferias_pdf=caso['datas_ferias'], data_calculo=caso['data_calculo'],
+                              regime=regime)
+
+COLUNAS_ENTRADA = ['Competencia', 'Posto_Vigente', 'Valor_Devido', 'Valor_Pago']
+
+def caminho_linha_a_linha(calc, pagamentos, tempos):
+    """ calcular_valor_nominal_com_prorata / get_fator_nivel / calcular_atualizacao por linha (apply). """
+    inicio = time.perf_counter()
+    df = calc.gerar_timeline()
+    nominal = df.apply(calc.calcular_valor_nominal_com_prorata, axis=1)
+    df['Posto_Vigente'] = nominal[0]
+    df['Valor_Devido'] = nominal[1]
+    df['Valor_Pago'] = 0.0
+    tempos['nominal'] = time.perf_counter() - inicio
+
+    if not pagamentos.empty:
+        df = calc.consolidar_com_pdf(df, pagamentos)
+
+    inicio = time.perf_counter()
+    resultado = calc.aplicar_financeiro(df[COLUNAS_ENTRADA])
+    tempos['financeiro'] = time.perf_counter() - inicio
+    return resultado
+
+def caminho_vetorizado(calc, pagamentos, tempos):
+    inicio = time.perf_counter()
+    df = calc.gerar_timeline()
+    df['Posto_Vigente'], df['Valor_Devido'] = calc.calcular_nominal_vetorizado(df['Competencia'])
+    df['Valor_Pago'] = 0.0
+    tempos['nominal'] = time.perf_counter() - inicio
+
+    if not pagamentos.empty:
+        df = calc.consolidar_com_pdf(df, pagamentos)
+
+    inicio = time.perf_counter()
+    resultado = calc.aplicar_financeiro_vetorizado(df[COLUNAS_ENTRADA])
+    tempos['financeiro'] = time.perf_counter() - inicio
+    return resultado
+
+# --- MOTOR DE SEGMENTOS: REFERÊNCIA DIA A DIA ---
+def _nivel_no_dia(calc, posto, dia):
+    """ Fator de nível no dia: fixo do posto ou 1.03 ** aniversários de 3 anos de serviço já completados. """
+    fixo = calc._fator_nivel_fixo(posto)
+    if fixo is not None:
+        return fixo
+    trienios = 0
+    while calc.data_ingresso + relativedelta(years=3 * (trienios + 1)) <= dia:
+        trienios += 1
+    return 1.03 ** trienios
+
+def nominal_dia_a_dia(calc, competencias):
+    """
+    (Posto_Vigente, Valor_Devido) somando o mês dia a dia: cada dia paga 1/(dias do mês) da
+    remuneração do seu posto e nível. Férias: 1/3 do mês, posto do último dia. 13º: último dia de dezembro.
+    """
+    datas = list(calc.df_carreira['Data'])
+    postos = list(calc.df_carreira['Posto'])
+    def posto_no_dia(dia):
+        i = bisect_right(datas, dia) - 1
+        return postos[i] if i >= 0 else "Não Ingressou"
+    def remuneracao(base, dia):
+        posto = posto_no_dia(dia)
+        return posto, base * calc.escalonamento.get(posto, 0.0) * _nivel_no_dia(calc, posto, dia)
+
+    rotulos, valores = [], []
+    for competencia in pd.to_datetime(competencias):
+        inicio = competencia.replace(day=1)
+        dias = pd.date_range(inicio, inicio + pd.offsets.MonthEnd(0), freq='D')
+        base = calc.buscar_valor_coronel(inicio)
+        if competencia.day == 13:
+            posto, valor = remuneracao(base, dias[-1])
+            rotulos.append(f"13º Salário - {posto}")
+            valores.append(valor)
+            continue
+        partes, valor = [], 0.0
+        for dia in dias:
+            posto, diaria = remuneracao(base, dia)
+            valor += diaria / len(dias)
+            if partes and partes[-1][0] == posto:
+                partes[-1][1] += 1
+            else:
+                partes.append([posto, 1])
+        if competencia.day == 15:
+            rotulos.append(f"Férias (1/3) - {partes[-1][0]}")
+            valores.append(valor / 3)
+        else:
+            rotulos.append(partes[0][0] if len(partes) == 1 else " -> ".join(f"{p} ({d}d)" for p, d in partes))
+            valores.append(valor)
+    return rotulos, valores
+
+def caminho_segmentado(calc, pagamentos, nominal):
+    """ Nominal (motor de segmentos ou dia a dia) -> consolidar_com_pdf -> aplicar_financeiro_vetorizado. """
+    df = calc.gerar_timeline()
+    df['Posto_Vigente'], df['Valor_Devido'] = nominal(df['Competencia'])
+    df['Valor_Pago'] = 0.0
+    if not pagamentos.empty:
+        df = calc.consolidar_com_pdf(df, pagamentos)
+    # A atualização vetorizada já foi conferida contra a linha a linha: aqui só o nominal muda
+    return calc.aplicar_financeiro_vetorizado(df[COLUNAS_ENTRADA])
+
+# --- REGIMES: REFERÊNCIA MÊS A MÊS ---
+def _acumular(taxas, modo):
+    if modo == 'produto':
+        return float(np.prod(1 + taxas) - 1)
+    return float(taxas.sum())
+
+def atualizacao_no_regime(indices, competencia, diferenca, regime, corte, data_calculo):
+    """
+    (IPCA, Juros, Selic, Total) de uma linha no regime, acumulando os índices mês a mês:
+    IPCA até o corte, juros do mês seguinte ao da dívida até o mês anterior ao corte, Selic do mês
+    da dívida (ou do corte) até a data de cálculo. Selic 'publicada': diferença da SelicAcumulada.
+    """
+    if diferenca <= 0:
+        return 0.0, 0.0, 0.0, 0.0
+    modo_juros, modo_selic = REGIMES[regime]
+    mes = competencia.replace(day=1)
+    ipca = 1.0
+    if mes < corte:
+        ipca = indices.at[mes, 'CorrecaoMonetaria'] / indices.at[corte, 'CorrecaoMonetaria']
+    juros = _acumular(indices.loc[mes + pd.DateOffset(months=1):corte - pd.DateOffset(months=1),
+                                  'JurosPoupanca'] / 100, modo_juros)
+    inicio_selic = max(mes, corte)
+    if modo_selic == 'publicada':
+        ate = indices.loc[:data_calculo, 'SelicAcumulada']
+        antes = indices.loc[:inicio_selic - pd.Timedelta(days=1), 'SelicAcumulada']
+        selic = 0.0
+        if inicio_selic <= data_calculo:
+            selic = float(ate.iloc[-1] - (antes.iloc[-1] if len(antes) else 0.0)) / 100
+    else:
+        selic = _acumular(indices.loc[inicio_selic:data_calculo, 'Selic'] / 100, modo_selic)
+    return ipca, juros, selic, diferenca * ipca * (1 + juros) * (1 + selic)
+
+def financeiro_no_regime(calc, df_entrada):
+    """ Mesmo layout de aplicar_financeiro, no regime e corte da calculadora, uma linha por vez. """
+    indices = calc.df_indices.dropna(subset=['Data']).drop_duplicates('Data').set_index('Data').sort_index()
+    df = df_entrada.copy()
+    df['Diferenca_Mensal'] = (df['Valor_Devido'] - df['Valor_Pago']).clip(lower=0.0)
+    linhas = [atualizacao_no_regime(indices, c, d, calc.regime, calc.data_corte_selic, calc.data_calculo)
+              for c, d in zip(df['Competencia'], df['Diferenca_Mensal'])]
+    fatores = pd.DataFrame(linhas, columns=['IPCA_Fator', 'Juros_Fator', 'Selic_Fator', 'Total_Final'],
+                           index=df.index)
+    return pd.concat([df, fatores], axis=1)
+
+def comparar(referencia, candidato, centavos):
+    """ Lista de divergências (texto) entre os dois resultados; vazia = equivalentes. """
+    problemas = []
+    if len(referencia) != len(candidato):
+        return [f"nº de linhas: {len(referencia)} x {len(candidato)}"]
+    if not (referencia['Competencia'].values == candidato['Competencia'].values).all():
+        return ["competências diferentes"]
+
+    postos = referencia['Posto_Vigente'].astype(str).values != candidato['Posto_Vigente'].astype(str).values
+    for i in np.flatnonzero(postos)[:3]:
+        problemas.append(f"{referencia['Competencia'].iloc[i]:%d/%m/%Y} Posto_Vigente: "
+                         f"{referencia['Posto_Vigente'].iloc[i]!r} x {candidato['Posto_Vigente'].iloc[i]!r}")
+
+    colunas = {'Valor_Devido': TOLERANCIA_REAIS, 'Diferenca_Mensal': TOLERANCIA_REAIS,
+               'Total_Final': TOLERANCIA_REAIS, 'IPCA_Fator': TOLERANCIA_FATOR,
+               'Juros_Fator': TOLERANCIA_FATOR, 'Selic_Fator': TOLERANCIA_FATOR}
+    for coluna, tolerancia in colunas.items():
+        erro = np.abs(referencia[coluna].to_numpy(dtype=float) - candidato[coluna].to_numpy(dtype=float))
+        for i in np.flatnonzero(~(erro <= tolerancia))[:3]:
+            problemas.append(f"{referencia['Competencia'].iloc[i]:%d/%m/%Y} {coluna}: "
+                             f"{referencia[coluna].iloc[i]!r} x {candidato[coluna].iloc[i]!r}")
+
+    # Modo centavos: Devido e Pago são arredondados na entrada, então a diferença fica a no máximo
+    # 1 centavo do linha a linha; no total esse centavo é multiplicado pelo fator de atualização
+    fator = (candidato['IPCA_Fator'] * (1 + candidato['Juros_Fator']) * (1 + candidato['Selic_Fator'])).to_numpy()
+    limites = {'Diferenca_Mensal': 1.0, 'Total_Final': 1.0 + fator}
+    for coluna, limite in limites.items():
+        erro = np.abs(np.round(referencia[coluna].to_numpy(dtype=float) * 100) - centavos[coluna].to_numpy())
+        for i in np.flatnonzero(erro > limite)[:3]:
+            problemas.append(f"{referencia['Competencia'].iloc[i]:%d/%m/%Y} {coluna} (centavos): "
+                             f"{referencia[coluna].iloc[i]!r} x {centavos[coluna].iloc[i]}")
+    return problemas
+
+def conferir_regimes(caso, padrao, centavos_padrao):
+    """ Divergências de cada regime (calculadora no regime, aplicar_regime e modo centavos). """
+    problemas = []
+    entrada = padrao[COLUNAS_ENTRADA]
+    for regime in REGIMES:
+        calc = _calculadora(caso, regime)
+        candidato = calc.aplicar_financeiro_vetorizado(entrada)
+        centavos = calc.aplicar_financeiro_centavos(entrada)
+        refeito = aplicar_regime(padrao, regime, data_calculo=caso['data_calculo'])
+        refeito_centavos = aplicar_regime(centavos_padrao, regime, data_calculo=caso['data_calculo'])
+        problemas += [f"[{regime}] {p}" for p in comparar(financeiro_no_regime(calc, entrada), candidato, centavos)]
+        problemas += [f"[aplicar_regime {regime}] {p}" for p in comparar(candidato, refeito, refeito_centavos)]
+        diferentes = np.flatnonzero(refeito_centavos['Total_Final'].to_numpy() != centavos['Total_Final'].to_numpy())
+        for i in diferentes[:3]:
+            problemas.append(f"[aplicar_regime {regime}] {centavos['Competencia'].iloc[i]:%d/%m/%Y} Total_Final "
+                             f"(centavos): {centavos['Total_Final'].iloc[i]} x {refeito_centavos['Total_Final'].iloc[i]}")
+    return problemas
+
+def conferir_caso(semente, numero):
+    """ Roda um caso em todos os caminhos. Retorna (divergências, tempos linha a linha, tempos vetorizado). """
+    caso = gerar_caso(semente, numero)
+    tempos_linha, tempos_vetor = {}, {}
+
+    referencia = caminho_linha_a_linha(_calculadora(caso), caso['pagamentos'], tempos_linha)
+    # Calculadora nova: o vetorizado não aproveita nada da calculadora do linha a linha
+    calc = _calculadora(caso)
+    candidato = caminho_vetorizado(calc, caso['pagamentos'], tempos_vetor)
+
+    centavos = calc.aplicar_financeiro_centavos(candidato[COLUNAS_ENTRADA])
+    problemas = comparar(referencia, candidato, centavos)
+
+    calc = _calculadora(caso)
+    dia_a_dia = caminho_segmentado(calc, caso['pagamentos'], lambda c: nominal_dia_a_dia(calc, c))
+    segmentado = caminho_segmentado(calc, caso['pagamentos'], calc.calcular_nominal_segmentado)
+    centavos_segmentado = calc.aplicar_financeiro_centavos(segmentado[COLUNAS_ENTRADA])
+    problemas += [f"[segmentos] {p}" for p in comparar(dia_a_dia, segmentado, centavos_segmentado)]
+
+    problemas += conferir_regimes(caso, candidato, centavos)
+    return problemas, tempos_linha, tempos_vetor
+
+# --- EXECUÇÃO ---
+def executar(casos, semente, detalhar=False, numeros=None):
+    carregar_referencias()  # leitura dos CSVs fora da medição
+    for regime in REGIMES:
+        obter_tabela_fatores(data_calculo=DATA_CALCULO, regime=regime)
+    numeros = range(casos) if numeros is None else numeros
+    falhas = {}
+    etapas = ('nominal', 'financeiro')
+    soma_linha = dict.fromkeys(etapas, 0.0)
+    soma_vetor = dict.fromkeys(etapas, 0.0)
+    for n in numeros:
+        try:
+            problemas, t_linha, t_vetor = conferir_caso(semente, n)
+        except Exception as e:
+            problemas, t_linha, t_vetor = [f"erro: {e!r}"], {}, {}
+        for etapa in etapas:
+            soma_linha[etapa] += t_linha.get(etapa, 0.0)
+            soma_vetor[etapa] += t_vetor.get(etapa, 0.0)
+        if problemas:
+            falhas[n] = problemas
+            if detalhar:
+                print(f"caso {n}:", *problemas, sep='\n    ')
+
+    quantidade = len(numeros)
+    print(f"{quantidade} casos (semente {semente}): {quantidade - len(falhas)} iguais, {len(falhas)} divergentes")
+    soma_linha['total'] = sum(soma_linha.values())
+    soma_vetor['total'] = sum(soma_vetor.values())
+    for etapa in soma_linha:
+        if soma_vetor[etapa] > 0:
+            print(f"{etapa:>10}: linha a linha {soma_linha[etapa]:.2f}s | vetorizado {soma_vetor[etapa]:.2f}s | "
+                  f"ganho {soma_linha[etapa] / soma_vetor[etapa]:.1f}x")
+    if falhas and not detalhar:
+        primeiro = next(iter(falhas))
+        print(f"primeira divergência: caso {primeiro}", *falhas[primeiro][:5], sep='\n    ')
+    return falhas
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Conferência linha a linha x vetorizado')
+    parser.add_argument('--casos', type=int, default=1000)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--caso', type=int, action='append', help='Roda só este(s) caso(s)')
+    parser.add_argument('-v', '--detalhar', action='store_true', help='Mostra todas as divergências')
+    args = parser.parse_args()
+
+    falhas = executar(args.casos, args.semente, args.detalhar, args.caso)
+    sys.exit(1 if falhas else 0)